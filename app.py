@@ -5,8 +5,14 @@ import os
 import re
 import sys
 
-from threading import Timer
-from PyQt5.QtCore import Qt, pyqtSignal as Signal, pyqtSlot as Slot, Qt, QTimer
+from threading import Thread
+from PyQt5.QtCore import (
+    Qt,
+    pyqtSignal as Signal,
+    pyqtSlot as Slot,
+    QSortFilterProxyModel,
+    QTimer,
+)
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import (
     QApplication,
@@ -20,13 +26,23 @@ from PyQt5.QtWidgets import (
     QMessageBox,
     QVBoxLayout,
     QFileDialog,
+    QListView,
+    QAbstractItemView,
 )
+from face_id.audit_log import audit
+from face_id.enforcement import launch_app
 from face_id.face_verification import (
     FaceVerifier,
     IDUpdater,
     VideoThread,
     MonitorThread,
 )
+from face_id.gallery import GalleryStore
+from face_id.governor import get_governor
+from face_id.protected_apps import ProtectedAppsModel
+from face_id.settings import load_settings
+from face_id.ui_watchdog import EventLoopWatchdog
+from face_id.verification_queue import VerificationQueue
 
 
 class SignUpWindow(QMainWindow):
@@ -190,7 +206,7 @@ class LoginWindow(QMainWindow):
             self.second_window.show()
             self.close()
 
-        elif len(os.listdir("face_id/image_data/verification_images")) == 0:
+        elif len(GalleryStore().load()["templates"]) == 0:
             self.second_window = UpdateIDWindow()
             self.second_window.show()
             self.close()
@@ -205,11 +221,13 @@ class VerifyWindow(QMainWindow):
     """
     Creates a pyqt5 window for face verification, with a video thread displaying a webcam image.
 
-    Creates widgets to display the user's webcam and if the verification failed. Also creates a video
-    thread, face verification object, and monitor window object to display/capture the webcam image,
-    send those images to be tested with a siamese neural network, and send information to the monitor window
-    if the image was verified. Both classes used for the video thread and face verification can be found
-    at "face_id/face_verification".
+    Creates widgets to display the user's webcam, the apps waiting for verification and if the
+    verification failed. Also creates a video thread, face verification object, and monitor window
+    object to display/capture the webcam image, send those images to be tested with a siamese neural
+    network, and send information to the monitor window if the image was verified. Every blocked app
+    waits in the verification queue, so one window and one capture stream are shared by all of them.
+    Both classes used for the video thread and face verification can be found at
+    "face_id/face_verification".
 
     Attributes:
         pause_status (pyqtSignal): signal used emit a bool that determines if the video thread needs to stop
@@ -219,8 +237,12 @@ class VerifyWindow(QMainWindow):
     pause_status = Signal(bool)
     verified_status = Signal(str, str)
 
-    def __init__(self):
-        """Initializes the verify window and creates its widgets and video thread."""
+    def __init__(self, verification_queue):
+        """Initializes the verify window and creates its widgets and video thread.
+
+        Args:
+            verification_queue (VerificationQueue): Queue of the apps waiting for verification.
+        """
 
         super().__init__()
 
@@ -231,27 +253,40 @@ class VerifyWindow(QMainWindow):
         self.setCentralWidget(central_widget)
 
         self.monitor_window = MonitorWindow(False)
+        self.verification_queue = verification_queue
 
         self.image_label = QLabel(self)
 
         self.text_label = QLabel("Awaiting verification")
 
+        self.queue_label = QLabel()
+
         verify_button = QPushButton("Verify")
         self.face_verifier = FaceVerifier()
         self.current_image = np.ndarray((250, 250, 3))
+        self.current_frame = None
         verify_button.clicked.connect(self.call_verification)
         self.face_verifier.verified_signal.connect(self.close_window)
+        self.face_verifier.speculative_signal.connect(self.accept_speculative)
 
         vbox = QVBoxLayout()
         vbox.addWidget(self.image_label, alignment=Qt.AlignCenter)
         vbox.addWidget(self.text_label, alignment=Qt.AlignCenter)
+        vbox.addWidget(self.queue_label, alignment=Qt.AlignCenter)
         vbox.addWidget(verify_button)
         central_widget.setLayout(vbox)
 
+        self.update_queue()
+
         self.thread = VideoThread()
         self.thread.image_signal.connect(self.save_cv_image)
+        self.thread.frame_signal.connect(self.save_cv_frame)
         self.thread.pixmap_signal.connect(self.update_image)
         self.thread.start()
+        get_governor().boost("verify_window")
+        FaceVerifier.speculative.start(
+            self.face_verifier, self.verification_queue.pending()[0]["enqueued"]
+        )
 
     def closeEvent(self, event):
         """Modifies variables and threads when the window closes.
@@ -265,6 +300,7 @@ class VerifyWindow(QMainWindow):
             event (QCloseEvent): event that is created when the window is closed.
         """
 
+        FaceVerifier.speculative.stop()
         self.verified_status.emit("", "")
         self.thread.stop()
         event.accept()
@@ -280,22 +316,28 @@ class VerifyWindow(QMainWindow):
 
         self.thread.stop()
         self.pause_status.emit(True)
-        self.face_verifier.verify(self.current_image, self.text_label)
-
-    def save_app_data(self, name, path):
-        """Saves app information to be used in the monitor window.
+        get_governor().boost("verify_window")
+        self.face_verifier.verify(
+            self.current_image, self.text_label, self.current_frame
+        )
 
-        Saves the app name and file path for the monitor window to
-        use if the user is verified to use the app this verify window is
-        open for.
+    @Slot()
+    def accept_speculative(self):
+        """Verifies right away when a background verification is accepted without pressing verify.
 
-        Args:
-            name (str): name of an app
-            path (str): file path of an app
+        The decision may already have been used by pressing verify, so
+        nothing is done unless it's still waiting.
         """
 
-        self.saved_name = name
-        self.saved_path = path
+        if self.isVisible() and FaceVerifier.speculative.ready():
+            self.call_verification()
+
+    def update_queue(self):
+        """Updates the label that lists the apps waiting for verification."""
+
+        names = [entry["name"] for entry in self.verification_queue.pending()]
+        self.queue_label.setText("Waiting: " + ", ".join(names))
+        self.face_verifier.app_name = ", ".join(names)
 
     @Slot(bool)
     def close_window(self, result):
@@ -303,36 +345,59 @@ class VerifyWindow(QMainWindow):
 
         If the verify method emits true this method emits data to re-create
         the monitor thread and update one of it's variables so that it
-        doesn't monitor the app that the user was just verified for.
+        doesn't monitor the apps that the user was just verified for. The
+        window stays open while other apps are still waiting to be verified.
 
         Args:
             result (bool): Result of verification.
         """
 
+        self.pause_status.emit(False)
+
         if result == True:
-            self.pause_status.emit(False)
-            self.verified_status.emit(self.saved_name, self.saved_path)
-            self.close()
+            for entry in self.verification_queue.take_verified():
+                self.verified_status.emit(entry["name"], entry["path"])
 
-        else:
-            self.pause_status.emit(False)
-            self.thread = VideoThread()
-            self.thread.image_signal.connect(self.save_cv_image)
-            self.thread.pixmap_signal.connect(self.update_image)
-            self.thread.start()
+            if len(self.verification_queue) == 0:
+                self.close()
+                return
+
+            self.text_label.setText("Verified, please verify again for the next app")
+            self.update_queue()
+
+        self.thread = VideoThread()
+        self.thread.image_signal.connect(self.save_cv_image)
+        self.thread.frame_signal.connect(self.save_cv_frame)
+        self.thread.pixmap_signal.connect(self.update_image)
+        self.thread.start()
 
     @Slot(np.ndarray)
     def save_cv_image(self, cv_image):
         """Saves a opencv image to a variable.
 
         Saves the current webcam image to a variable that is used
-        in the verify function as the input image.
+        in the verify function as the input image, and passes it on
+        to the background verification.
 
         Args:
             cv_image (ndarray): Current OpenCV image of the user's webcam.
         """
 
         self.current_image = cv_image
+        FaceVerifier.speculative.submit(cv_image)
+
+    @Slot(np.ndarray)
+    def save_cv_frame(self, cv_frame):
+        """Saves the full webcam frame to a variable.
+
+        Used in the verify function to find every face in view when multiple
+        face verification is enabled.
+
+        Args:
+            cv_frame (ndarray): Current full OpenCV frame of the user's webcam.
+        """
+
+        self.current_frame = cv_frame
 
     @Slot(QPixmap)
     def update_image(self, pix_map):
@@ -355,7 +420,8 @@ class UpdateIDWindow(QMainWindow):
     Creates widgets to display the user's webcam and to start/confirm if the user wants to take
     new id images. Class objects are used to create a video thread to display the user's webcam
     and add/replace the old id images with the user's new ones.The class used to update the face
-    id images can be found at "face_id/face_verification" with the name "IDUpdater".
+    id images can be found at "face_id/face_verification" with the name "IDUpdater". The images are
+    saved in a background thread once the countdown ends, and the window is told when they're saved.
 
     """
 
@@ -381,6 +447,8 @@ class UpdateIDWindow(QMainWindow):
 
         update_button = QPushButton("Update ID images")
         self.id_updater = IDUpdater()
+        self.id_updater.updated_signal.connect(self.finish_update)
+        self.updating = False
         self.image_array = []
         self.array_idx = 0
         update_button.clicked.connect(self.confirm_update)
@@ -419,18 +487,18 @@ class UpdateIDWindow(QMainWindow):
         event.accept()
 
     def confirm_update(self):
-        """Creates a warning message and calls update methods.
+        """Creates a warning message and starts the update countdown.
 
-        If the user has face id images in the folder "face_id/image_data/verification_images"
-        a warning message is created that calls methods to replace these images if the user
-        selects "yes". If the user has no face id images then the methods are called without
-        the warning message.
+        If the user has face id images a warning message is created that starts
+        the countdown to replace these images if the user selects "yes". If the
+        user has no face id images then the countdown starts without the warning
+        message.
         """
 
-        dir_path = os.path.join("face_id/image_data", "verification_images")
-        self.seconds = 6
+        if self.updating == True:
+            return
 
-        if len(os.listdir(dir_path)) > 0:
+        if len(GalleryStore().load()["templates"]) > 0:
             answer = QMessageBox.question(
                 self,
                 "Confirmation",
@@ -438,23 +506,20 @@ class UpdateIDWindow(QMainWindow):
                 QMessageBox.Yes | QMessageBox.No,
             )
 
-            if answer == QMessageBox.Yes:
-                self.text_label.setText("Capturing pictures...")
-                self.timer.start(1000)
-                timer_thread = Timer(7, self.id_updater.update, args=[self.image_array])
-                timer_thread.start()
+            if answer != QMessageBox.Yes:
+                return
 
-        else:
-            self.text_label.setText("Capturing pictures...")
-            self.timer.start(1000)
-            timer_thread = Timer(7, self.id_updater.update, args=[self.image_array])
-            timer_thread.start()
+        self.updating = True
+        self.seconds = 6
+        self.text_label.setText("Capturing pictures...")
+        self.timer.start(1000)
 
     def update_timer(self):
         """Updates a timer that is displayed in the update id window.
 
         Changes a window label to display a countdown timer before any
-        new face id images are saved.
+        new face id images are saved. When the countdown ends the captured
+        images are saved in a background thread.
         """
 
         self.seconds -= 1
@@ -463,8 +528,29 @@ class UpdateIDWindow(QMainWindow):
 
         else:
             self.timer.stop()
-            self.text_label.setText("Sucssesfully updated ID images!")
+            self.text_label.setText("Saving ID images...")
             self.count_label.setText("")
+            Thread(
+                target=self.id_updater.update,
+                args=[list(self.image_array)],
+                daemon=True,
+            ).start()
+
+    @Slot(bool)
+    def finish_update(self, result):
+        """Shows if the new face id images were saved.
+
+        Args:
+            result (bool): If the images were saved.
+        """
+
+        self.updating = False
+
+        if result == True:
+            self.text_label.setText("Sucssesfully updated ID images!")
+
+        else:
+            self.text_label.setText("Could not save ID images, please try again")
 
     def open_main_window(self):
         """Allows the user to return to the main window.
@@ -473,9 +559,12 @@ class UpdateIDWindow(QMainWindow):
         if there are saved face id images.
         """
 
-        dir_path = os.path.join("face_id/image_data", "verification_images")
+        if self.updating == True:
+            QMessageBox.warning(
+                self, "Warning", "Please wait until your ID images are saved."
+            )
 
-        if len(os.listdir(dir_path)) == 0:
+        elif len(GalleryStore().load()["templates"]) == 0:
             QMessageBox.warning(
                 self,
                 "Warning",
@@ -533,9 +622,11 @@ class ManagerWindow(QWidget):
     """
     Creates a pyqt5 window that browses apps to be added/removed from being protected by this app.
 
-    Creates widgets to show the current list of protected apps and a button that allows the user
-    to search through their files and select an app to add. Apps can also be removed from the
-    list by pressing the "remove protection" button next to each app.
+    Shows the protected apps in a list view backed by a list model, so adding or removing apps
+    only updates the changed rows. The list can be searched, apps can be added by browsing for
+    them or by importing an app list, the whole list can be exported, and the selected apps can
+    be removed with the "remove protection" button. The model can be found in
+    "face_id/protected_apps".
 
     """
 
@@ -548,22 +639,49 @@ class ManagerWindow(QWidget):
 
         self.grid = QGridLayout()
 
-        self.horizontal_grid_layout = QGridLayout()
-        self.create_file_grid()
+        self.protected_model = ProtectedAppsModel(
+            load_settings("monitor")["protected_path"]
+        )
+
+        self.filter_model = QSortFilterProxyModel()
+        self.filter_model.setSourceModel(self.protected_model)
+        self.filter_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search protected apps")
+        self.search_input.textChanged.connect(self.filter_model.setFilterFixedString)
+
+        self.list_view = QListView()
+        self.list_view.setModel(self.filter_model)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
 
         self.vertical_layout = QVBoxLayout()
 
+        remove_button = QPushButton("Remove protection")
+        remove_button.clicked.connect(self.remove_selected)
+
         browse_button = QPushButton("Search for a file to protect")
         browse_button.clicked.connect(self.browse_files)
 
+        import_button = QPushButton("Import app list")
+        import_button.clicked.connect(self.import_list)
+
+        export_button = QPushButton("Export app list")
+        export_button.clicked.connect(self.export_list)
+
         back_button = QPushButton("back")
         back_button.clicked.connect(self.open_main_window)
 
+        self.vertical_layout.addWidget(remove_button)
         self.vertical_layout.addWidget(browse_button)
+        self.vertical_layout.addWidget(import_button)
+        self.vertical_layout.addWidget(export_button)
         self.vertical_layout.addWidget(back_button)
 
-        self.grid.addLayout(self.horizontal_grid_layout, 0, 0)
-        self.grid.addLayout(self.vertical_layout, 1, 0)
+        self.grid.addWidget(self.search_input, 0, 0)
+        self.grid.addWidget(self.list_view, 1, 0)
+        self.grid.addLayout(self.vertical_layout, 2, 0)
         self.setLayout(self.grid)
 
     def browse_files(self):
@@ -585,96 +703,84 @@ class ManagerWindow(QWidget):
         self.protected_name = os.path.basename(name[0])
         self.add_array_element(self.protected_name)
 
-    def load_array(self):
-        """Loads an array of apps that are protected."""
-
-        with open("face_id/protected_data.json", "r") as open_file:
-            self.protected_array = json.load(open_file)
-
-    def save_array(self):
-        """Saves a new array of protected apps to a file."""
-
-        with open("face_id/protected_data.json", "w") as save_file:
-            json.dump(self.protected_array, save_file)
-
     def add_array_element(self, file_name):
-        """Adds a selected app to the protected apps array.
+        """Adds a selected app to the protected apps.
 
-        If the selected app isn't the same as any other apps in the
-        list, it is added to the list and methods are called to update the
-        manager window.
+        If the selected app isn't already protected it's added to the end of the
+        list and saved. Duplicates are found with a set lookup, not a scan.
 
         Args:
             file_name (str): Name of the selected app.
         """
 
-        can_add = True
-        for name in self.protected_array:
-            if file_name == name:
-                QMessageBox.warning(self, "Warning", "Application is already protected")
-                can_add = False
-
         if file_name == "":
-            can_add = False
+            return
 
-        if can_add == True:
-            print(len(self.protected_array))
+        if self.protected_model.contains(file_name):
+            QMessageBox.warning(self, "Warning", "Application is already protected")
+            return
 
-            if len(self.protected_array) != 0:
-                self.clear_file_grid()
+        self.protected_model.add(file_name)
 
-            self.protected_array.append(file_name)
-            self.save_array()
-            self.create_file_grid()
+    def remove_selected(self):
+        """Removes the selected apps from the protected apps.
 
-    def remove_array_element(self, idx):
-        """Removes an app from the protected apps array.
+        The selected rows of the filtered list are mapped back to rows of the
+        protected apps model, which removes them and saves the list.
+        """
 
-        Pops the selected app off the array and calls methods
-        to update the manager window.
+        rows = [
+            self.filter_model.mapToSource(index).row()
+            for index in self.list_view.selectionModel().selectedRows()
+        ]
+        self.protected_model.remove_rows(rows)
 
-        Args:
-            idx (int): Index of the app to be removed.
-        """
+    def import_list(self):
+        """Adds every app in a json list or a text file with one app name per line."""
 
-        self.clear_file_grid()
-        self.protected_array.pop(idx)
-        self.save_array()
-        self.create_file_grid()
+        options = QFileDialog.Options()
+        options |= QFileDialog.DontUseNativeDialog
+        name = QFileDialog.getOpenFileName(
+            self,
+            "Import app list",
+            "",
+            "App Lists (*.json *.txt);;All Files (*)",
+            options=options,
+        )
 
-    def clear_file_grid(self):
-        """Removes all widgets in the grid displaying the protected apps.
+        if name[0] == "":
+            return
 
-        Loops through all rows and columbs of the grid layout used to
-        display the protected apps and their "remove protection" buttons
-        and removes all widgets.
-        """
+        try:
+            added = self.protected_model.import_file(name[0])
 
-        for row in range(self.horizontal_grid_layout.rowCount()):
-            for col in range(self.horizontal_grid_layout.columnCount()):
-                item = self.horizontal_grid_layout.itemAtPosition(row, col)
-                widget = item.widget()
-                widget.deleteLater()
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Warning", f"Could not import app list: {error}")
+            return
 
-    def create_file_grid(self):
-        """Adds widgets to a grid that displays the protected apps and their buttons.
+        QMessageBox.information(self, "Import", f"Added {added} apps")
 
-        Creates labels and buttons for every element of the protected_array, and adds
-        them to a grid that's displayed at the top of the manager window.
-        """
+    def export_list(self):
+        """Saves the protected apps to a json list or a text file with one app name per line."""
 
-        self.load_array()
+        options = QFileDialog.Options()
+        options |= QFileDialog.DontUseNativeDialog
+        name = QFileDialog.getSaveFileName(
+            self,
+            "Export app list",
+            "protected_apps.json",
+            "App Lists (*.json *.txt);;All Files (*)",
+            options=options,
+        )
 
-        for idx in range(len(self.protected_array)):
-            file_label = QLabel("" + self.protected_array[idx])
+        if name[0] == "":
+            return
 
-            file_button = QPushButton("Remove protection")
-            file_button.clicked.connect(
-                lambda checked, index=idx: self.remove_array_element(index)
-            )
+        try:
+            self.protected_model.export_file(name[0])
 
-            self.horizontal_grid_layout.addWidget(file_label, idx, 0)
-            self.horizontal_grid_layout.addWidget(file_button, idx, 1)
+        except OSError as error:
+            QMessageBox.warning(self, "Warning", f"Could not export app list: {error}")
 
     def open_main_window(self):
         """Opens the main window and closes current window."""
@@ -690,9 +796,10 @@ class MonitorWindow(QMainWindow):
 
     Creates a window that monitors if any protected app is opened by using a
     thread that constantly looks if those apps are open. If a protected app is
-    open it is closed and a verfiy window is created, which closes if the user's image is verified
-    and re-opens the app. The thread used can be found in "face_id/face_verification" with the
-    name "MonitorThread".
+    open it is closed, added to the verification queue and a verfiy window is created,
+    which closes if the user's image is verified and re-opens the apps. Apps that wait
+    in the queue for too long are removed from it. The thread used can be found in
+    "face_id/face_verification" with the name "MonitorThread".
 
 
     """
@@ -717,7 +824,7 @@ class MonitorWindow(QMainWindow):
 
         self.verifying = False
 
-        self.app_name = ""
+        self.verification_queue = VerificationQueue.from_settings()
 
         self.monitor_thread = MonitorThread()
 
@@ -736,6 +843,10 @@ class MonitorWindow(QMainWindow):
             self.thread.file_opened.connect(self.open_verify_window)
             self.thread.start()
 
+            self.queue_timer = QTimer()
+            self.queue_timer.timeout.connect(self.expire_requests)
+            self.queue_timer.start(1000)
+
     def closeEvent(self, event):
         """Modifies variables and threads when the window closes.
 
@@ -747,7 +858,19 @@ class MonitorWindow(QMainWindow):
             event (QCloseEvent): event that is created when the window is closed.
         """
 
+        if hasattr(self, "queue_timer"):
+            self.queue_timer.stop()
+
         self.thread.stop()
+        self.monitor_thread.terminate_all_held()
+        MonitorThread.approval_cache.report()
+        MonitorThread.event_dispatcher.report()
+        MonitorThread.lifetime_tracker.report()
+        FaceVerifier.model_manager.report()
+        FaceVerifier.cascade.report()
+        FaceVerifier.shadow.report()
+        FaceVerifier.speculative.report()
+        get_governor().report()
         event.accept()
 
     @Slot(bool)
@@ -774,51 +897,91 @@ class MonitorWindow(QMainWindow):
         """Updates thread value and opens an app that the user was verified for.
 
         Sets a value in the monitor thread to stop it from monitoring the app
-        the user was just verified for and opens that app. Also sets "verifying"
-        to False so that other verify windows can be opened.
+        the user was just verified for and resumes the app if it was held, or
+        opens it again if it was terminated. Empty strings are passed when the
+        verify window closes, which sets "verifying" to False so that other verify
+        windows can be opened and removes any apps that were still waiting in the
+        verification queue, terminating them if they were held.
 
         Args:
             name (str): Name of an app.
             path (str): File path of an app.
         """
 
-        self.verifying = False
+        if name == "":
+            self.verifying = False
+
+            for entry in self.verification_queue.clear():
+                self.monitor_thread.resolve_request(entry["name"])
+                self.monitor_thread.terminate_held(entry["name"], "cancelled")
+                print(f"Verification cancelled: {entry['name']}")
 
-        if name != "":
-            self.monitor_thread.update_verified_status(name)
+        else:
+            self.monitor_thread.resolve_request(name)
+            self.monitor_thread.update_verified_status(name, path)
+
+            if len(self.monitor_thread.resume_held(name, path)) > 0:
+                return
 
             try:
-                os.startfile(path)
+                launch_app(path)
 
             except FileNotFoundError:
                 print("Application not found.")
 
     @Slot(str, str)
     def open_verify_window(self, process_name, path):
-        """Opens a verify window and prevents multiple copies from being created.
+        """Queues an app for verification and opens a verify window if none is open.
 
-        If "verifying" is set to false this method creates a verify window. If
-        "verifiying" is set to True then no other verify windows can be created
-        until it is closed.
+        Adds the app to the verification queue and starts loading the model if it
+        was released while idle. If "verifying" is set to false this
+        method creates a verify window. If "verifiying" is set to True the open verify
+        window is updated to show the newly queued app instead.
 
         Args:
             process_name (str): Name of an app.
             path (str): File path of an app.
         """
 
-        self.app_name = process_name
-        self.app_path = path
+        if not self.verification_queue.enqueue(process_name, path):
+            return
+
+        FaceVerifier.model_manager.warm()
 
         if self.verifying == True:
-            print("second window already open")
+            self.verify_window.update_queue()
 
         else:
             self.verifying = True
-            self.second_window = VerifyWindow()
-            self.second_window.pause_status.connect(self.pause_thread)
-            self.second_window.verified_status.connect(self.set_verified)
-            self.second_window.save_app_data(self.app_name, self.app_path)
-            self.second_window.show()
+            self.verify_window = VerifyWindow(self.verification_queue)
+            self.verify_window.pause_status.connect(self.pause_thread)
+            self.verify_window.verified_status.connect(self.set_verified)
+            self.verify_window.show()
+
+    def expire_requests(self):
+        """Removes apps that have waited in the verification queue for too long.
+
+        Closes the verify window if no apps are left waiting.
+        """
+
+        expired = self.verification_queue.expire()
+
+        for entry in expired:
+            self.monitor_thread.resolve_request(entry["name"])
+            self.monitor_thread.terminate_held(entry["name"], "timeout")
+            audit("verification_timeout", app=entry["name"], exe=entry["path"])
+            print(f"Verification timed out: {entry['name']}")
+
+        for app_name in self.monitor_thread.process_holder.expire():
+            audit("hold_timeout", app=app_name)
+            print(f"Hold timed out: {app_name}")
+
+        if len(expired) > 0 and self.verifying == True:
+            if len(self.verification_queue) == 0:
+                self.verify_window.close()
+
+            else:
+                self.verify_window.update_queue()
 
     def open_main_window(self):
         """Opens the main window and closes current window."""
@@ -876,7 +1039,7 @@ class MainWindow(QMainWindow):
     def open_manager_window(self):
         """Opens the manager window, creates a file and closes this window."""
 
-        data_path = "face_id/protected_data.json"
+        data_path = load_settings("monitor")["protected_path"]
 
         if not os.path.exists(data_path):
             with open(data_path, "w") as fp:
@@ -896,6 +1059,9 @@ class MainWindow(QMainWindow):
 
 app = QApplication(sys.argv)
 
+watchdog = EventLoopWatchdog.from_settings()
+watchdog.start()
+
 data_path = "credentials.json"
 
 if not os.path.exists(data_path):
@@ -912,3 +1078,4 @@ else:
 window.show()
 
 app.exec()
+watchdog.report()
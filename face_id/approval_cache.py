@@ -0,0 +1,377 @@
+import getpass
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+
+from face_id.audit_log import audit
+from face_id.settings import load_settings
+
+
+def normalize_user(user):
+    """Normalizes a user name so it can be compared with the current user.
+
+    psutil gives process owners as "DOMAIN\\user" on Windows, while
+    getpass gives only the user name, and Windows user names aren't case
+    sensitive.
+
+    Args:
+        user (str): Name of a user, with or without a domain.
+
+    Returns:
+        str: The user name without its domain, in lower case on Windows.
+    """
+
+    user = user.rsplit("\\", 1)[-1]
+
+    if sys.platform == "win32":
+        user = user.lower()
+
+    return user
+
+
+class ApprovalCache:
+    """
+    Stores which protected apps the user has been verified to use, for a limited time.
+
+    Approvals are keyed by an app's name or exe path, and optionally by the user that owns
+    the process and the process id. Every approval expires after a fixed time to live, and
+    also after it hasn't been used for an idle timeout. The cache holds a limited number of
+    approvals and drops the least recently used one when it's full. Hits, misses, expiries
+    and evictions are counted so they can be reported.
+
+    Approvals are only needed when an app is launched. Once a launch is approved its
+    processes are admitted, and keep running until they exit even after the approval
+    expires. When approvals are kept per process id, an approval made without one, such
+    as for an app that is opened again after it was terminated, is taken by the next
+    launch of the app and then belongs to its process id.
+
+    Attributes:
+        ttl_seconds (float): Seconds an approval is valid for after the user is verified.
+        idle_seconds (float): Seconds an approval is valid for after it was last used.
+        max_entries (int): Largest number of approvals that are stored at once.
+        key_by (str): "name" to key approvals by app name, or "exe" to key by exe path.
+        per_user (bool): If approvals are also keyed by the user that owns the process.
+        per_pid (bool): If approvals are also keyed by the process id.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds=900,
+        idle_seconds=300,
+        max_entries=64,
+        key_by="name",
+        per_user=False,
+        per_pid=False,
+    ):
+        """Initializes the approval cache.
+
+        Args:
+            ttl_seconds (float): Seconds an approval is valid for, 0 to disable.
+            idle_seconds (float): Seconds an unused approval is valid for, 0 to disable.
+            max_entries (int): Largest number of approvals that are stored at once.
+            key_by (str): "name" or "exe", the app value used in the key.
+            per_user (bool): If approvals are also keyed by the process owner.
+            per_pid (bool): If approvals are also keyed by the process id.
+        """
+
+        self.ttl_seconds = ttl_seconds
+        self.idle_seconds = idle_seconds
+        self.max_entries = max_entries
+        self.key_by = key_by
+        self.per_user = per_user
+        self.per_pid = per_pid
+
+        self._entries = OrderedDict()
+        self._admitted = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expiries": 0,
+            "evictions": 0,
+            "revocations": 0,
+            "admissions": 0,
+        }
+
+    @classmethod
+    def from_settings(cls):
+        """Creates an approval cache from the "approval_cache" settings section.
+
+        Returns:
+            ApprovalCache: Cache using the saved or default settings.
+        """
+
+        return cls(**load_settings("approval_cache"))
+
+    def make_key(self, name, exe=None, pid=None, user=None):
+        """Creates the key an approval is stored under.
+
+        Args:
+            name (str): Name of an app.
+            exe (str): File path of an app.
+            pid (int): Process id of the app.
+            user (str): Name of the user that owns the process, the current user if None.
+
+        Returns:
+            tuple: Key for the approval.
+        """
+
+        app = exe if self.key_by == "exe" and exe else name
+        key = (app,)
+
+        if self.per_user:
+            key += (normalize_user(user if user is not None else getpass.getuser()),)
+
+        if self.per_pid:
+            key += (pid,)
+
+        return key
+
+    def is_approved(self, name, exe=None, pid=None, user=None):
+        """Checks if an app has an approval that hasn't expired.
+
+        Approvals that have gone past their time to live or idle timeout are
+        removed and counted as expired. A valid approval is marked as the most
+        recently used one. When approvals are kept per process id and there is
+        none for the process, an approval made without a process id is moved
+        to it.
+
+        Args:
+            name (str): Name of an app.
+            exe (str): File path of an app.
+            pid (int): Process id of the app.
+            user (str): Name of the user that owns the process.
+
+        Returns:
+            bool: True if the app is approved.
+        """
+
+        key = self.make_key(name, exe, pid, user)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None and self.per_pid and pid is not None:
+                pending_key = key[:-1] + (None,)
+                entry = self._entries.pop(pending_key, None)
+
+                if entry is not None:
+                    self._entries[key] = entry
+
+            if entry is None:
+                self._stats["misses"] += 1
+                return False
+
+            if self._is_expired(entry, now):
+                del self._entries[key]
+                self._stats["expiries"] += 1
+                self._stats["misses"] += 1
+                print(f"Approval expired: {key[0]}")
+                audit("approval_expired", app=key[0])
+                return False
+
+            entry["last_used"] = now
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True
+
+    def approve(self, name, exe=None, pid=None, user=None):
+        """Adds or refreshes the approval for an app.
+
+        If the cache is full the least recently used approval is removed.
+
+        Args:
+            name (str): Name of an app.
+            exe (str): File path of an app.
+            pid (int): Process id of the app.
+            user (str): Name of the user that owns the process.
+        """
+
+        key = self.make_key(name, exe, pid, user)
+        now = time.monotonic()
+
+        with self._lock:
+            self._entries[key] = {"approved_at": now, "last_used": now}
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+                print(f"Approval evicted: {evicted_key[0]}")
+                audit("approval_evicted", app=evicted_key[0])
+
+    def admit(self, name, exe=None, processes=()):
+        """Lets the processes of an approved launch run until they exit.
+
+        Args:
+            name (str): Name of an app.
+            exe (str): File path of an app.
+            processes (list): Process id and creation time of every process of the launch.
+        """
+
+        app = exe if self.key_by == "exe" and exe else name
+
+        with self._lock:
+            for process in processes:
+                if process not in self._admitted:
+                    self._admitted[process] = app
+                    self._stats["admissions"] += 1
+
+    def is_admitted(self, pid, create_time):
+        """Checks if a process belongs to a launch that was approved.
+
+        Args:
+            pid (int): Process id.
+            create_time (float): Time the process was created, to tell a reused process id apart.
+
+        Returns:
+            bool: True if the process can keep running.
+        """
+
+        with self._lock:
+            return (pid, create_time) in self._admitted
+
+    def prune_admitted(self, running):
+        """Forgets the admitted processes that are no longer running.
+
+        Args:
+            running (set): Process id and creation time of every running protected process.
+        """
+
+        with self._lock:
+            for process in [p for p in self._admitted if p not in running]:
+                del self._admitted[process]
+
+    def revoke(self, name, exe=None):
+        """Removes every approval for an app.
+
+        Every approval for the app is removed, no matter which user or process
+        id it was stored for, and its running processes are no longer admitted.
+
+        Args:
+            name (str): Name of an app.
+            exe (str): File path of an app.
+
+        Returns:
+            int: Number of approvals that were removed.
+        """
+
+        app = exe if self.key_by == "exe" and exe else name
+
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == app]
+
+            for key in keys:
+                del self._entries[key]
+
+            for process in [p for p, a in self._admitted.items() if a == app]:
+                del self._admitted[process]
+
+            self._stats["revocations"] += len(keys)
+
+        return len(keys)
+
+    def age(self, name, exe=None, seconds=30):
+        """Shortens every approval for an app so it expires within a number of seconds.
+
+        Args:
+            name (str): Name of an app.
+            exe (str): File path of an app.
+            seconds (float): Seconds the approvals are still valid for.
+
+        Returns:
+            int: Number of approvals that were shortened.
+        """
+
+        app = exe if self.key_by == "exe" and exe else name
+        expires_at = time.monotonic() + seconds
+
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == app]
+
+            for key in keys:
+                entry = self._entries[key]
+                entry["expires_at"] = min(entry.get("expires_at", expires_at), expires_at)
+
+        return len(keys)
+
+    def clear(self):
+        """Removes every approval from the cache."""
+
+        with self._lock:
+            self._stats["revocations"] += len(self._entries)
+            self._entries.clear()
+            self._admitted.clear()
+
+    def purge_expired(self):
+        """Removes every approval that has expired.
+
+        Returns:
+            int: Number of approvals that were removed.
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            keys = [
+                key for key, entry in self._entries.items()
+                if self._is_expired(entry, now)
+            ]
+
+            for key in keys:
+                del self._entries[key]
+
+            self._stats["expiries"] += len(keys)
+
+        return len(keys)
+
+    def stats(self):
+        """Returns the cache's counters and current size.
+
+        Returns:
+            dict: Number of hits, misses, expiries, evictions, revocations, entries and admitted processes.
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["admitted"] = len(self._admitted)
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def report(self):
+        """Prints the cache's counters."""
+
+        stats = self.stats()
+        print(
+            f"Approval cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['expiries']} expired, {stats['evictions']} evicted, "
+            f"{stats['entries']} active, {stats['admitted']} processes admitted"
+        )
+
+    def _is_expired(self, entry, now):
+        """Checks if an approval has gone past its time to live, idle timeout or aged expiry.
+
+        Args:
+            entry (dict): Times the approval was created, last used and, if it was aged, expires.
+            now (float): Current monotonic time.
+
+        Returns:
+            bool: True if the approval has expired.
+        """
+
+        if self.ttl_seconds and now - entry["approved_at"] > self.ttl_seconds:
+            return True
+
+        if self.idle_seconds and now - entry["last_used"] > self.idle_seconds:
+            return True
+
+        if "expires_at" in entry and now > entry["expires_at"]:
+            return True
+
+        return False
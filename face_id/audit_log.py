@@ -0,0 +1,393 @@
+"""Append-only audit log of detections, enforcement, verification and gallery changes.
+
+Records are queued without blocking and written as json lines by a background
+thread in batches. Full log files are rotated and compressed. The log can be
+filtered by time range, app and event type:
+
+    python -m face_id.audit_log query --since 2026-01-01T00:00 --app chrome.exe
+"""
+
+import argparse
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+from datetime import datetime
+
+from face_id.settings import load_settings
+
+
+class AuditLog:
+    """
+    Writes audit records to a json lines file from a background thread.
+
+    record() only puts the record on a queue, so the monitor and GUI threads never wait
+    for the disk. The writer thread saves records in batches, syncs the file to disk
+    according to the fsync policy, and rotates the file into a compressed archive once it
+    reaches its size limit. If the queue is full, records are dropped and counted instead
+    of blocking. Records that can't be saved, and failed writes or rotations, are printed
+    and counted as dropped without stopping the writer thread.
+
+    Attributes:
+        path (str): File path of the active log file.
+        batch_size (int): Largest number of records written at once.
+        flush_interval_seconds (float): Longest time a record waits before it's written.
+        fsync (str): "always" to sync every batch, "interval" to sync periodically, or "never".
+        fsync_interval_seconds (float): Seconds between syncs with the "interval" policy.
+        max_bytes (int): Size the log file is rotated at.
+        max_files (int): Number of compressed archives that are kept.
+        dropped (int): Number of records dropped because the queue was full or they couldn't be saved.
+    """
+
+    def __init__(
+        self,
+        path="face_id/audit/audit.jsonl",
+        batch_size=64,
+        flush_interval_seconds=1.0,
+        fsync="interval",
+        fsync_interval_seconds=5.0,
+        max_bytes=5 * 1024 * 1024,
+        max_files=10,
+        queue_size=10000,
+    ):
+        """Initializes the audit log and starts its writer thread.
+
+        Args:
+            path (str): File path of the active log file.
+            batch_size (int): Largest number of records written at once.
+            flush_interval_seconds (float): Longest time a record waits before it's written.
+            fsync (str): "always", "interval" or "never".
+            fsync_interval_seconds (float): Seconds between syncs with the "interval" policy.
+            max_bytes (int): Size the log file is rotated at.
+            max_files (int): Number of compressed archives that are kept.
+            queue_size (int): Largest number of records waiting to be written.
+        """
+
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.fsync = fsync
+        self.fsync_interval_seconds = fsync_interval_seconds
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.dropped = 0
+
+        self._dropped_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._last_sync = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name="audit-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    @classmethod
+    def from_settings(cls):
+        """Creates an audit log from the "audit_log" settings section.
+
+        Returns:
+            AuditLog: Audit log using the saved or default settings.
+        """
+
+        return cls(**load_settings("audit_log"))
+
+    def record(self, event_type, **fields):
+        """Queues a record to be written without waiting.
+
+        Args:
+            event_type (str): Type of event, such as "detection" or "verification".
+            **fields: Values saved with the record, such as the app name.
+        """
+
+        entry = {"time": time.time(), "type": event_type}
+        entry.update(fields)
+
+        try:
+            self._queue.put_nowait(entry)
+
+        except queue.Full:
+            self._count_dropped(1)
+
+    def close(self, timeout=5.0):
+        """Writes every queued record and stops the writer thread.
+
+        Args:
+            timeout (float): Longest time to wait for the writer thread.
+        """
+
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self):
+        """Writes batches of queued records until the log is closed."""
+
+        log_file = self._open()
+        running = True
+
+        while running:
+            batch = []
+
+            try:
+                entry = self._queue.get(timeout=self.flush_interval_seconds)
+                batch.append(entry)
+
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+
+            except queue.Empty:
+                pass
+
+            if None in batch:
+                running = False
+                batch = [entry for entry in batch if entry is not None]
+
+            lines = [line for line in map(self._encode, batch) if line is not None]
+
+            try:
+                if len(lines) > 0:
+                    log_file.write("".join(lines))
+                    log_file.flush()
+
+                if self._should_sync(len(lines) > 0, closing=not running):
+                    os.fsync(log_file.fileno())
+                    self._last_sync = time.monotonic()
+
+            except OSError as error:
+                self._count_dropped(len(lines))
+                print(f"Could not write the audit log: {error}")
+
+            if log_file.tell() >= self.max_bytes:
+                try:
+                    os.fsync(log_file.fileno())
+                    log_file.close()
+                    self._rotate()
+
+                except OSError as error:
+                    log_file.close()
+                    print(f"Could not rotate the audit log: {error}")
+
+                log_file = self._open()
+
+        log_file.close()
+
+    def _open(self):
+        """Opens the active log file, retrying with a growing delay until it opens.
+
+        Records keep queueing while the file can't be opened, and are dropped
+        and counted once the queue is full.
+
+        Returns:
+            file: The log file, opened for appending.
+        """
+
+        delay = 1.0
+
+        while True:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                return open(self.path, "a", encoding="utf-8")
+
+            except OSError as error:
+                print(f"Could not open the audit log, retrying in {delay:.0f} s: {error}")
+                time.sleep(delay)
+                delay = min(delay * 2, 60.0)
+
+    def _count_dropped(self, count):
+        """Counts records that were dropped, from any thread.
+
+        Args:
+            count (int): Number of dropped records.
+        """
+
+        with self._dropped_lock:
+            self.dropped += count
+
+    def _encode(self, entry):
+        """Encodes a record as a json line.
+
+        Values json can't encode, such as numpy numbers, are saved as strings.
+
+        Args:
+            entry (dict): The record.
+
+        Returns:
+            str: The json line, or None if the record can't be encoded.
+        """
+
+        try:
+            return json.dumps(entry, default=str) + "\n"
+
+        except (TypeError, ValueError) as error:
+            self._count_dropped(1)
+            print(f"Could not save audit record {entry.get('type')}: {error}")
+            return None
+
+    def _should_sync(self, wrote, closing=False):
+        """Checks if the log file should be synced to disk under the fsync policy.
+
+        Args:
+            wrote (bool): If records were written since the last check.
+            closing (bool): If the log is being closed.
+
+        Returns:
+            bool: True if the file should be synced.
+        """
+
+        if self.fsync == "never":
+            return False
+
+        if closing:
+            return True
+
+        if not wrote:
+            return False
+
+        if self.fsync == "always":
+            return True
+
+        return time.monotonic() - self._last_sync >= self.fsync_interval_seconds
+
+    def _rotate(self):
+        """Compresses the full log file into an archive and deletes old archives."""
+
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        archive_path = f"{self.path}.{stamp}.gz"
+
+        with open(self.path, "rb") as source, gzip.open(archive_path, "wb") as target:
+            shutil.copyfileobj(source, target)
+
+        os.remove(self.path)
+
+        archives = sorted(glob.glob(self.path + ".*.gz"))
+        for old_archive in archives[: -self.max_files] if self.max_files else []:
+            os.remove(old_archive)
+
+
+_audit_log = None
+_audit_log_lock = threading.Lock()
+
+
+def get_audit_log():
+    """Gets the audit log shared by the whole app, creating it on first use.
+
+    Returns:
+        AuditLog: The shared audit log.
+    """
+
+    global _audit_log
+
+    with _audit_log_lock:
+        if _audit_log is None:
+            _audit_log = AuditLog.from_settings()
+            atexit.register(_audit_log.close)
+
+    return _audit_log
+
+
+def audit(event_type, **fields):
+    """Queues a record on the shared audit log.
+
+    Args:
+        event_type (str): Type of event, such as "detection" or "verification".
+        **fields: Values saved with the record.
+    """
+
+    get_audit_log().record(event_type, **fields)
+
+
+def read_records(path):
+    """Reads every record of the log, oldest first, including compressed archives.
+
+    Args:
+        path (str): File path of the active log file.
+
+    Yields:
+        dict: An audit record.
+    """
+
+    for archive_path in sorted(glob.glob(path + ".*.gz")):
+        with gzip.open(archive_path, "rt", encoding="utf-8") as archive:
+            for line in archive:
+                if line.strip():
+                    yield json.loads(line)
+
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as log_file:
+            for line in log_file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def query(path, since=None, until=None, app=None, event_type=None):
+    """Filters the log's records by time range, app and event type.
+
+    Args:
+        path (str): File path of the active log file.
+        since (float): Earliest record time as a unix timestamp.
+        until (float): Latest record time as a unix timestamp.
+        app (str): App name or exe path the record has to be for.
+        event_type (str): Event type the record has to have.
+
+    Returns:
+        list: The matching records.
+    """
+
+    matches = []
+
+    for entry in read_records(path):
+        if since is not None and entry["time"] < since:
+            continue
+
+        if until is not None and entry["time"] > until:
+            continue
+
+        if app is not None and app not in (entry.get("app"), entry.get("exe")):
+            continue
+
+        if event_type is not None and entry["type"] != event_type:
+            continue
+
+        matches.append(entry)
+
+    return matches
+
+
+def main(argv=None):
+    """Runs the audit log query command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    settings = load_settings("audit_log")
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.audit_log",
+        description="Query the audit log.",
+    )
+    parser.add_argument("--path", default=settings["path"])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    query_parser = subparsers.add_parser("query")
+    query_parser.add_argument("--since", help="ISO time, such as 2026-01-01T09:00")
+    query_parser.add_argument("--until", help="ISO time, such as 2026-01-02")
+    query_parser.add_argument("--app", help="app name or exe path")
+    query_parser.add_argument("--type", dest="event_type", help="event type")
+
+    args = parser.parse_args(argv)
+
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    until = datetime.fromisoformat(args.until).timestamp() if args.until else None
+
+    for entry in query(args.path, since, until, args.app, args.event_type):
+        stamp = datetime.fromtimestamp(entry.pop("time")).isoformat(timespec="seconds")
+        print(stamp, entry.pop("type"), json.dumps(entry))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import threading
+import time
+
+import numpy as np
+
+from face_id.condensation import model_mtime, weighted_verification
+from face_id.scoring import KerasScorer
+from face_id.settings import load_settings
+
+
+class CascadeScorer:
+    """
+    Decides confident verifications with a cheap model before the full siamese model is used.
+
+    The first stage scores the probe against the gallery with a small model, such as the
+    distilled compact model. Template scores more than the band away from the detection
+    threshold are treated as certain. If the decision is the same whether or not the
+    uncertain templates are counted as detections, the first stage decides, otherwise the
+    probe goes on to the full model. The cheap model and its gallery embeddings are kept
+    until the gallery or the model file changes. The number of probes each stage decided and their latency
+    are counted.
+
+    Attributes:
+        enabled (bool): If the cheap stage is used.
+        model_path (str): File path of the cheap siamese model.
+        band (float): Distance from the detection threshold a score needs to be certain.
+    """
+
+    def __init__(
+        self, enabled=False, model_path="face_id/siamesemodel_compact.h5", band=0.15
+    ):
+        """Initializes the cascade scorer.
+
+        Args:
+            enabled (bool): If the cheap stage is used.
+            model_path (str): File path of the cheap siamese model.
+            band (float): Distance from the detection threshold a score needs to be certain.
+        """
+
+        self.enabled = enabled
+        self.model_path = model_path
+        self.band = band
+
+        self._scorer = None
+        self._model_mtime = None
+        self._gallery = None
+        self._gallery_embeddings = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "cheap": {"decided": 0, "ms": 0.0},
+            "full": {"decided": 0, "ms": 0.0},
+        }
+
+    @classmethod
+    def from_settings(cls):
+        """Creates a cascade scorer from the "cascade" settings section.
+
+        Returns:
+            CascadeScorer: Cascade using the saved or default settings.
+        """
+
+        return cls(**load_settings("cascade"))
+
+    def first_stage(
+        self, input_image, gallery, detection_threshold, verification_threshold
+    ):
+        """Scores a probe with the cheap model and decides it if the result is certain.
+
+        Args:
+            input_image (Tensor): Preprocessed webcam image.
+            gallery (ndarray): Batch of preprocessed face id images.
+            detection_threshold (float): Score a template needs to be counted as a detection.
+            verification_threshold (float): Share of detections needed to be verified.
+
+        Returns:
+            tuple: The cheap model's scores and the decision, which is None if the full model has to decide.
+        """
+
+        start = time.perf_counter()
+
+        with self._lock:
+            mtime = model_mtime(self.model_path)
+
+            if self._scorer is None or mtime != self._model_mtime:
+                self._scorer = KerasScorer(self.model_path)
+                self._model_mtime = mtime
+                self._gallery = None
+
+            if gallery is not self._gallery:
+                self._gallery_embeddings = self._scorer.embed(gallery)
+                self._gallery = gallery
+
+            probe_embedding = self._scorer.embed(np.expand_dims(input_image, axis=0))
+            results = self._scorer.score_embeddings(
+                probe_embedding, self._gallery_embeddings
+            )
+
+        decision = self.certain_decision(
+            results, detection_threshold, verification_threshold
+        )
+
+        if decision is not None:
+            self.record("cheap", start)
+
+        return results, decision
+
+    def certain_decision(self, results, detection_threshold, verification_threshold):
+        """Decides a verification if the uncertain template scores can't change it.
+
+        Args:
+            results (ndarray): Score of the probe against every template.
+            detection_threshold (float): Score a template needs to be counted as a detection.
+            verification_threshold (float): Share of detections needed to be verified.
+
+        Returns:
+            bool: The decision, or None if it depends on scores inside the band.
+        """
+
+        results = np.reshape(results, [-1])
+
+        if len(results) == 0:
+            return None
+
+        weights = np.ones(len(results), np.float32)
+        lowest = weighted_verification(results, weights, detection_threshold + self.band)
+        highest = weighted_verification(results, weights, detection_threshold - self.band)
+
+        if lowest > verification_threshold:
+            return True
+
+        if highest <= verification_threshold:
+            return False
+
+        return None
+
+    def record(self, stage, start):
+        """Counts a probe decided by a stage and the time it took.
+
+        Args:
+            stage (str): "cheap" or "full".
+            start (float): perf_counter time the verification started.
+        """
+
+        with self._lock:
+            self._stats[stage]["decided"] += 1
+            self._stats[stage]["ms"] += (time.perf_counter() - start) * 1000
+
+    def stats(self):
+        """Returns the share of probes each stage decided and their mean latency.
+
+        Returns:
+            dict: Number of probes, hit rate and mean latency of each stage.
+        """
+
+        with self._lock:
+            stages = {name: dict(values) for name, values in self._stats.items()}
+
+        total = sum(values["decided"] for values in stages.values())
+        stats = {"probes": total}
+
+        for name, values in stages.items():
+            stats[name] = {
+                "decided": values["decided"],
+                "hit_rate": values["decided"] / total if total else 0.0,
+                "mean_ms": values["ms"] / values["decided"] if values["decided"] else 0.0,
+            }
+
+        return stats
+
+    def report(self):
+        """Prints the share of probes each stage decided and their mean latency."""
+
+        stats = self.stats()
+        print(
+            f"Cascade: {stats['probes']} probes, "
+            f"{stats['cheap']['hit_rate']:.0%} decided by the cheap model "
+            f"({stats['cheap']['mean_ms']:.1f} ms), "
+            f"{stats['full']['hit_rate']:.0%} by the full model "
+            f"({stats['full']['mean_ms']:.1f} ms)"
+        )
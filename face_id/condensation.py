@@ -0,0 +1,417 @@
+"""Condensation of the gallery into weighted prototype templates.
+
+Clusters the embeddings of every gallery template and keeps one prototype per
+cluster, weighted by the share of templates in it. Verification then scores
+the probe against the prototypes instead of every template:
+
+    python -m face_id.condensation build --prototypes 10
+    python -m face_id.condensation report --probes path/to/probes
+
+The report folder needs a "genuine" folder of the user's images and an
+"impostor" folder of other people's images.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from face_id.gallery import GalleryStore
+from face_id.preprocessing import preprocess
+from face_id.scoring import load_scorer
+from face_id.settings import load_settings
+
+
+def pairwise_distances(points, centers):
+    """Finds the mean absolute (L1) distance between every point and center.
+
+    Args:
+        points (ndarray): Embeddings with shape (n, d).
+        centers (ndarray): Embeddings with shape (k, d).
+
+    Returns:
+        ndarray: Distances with shape (n, k).
+    """
+
+    return np.mean(np.abs(points[:, np.newaxis, :] - centers[np.newaxis, :, :]), axis=-1)
+
+
+def initial_centers(embeddings, count, rng):
+    """Picks spread out starting centers with k-means++ seeding.
+
+    Args:
+        embeddings (ndarray): Embeddings with shape (n, d).
+        count (int): Number of centers to pick.
+        rng (numpy.random.Generator): Random number generator.
+
+    Returns:
+        list: Indices of the picked embeddings.
+    """
+
+    indices = [int(rng.integers(len(embeddings)))]
+
+    while len(indices) < count:
+        distances = np.min(pairwise_distances(embeddings, embeddings[indices]), axis=1)
+        total = np.sum(distances)
+
+        if total == 0:
+            break
+
+        indices.append(int(rng.choice(len(embeddings), p=distances / total)))
+
+    return indices
+
+
+def kmedoids(embeddings, count, iterations=50, seed=0):
+    """Clusters embeddings around medoids, embeddings that are part of the gallery.
+
+    Args:
+        embeddings (ndarray): Embeddings with shape (n, d).
+        count (int): Number of clusters.
+        iterations (int): Largest number of update rounds.
+        seed (int): Seed of the starting centers.
+
+    Returns:
+        tuple: The medoid embeddings and the cluster index of every embedding.
+    """
+
+    rng = np.random.default_rng(seed)
+    medoids = initial_centers(embeddings, min(count, len(embeddings)), rng)
+    distances = pairwise_distances(embeddings, embeddings)
+
+    for _ in range(iterations):
+        labels = np.argmin(distances[:, medoids], axis=1)
+        new_medoids = []
+
+        for cluster in range(len(medoids)):
+            members = np.flatnonzero(labels == cluster)
+
+            if len(members) == 0:
+                new_medoids.append(medoids[cluster])
+                continue
+
+            costs = np.sum(distances[np.ix_(members, members)], axis=1)
+            new_medoids.append(int(members[np.argmin(costs)]))
+
+        if new_medoids == medoids:
+            break
+
+        medoids = new_medoids
+
+    labels = np.argmin(distances[:, medoids], axis=1)
+    return embeddings[medoids], labels
+
+
+def kmeans(embeddings, count, iterations=50, seed=0):
+    """Clusters embeddings around centroids, the mean of each cluster.
+
+    Args:
+        embeddings (ndarray): Embeddings with shape (n, d).
+        count (int): Number of clusters.
+        iterations (int): Largest number of update rounds.
+        seed (int): Seed of the starting centers.
+
+    Returns:
+        tuple: The centroid embeddings and the cluster index of every embedding.
+    """
+
+    rng = np.random.default_rng(seed)
+    centers = embeddings[initial_centers(embeddings, min(count, len(embeddings)), rng)]
+
+    for _ in range(iterations):
+        labels = np.argmin(pairwise_distances(embeddings, centers), axis=1)
+        new_centers = np.array(
+            [
+                np.mean(embeddings[labels == cluster], axis=0)
+                if np.any(labels == cluster)
+                else centers[cluster]
+                for cluster in range(len(centers))
+            ]
+        )
+
+        if np.allclose(new_centers, centers):
+            break
+
+        centers = new_centers
+
+    labels = np.argmin(pairwise_distances(embeddings, centers), axis=1)
+    return centers, labels
+
+
+def condense(embeddings, count, method="kmedoids"):
+    """Condenses gallery embeddings into weighted prototypes.
+
+    Args:
+        embeddings (ndarray): Embedding of every gallery template.
+        count (int): Number of prototypes.
+        method (str): "kmedoids" or "kmeans".
+
+    Returns:
+        tuple: The prototype embeddings and the share of templates each one stands for.
+    """
+
+    embeddings = np.asarray(embeddings, np.float32)
+
+    if method == "kmeans":
+        prototypes, labels = kmeans(embeddings, count)
+
+    else:
+        prototypes, labels = kmedoids(embeddings, count)
+
+    weights = np.bincount(labels, minlength=len(prototypes)) / len(embeddings)
+    keep = weights > 0
+    return prototypes[keep], weights[keep].astype(np.float32)
+
+
+def model_mtime(model_path):
+    """Gets the modification time of a model file.
+
+    Args:
+        model_path (str): File path of the model.
+
+    Returns:
+        float: Modification time of the model, or 0 if it doesn't exist.
+    """
+
+    if not os.path.exists(model_path):
+        return 0.0
+
+    return os.path.getmtime(model_path)
+
+
+class PrototypeStore:
+    """
+    Saves and loads the prototypes of a gallery version.
+
+    Prototypes are only used while the gallery version, template files and model
+    they were built from are still the active ones. The model is checked by its path
+    and modification time, so prototypes are rebuilt after the model is retrained
+    to the same path.
+
+    Attributes:
+        prototype_path (str): File path the prototypes are saved to.
+    """
+
+    def __init__(self, prototype_path="face_id/image_data/prototypes.npz"):
+        """Initializes the prototype store.
+
+        Args:
+            prototype_path (str): File path the prototypes are saved to.
+        """
+
+        self.prototype_path = prototype_path
+
+    def save(self, prototypes, weights, manifest, model_path):
+        """Saves prototypes without leaving a partial file.
+
+        Args:
+            prototypes (ndarray): Prototype embeddings.
+            weights (ndarray): Share of templates each prototype stands for.
+            manifest (dict): Manifest of the gallery the prototypes were built from.
+            model_path (str): File path of the model that created the embeddings.
+        """
+
+        temp_path = self.prototype_path + ".tmp.npz"
+        np.savez(
+            temp_path,
+            prototypes=prototypes,
+            weights=weights,
+            gallery_version=manifest["version"],
+            files=np.array([template["file"] for template in manifest["templates"]]),
+            model_path=os.path.abspath(model_path),
+            model_mtime=model_mtime(model_path),
+        )
+        os.replace(temp_path, self.prototype_path)
+
+    def load(self, manifest, model_path):
+        """Loads the prototypes if they were built from the active gallery and model.
+
+        Args:
+            manifest (dict): Manifest of the active gallery.
+            model_path (str): File path of the active model.
+
+        Returns:
+            tuple: The prototypes and weights, or None if they're missing or out of date.
+        """
+
+        if not os.path.exists(self.prototype_path):
+            return None
+
+        with np.load(self.prototype_path) as data:
+            files = [str(name) for name in data["files"]]
+            current = (
+                int(data["gallery_version"]) == manifest["version"]
+                and files == [template["file"] for template in manifest["templates"]]
+                and str(data["model_path"]) == os.path.abspath(model_path)
+                and "model_mtime" in data.files
+                and float(data["model_mtime"]) == model_mtime(model_path)
+            )
+
+            if not current:
+                return None
+
+            return data["prototypes"], data["weights"]
+
+
+def build_prototypes(count, method, settings=None):
+    """Embeds the active gallery and saves its prototypes.
+
+    Args:
+        count (int): Number of prototypes.
+        method (str): "kmedoids" or "kmeans".
+        settings (dict): Scoring settings, the saved "scoring" settings if None.
+
+    Returns:
+        tuple: The prototypes and weights.
+    """
+
+    if settings is None:
+        settings = load_settings("scoring")
+
+    store = GalleryStore()
+    manifest = store.load()
+    gallery = np.stack([preprocess(path) for path in store.file_paths(manifest)])
+
+    scorer = load_scorer(settings)
+    prototypes, weights = condense(scorer.embed(gallery), count, method)
+
+    PrototypeStore().save(prototypes, weights, manifest, settings["model_path"])
+    print(
+        f"Condensed {len(gallery)} templates into {len(prototypes)} prototypes "
+        f"with {method}"
+    )
+    return prototypes, weights
+
+
+def weighted_verification(results, weights, detection_threshold):
+    """Finds the weighted share of prototypes that detected the probe.
+
+    Args:
+        results (ndarray): Score of the probe against every prototype.
+        weights (ndarray): Share of templates each prototype stands for.
+        detection_threshold (float): Score a prototype needs to be counted as a detection.
+
+    Returns:
+        float: Weighted share of detections between 0 and 1.
+    """
+
+    results = np.reshape(results, [-1])
+    weights = np.reshape(weights, [-1])
+
+    if len(results) == 0 or np.sum(weights) == 0:
+        return 0.0
+
+    return float(np.sum(weights[results > detection_threshold]) / np.sum(weights))
+
+
+def report(probe_path, count, method, detection_threshold=0.5, verification_threshold=0.5):
+    """Compares verification against every template and against prototypes.
+
+    Args:
+        probe_path (str): Folder with "genuine" and "impostor" image folders.
+        count (int): Number of prototypes.
+        method (str): "kmedoids" or "kmeans".
+        detection_threshold (float): Score a template needs to be counted as a detection.
+        verification_threshold (float): Share of detections needed to be verified.
+
+    Returns:
+        dict: Accuracy, mean latency and decision agreement of both paths, and the speedup.
+    """
+
+    scorer = load_scorer()
+    store = GalleryStore()
+    gallery = np.stack([preprocess(path) for path in store.file_paths()])
+    gallery_embeddings = scorer.embed(gallery)
+    prototypes, weights = condense(gallery_embeddings, count, method)
+    full_weights = np.ones(len(gallery_embeddings), np.float32)
+
+    paths = {
+        "full": (gallery_embeddings, full_weights),
+        "prototypes": (prototypes, weights),
+    }
+    correct = {name: 0 for name in paths}
+    timings = {name: [] for name in paths}
+    agreements = 0
+    total = 0
+
+    for label_name, label in (("genuine", True), ("impostor", False)):
+        folder = os.path.join(probe_path, label_name)
+
+        for name in sorted(os.listdir(folder)):
+            probe_embedding = scorer.embed(
+                np.expand_dims(preprocess(os.path.join(folder, name)), axis=0)
+            )
+            decisions = {}
+
+            for path_name, (templates, template_weights) in paths.items():
+                start = time.perf_counter()
+                results = scorer.score_embeddings(probe_embedding, templates)
+                verification = weighted_verification(
+                    results, template_weights, detection_threshold
+                )
+                timings[path_name].append((time.perf_counter() - start) * 1000)
+
+                decisions[path_name] = verification > verification_threshold
+                correct[path_name] += int(decisions[path_name] == label)
+
+            agreements += int(decisions["full"] == decisions["prototypes"])
+            total += 1
+
+    summary = {
+        "templates": len(gallery_embeddings),
+        "prototypes": len(prototypes),
+        "probes": total,
+        "agreement": agreements / total if total else 0.0,
+    }
+
+    for path_name in paths:
+        summary[f"{path_name}_accuracy"] = correct[path_name] / total if total else 0.0
+        summary[f"{path_name}_mean_ms"] = float(np.mean(timings[path_name])) if total else 0.0
+
+    summary["speedup"] = (
+        summary["full_mean_ms"] / summary["prototypes_mean_ms"]
+        if summary["prototypes_mean_ms"]
+        else 0.0
+    )
+    summary["accuracy_change"] = summary["prototypes_accuracy"] - summary["full_accuracy"]
+
+    for key, value in summary.items():
+        print(f"{key:22} {value:.4g}")
+
+    return summary
+
+
+def main(argv=None):
+    """Runs the condensation command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    settings = load_settings("condensation")
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.condensation",
+        description="Condense the gallery into weighted prototypes.",
+    )
+    parser.add_argument("--prototypes", type=int, default=settings["prototypes"])
+    parser.add_argument(
+        "--method", choices=["kmedoids", "kmeans"], default=settings["method"]
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build")
+    report_parser = subparsers.add_parser("report")
+    report_parser.add_argument("--probes", required=True)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_prototypes(args.prototypes, args.method)
+
+    else:
+        report(args.probes, args.prototypes, args.method)
+
+
+if __name__ == "__main__":
+    main()
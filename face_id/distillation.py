@@ -0,0 +1,275 @@
+"""Distillation of the siamese model into a compact embedding model.
+
+A student siamese model with a compact embedding tower is trained to match the
+scores of the full "siamesemodelv2.h5" teacher on anchor/positive and
+anchor/negative pairs, then both models are compared:
+
+    python -m face_id.distillation train --embedding-size 128
+    python -m face_id.distillation report
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from face_id import runtime
+
+runtime.apply_environment()
+
+import numpy as np
+import psutil
+import tensorflow as tf
+
+runtime.configure_tensorflow(tf)
+
+from face_id.gallery import enrolled_folder
+from face_id.models import make_compact_embedding, make_siamese_model
+from face_id.preprocessing import preprocess
+from face_id.scoring import KerasScorer, load_siamese_model
+from face_id.settings import load_settings
+from face_id.training.data import make_input_pipeline, make_pair_dataset, split_dataset
+
+COMPACT_MODEL_PATH = "face_id/siamesemodel_compact.h5"
+
+
+class Distiller:
+    """
+    Trains a compact student siamese model from the scores of a teacher model.
+
+    The loss mixes the binary cross entropy against the pair labels with the binary
+    cross entropy against the teacher's scores, so the student learns the teacher's
+    confidence as well as the correct answer.
+
+    Attributes:
+        teacher (tensorflow.keras.Model): The full siamese model.
+        student (tensorflow.keras.Model): The compact siamese model being trained.
+        label_weight (float): Weight of the label loss, the teacher loss gets the rest.
+    """
+
+    def __init__(self, teacher, embedding_size=128, label_weight=0.3, learning_rate=1e-4):
+        """Initializes the distiller and creates the student model.
+
+        Args:
+            teacher (tensorflow.keras.Model): The full siamese model.
+            embedding_size (int): Width of the student's embeddings.
+            label_weight (float): Weight of the label loss between 0 and 1.
+            learning_rate (float): Learning rate of the Adam optimizer.
+        """
+
+        self.teacher = teacher
+        self.student = make_siamese_model(make_compact_embedding(embedding_size))
+        self.label_weight = label_weight
+
+        self.loss = tf.losses.BinaryCrossentropy()
+        self.optimizer = tf.keras.optimizers.Adam(learning_rate)
+
+    @tf.function
+    def train_step(self, input_images, validation_images, labels):
+        """Runs one training step on a batch of image pairs.
+
+        Args:
+            input_images (Tensor): Batch of input images.
+            validation_images (Tensor): Batch of validation images.
+            labels (Tensor): Batch of pair labels.
+
+        Returns:
+            Tensor: Loss of the batch.
+        """
+
+        teacher_scores = self.teacher([input_images, validation_images], training=False)
+        labels = tf.reshape(labels, tf.shape(teacher_scores))
+
+        with tf.GradientTape() as tape:
+            student_scores = self.student(
+                [input_images, validation_images], training=True
+            )
+            loss = self.label_weight * self.loss(labels, student_scores) + (
+                1 - self.label_weight
+            ) * self.loss(teacher_scores, student_scores)
+
+        gradients = tape.gradient(loss, self.student.trainable_variables)
+        self.optimizer.apply_gradients(
+            zip(gradients, self.student.trainable_variables)
+        )
+        return loss
+
+    def train(self, data, epochs, batch_size=16):
+        """Trains the student model.
+
+        Args:
+            data (tf.data.Dataset): Training dataset of image pairs and labels.
+            epochs (int): Number of passes over the dataset.
+            batch_size (int): Number of pairs in each batch.
+        """
+
+        batches = make_input_pipeline(data, batch_size)
+
+        for epoch in range(1, epochs + 1):
+            losses = []
+            for input_images, validation_images, labels in batches:
+                losses.append(
+                    float(self.train_step(input_images, validation_images, labels))
+                )
+
+            print(f"Epoch {epoch}/{epochs} loss: {np.mean(losses):.4f}")
+
+
+def accuracy(model, data, threshold=0.5, batch_size=32):
+    """Finds the share of image pairs a siamese model labels correctly.
+
+    Args:
+        model (tensorflow.keras.Model): A siamese model.
+        data (tf.data.Dataset): Dataset of image pairs and labels.
+        threshold (float): Score needed for a pair to count as a match.
+        batch_size (int): Number of pairs in each batch.
+
+    Returns:
+        float: Accuracy between 0 and 1.
+    """
+
+    correct = 0
+    total = 0
+
+    for input_images, validation_images, labels in make_input_pipeline(
+        data, batch_size, shuffle=False
+    ):
+        scores = np.reshape(model([input_images, validation_images], training=False), [-1])
+        correct += int(np.sum((scores > threshold) == (labels.numpy() > 0.5)))
+        total += len(scores)
+
+    return correct / total if total else 0.0
+
+
+def profile_model(model_path, gallery, repeats=10):
+    """Measures the size, memory and latency of a saved siamese model.
+
+    Args:
+        model_path (str): File path of the siamese model.
+        gallery (ndarray): Batch of preprocessed gallery images.
+        repeats (int): Number of timed verifications.
+
+    Returns:
+        dict: File size, parameter count, embedding size, memory and latency values.
+    """
+
+    process = psutil.Process()
+    memory_before = process.memory_info().rss
+
+    start = time.perf_counter()
+    scorer = KerasScorer(model_path)
+    load_seconds = time.perf_counter() - start
+
+    scorer.score(gallery[0], gallery)
+    memory_after = process.memory_info().rss
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        scorer.score(gallery[0], gallery)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    embedding_size = int(scorer.embed(gallery[:1]).shape[-1])
+
+    return {
+        "file_bytes": os.path.getsize(model_path),
+        "parameters": int(scorer.model.count_params()),
+        "embedding_size": embedding_size,
+        "gallery_embedding_bytes": embedding_size * 4 * len(gallery),
+        "resident_bytes_added": memory_after - memory_before,
+        "load_seconds": load_seconds,
+        "verify_median_ms": statistics.median(timings),
+    }
+
+
+def compare_models(teacher_path, student_path, data_path, gallery_path, report_path):
+    """Creates a report comparing the teacher and student models.
+
+    Args:
+        teacher_path (str): File path of the full siamese model.
+        student_path (str): File path of the compact siamese model.
+        data_path (str): Folder with the anchor, positive and negative images.
+        gallery_path (str): Folder containing the gallery images used for latency.
+        report_path (str): File path the json report is saved to.
+
+    Returns:
+        dict: The report.
+    """
+
+    _, test_data = split_dataset(make_pair_dataset(data_path))
+    gallery = np.stack(
+        [
+            preprocess(os.path.join(gallery_path, name))
+            for name in sorted(os.listdir(gallery_path))
+        ]
+    )
+
+    report = {}
+    for name, model_path in (("teacher", teacher_path), ("student", student_path)):
+        report[name] = profile_model(model_path, gallery)
+        report[name]["accuracy"] = accuracy(load_siamese_model(model_path), test_data)
+
+    print(f"{'':24}{'teacher':>16}{'student':>16}")
+    for key in report["teacher"]:
+        print(f"{key:24}{report['teacher'][key]:>16.4g}{report['student'][key]:>16.4g}")
+
+    with open(report_path, "w") as report_file:
+        json.dump(report, report_file, indent=4)
+
+    return report
+
+
+def main(argv=None):
+    """Runs the distillation command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    settings = load_settings("scoring")
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.distillation",
+        description="Distill the siamese model into a compact model and compare them.",
+    )
+    parser.add_argument("--teacher", default="face_id/siamesemodelv2.h5")
+    parser.add_argument("--student", default=COMPACT_MODEL_PATH)
+    parser.add_argument("--data", default="data")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train")
+    train_parser.add_argument("--embedding-size", type=int, default=128)
+    train_parser.add_argument("--epochs", type=int, default=50)
+    train_parser.add_argument("--batch-size", type=int, default=16)
+    train_parser.add_argument("--label-weight", type=float, default=0.3)
+
+    report_parser = subparsers.add_parser("report")
+    report_parser.add_argument(
+        "--gallery",
+        default=enrolled_folder(),
+    )
+    report_parser.add_argument("--output", default="distillation_report.json")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        teacher = load_siamese_model(args.teacher)
+        train_data, test_data = split_dataset(make_pair_dataset(args.data))
+
+        distiller = Distiller(teacher, args.embedding_size, args.label_weight)
+        distiller.train(train_data, args.epochs, args.batch_size)
+        distiller.student.save(args.student)
+
+        print(f"Student accuracy: {accuracy(distiller.student, test_data):.4f}")
+        print(f"Saved compact model to {args.student}")
+
+        if settings["model_path"] != args.student:
+            print('Set "model_path" in the scoring settings to use the compact model')
+
+    else:
+        compare_models(args.teacher, args.student, args.data, args.gallery, args.output)
+
+
+if __name__ == "__main__":
+    main()
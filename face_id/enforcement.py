@@ -0,0 +1,380 @@
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+import psutil
+
+from face_id.settings import load_settings
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def process_cgroup(pid):
+    """Finds the cgroup v2 folder a process is in.
+
+    Args:
+        pid (int): Process id.
+
+    Returns:
+        str: Folder of the process's cgroup, or None if it can't be read.
+    """
+
+    try:
+        with open(f"/proc/{pid}/cgroup", "r") as cgroup_file:
+            for line in cgroup_file:
+                if line.startswith("0::"):
+                    return os.path.join(CGROUP_ROOT, line[3:].strip().lstrip("/"))
+
+    except OSError:
+        pass
+
+    return None
+
+
+def launch_app(path):
+    """Opens an app from its exe path on any operating system.
+
+    Args:
+        path (str): File path of the app.
+
+    Raises:
+        FileNotFoundError: If the app doesn't exist.
+    """
+
+    if sys.platform == "win32":
+        os.startfile(path)
+
+    elif sys.platform == "darwin":
+        subprocess.Popen(["open", path])
+
+    else:
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+
+        subprocess.Popen([path], start_new_session=True)
+
+
+class ProcessHolder:
+    """
+    Freezes protected processes while the user verifies, instead of terminating them.
+
+    In "hold" mode a detected process is suspended, with SIGSTOP or a cgroup v2 freezer
+    where one can be created, and resumed where it left off once the user is verified. So
+    approved launches keep their arguments, working directory and state, and skip a second
+    cold start. Processes frozen with a cgroup are moved back to the cgroup they came
+    from when they're released, so they keep its resource limits and accounting. Held
+    processes are terminated when verification fails, is cancelled or times out. In "terminate" mode processes are terminated right away, as before.
+
+    Attributes:
+        mode (str): "hold" to suspend processes, or "terminate" to terminate them.
+        freezer (str): "signal" for SIGSTOP, "cgroup" for the cgroup v2 freezer, or "auto".
+        cgroup_path (str): cgroup that a frozen child cgroup is created in for each app.
+        hold_timeout_seconds (float): Seconds a process is held before it's terminated.
+    """
+
+    def __init__(
+        self,
+        mode="terminate",
+        freezer="auto",
+        cgroup_path="/sys/fs/cgroup/face_id",
+        hold_timeout_seconds=120,
+    ):
+        """Initializes the process holder.
+
+        Args:
+            mode (str): "hold" or "terminate".
+            freezer (str): "signal", "cgroup" or "auto".
+            cgroup_path (str): cgroup that a frozen child cgroup is created in for each app.
+            hold_timeout_seconds (float): Seconds a process is held before it's terminated.
+        """
+
+        self.mode = mode
+        self.freezer = freezer
+        self.cgroup_path = cgroup_path
+        self.hold_timeout_seconds = hold_timeout_seconds
+
+        self._held = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """Creates a process holder from the "enforcement" settings section.
+
+        Returns:
+            ProcessHolder: Holder using the saved or default settings.
+        """
+
+        return cls(**load_settings("enforcement"))
+
+    @property
+    def enabled(self):
+        """bool: If processes are held instead of terminated."""
+
+        return self.mode == "hold"
+
+    def is_held(self, pid):
+        """Checks if a process is being held.
+
+        Args:
+            pid (int): Process id.
+
+        Returns:
+            bool: True if the process is held.
+        """
+
+        with self._lock:
+            return pid in self._held
+
+    def held_pids(self, app_name):
+        """Lists the held processes of an app.
+
+        Args:
+            app_name (str): Name of the app.
+
+        Returns:
+            list: Process ids of the app's held processes.
+        """
+
+        with self._lock:
+            return [pid for pid, entry in self._held.items() if entry["app"] == app_name]
+
+    def held_processes(self, app_name):
+        """Lists the process id and creation time of the held processes of an app.
+
+        Args:
+            app_name (str): Name of the app.
+
+        Returns:
+            list: Process id and creation time of every held process of the app.
+        """
+
+        with self._lock:
+            return [
+                (pid, entry["process"].info["create_time"])
+                for pid, entry in self._held.items()
+                if entry["app"] == app_name
+            ]
+
+    def forget(self, pid):
+        """Stops holding a process that has exited.
+
+        Args:
+            pid (int): Process id.
+
+        Returns:
+            bool: True if the process was held.
+        """
+
+        with self._lock:
+            return self._held.pop(pid, None) is not None
+
+    def hold(self, proc, app_name):
+        """Suspends a process until the user is verified for its app.
+
+        Args:
+            proc (psutil.Process): The process to hold.
+            app_name (str): Name of the app.
+
+        Returns:
+            str: "cgroup" or "signal", the freezer that was used.
+
+        Raises:
+            psutil.NoSuchProcess: If the process has exited.
+        """
+
+        method = "signal"
+        original_cgroup = None
+
+        if self.freezer in ("cgroup", "auto") and self.cgroup_supported():
+            try:
+                original_cgroup = process_cgroup(proc.pid)
+                self._freeze_cgroup(proc.pid, app_name)
+                method = "cgroup"
+
+            except OSError as error:
+                if self.freezer == "cgroup":
+                    print(f"Could not use the cgroup freezer: {error}")
+
+        if method == "signal":
+            proc.suspend()
+
+        with self._lock:
+            self._held[proc.pid] = {
+                "app": app_name,
+                "method": method,
+                "held_at": time.monotonic(),
+                "process": proc,
+                "cgroup": original_cgroup,
+            }
+
+        return method
+
+    def resume(self, app_name):
+        """Resumes every held process of an app.
+
+        Args:
+            app_name (str): Name of the app.
+
+        Returns:
+            list: Process ids that were resumed.
+        """
+
+        return self._release(app_name, terminate=False)
+
+    def terminate(self, app_name):
+        """Terminates every held process of an app.
+
+        Args:
+            app_name (str): Name of the app.
+
+        Returns:
+            list: Process ids that were terminated.
+        """
+
+        return self._release(app_name, terminate=True)
+
+    def terminate_all(self):
+        """Terminates every held process.
+
+        Returns:
+            list: Process ids that were terminated.
+        """
+
+        with self._lock:
+            app_names = {entry["app"] for entry in self._held.values()}
+
+        terminated = []
+        for app_name in app_names:
+            terminated.extend(self.terminate(app_name))
+
+        return terminated
+
+    def expire(self):
+        """Terminates processes that have been held longer than the hold timeout.
+
+        Returns:
+            list: Names of the apps whose processes were terminated.
+        """
+
+        if not self.hold_timeout_seconds:
+            return []
+
+        now = time.monotonic()
+
+        with self._lock:
+            app_names = {
+                entry["app"]
+                for entry in self._held.values()
+                if now - entry["held_at"] > self.hold_timeout_seconds
+            }
+
+        for app_name in app_names:
+            self.terminate(app_name)
+
+        return sorted(app_names)
+
+    def cgroup_supported(self):
+        """Checks if the cgroup v2 freezer can be used.
+
+        Returns:
+            bool: True if cgroup v2 is mounted and the holder's cgroup can be written to.
+        """
+
+        if not sys.platform.startswith("linux"):
+            return False
+
+        if not os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers")):
+            return False
+
+        parent = self.cgroup_path if os.path.exists(self.cgroup_path) else CGROUP_ROOT
+        return os.access(parent, os.W_OK)
+
+    def _app_cgroup(self, app_name):
+        """Gets the cgroup folder processes of an app are frozen in.
+
+        Args:
+            app_name (str): Name of the app.
+
+        Returns:
+            str: Folder of the app's cgroup.
+        """
+
+        folder_name = re.sub(r"[^A-Za-z0-9_.-]", "_", app_name)
+        return os.path.join(self.cgroup_path, folder_name)
+
+    def _freeze_cgroup(self, pid, app_name):
+        """Moves a process into its app's cgroup and freezes it.
+
+        Args:
+            pid (int): Process id.
+            app_name (str): Name of the app.
+        """
+
+        app_cgroup = self._app_cgroup(app_name)
+        os.makedirs(app_cgroup, exist_ok=True)
+
+        with open(os.path.join(app_cgroup, "cgroup.procs"), "w") as procs_file:
+            procs_file.write(str(pid))
+
+        with open(os.path.join(app_cgroup, "cgroup.freeze"), "w") as freeze_file:
+            freeze_file.write("1")
+
+    def _release(self, app_name, terminate):
+        """Resumes or terminates every held process of an app.
+
+        A terminate signal sent to a suspended process only takes effect once
+        it's resumed, so terminated processes are resumed as well. Processes
+        frozen with a cgroup are moved back to their original cgroup, which
+        also thaws them, before the app's cgroup is thawed.
+
+        Args:
+            app_name (str): Name of the app.
+            terminate (bool): If the processes are terminated instead of resumed.
+
+        Returns:
+            list: Process ids that were released.
+        """
+
+        with self._lock:
+            pids = [pid for pid, entry in self._held.items() if entry["app"] == app_name]
+            released = [(pid, self._held.pop(pid)) for pid in pids]
+
+        if len(released) == 0:
+            return []
+
+        for pid, entry in released:
+            try:
+                if terminate:
+                    entry["process"].terminate()
+
+                if entry["method"] == "signal":
+                    entry["process"].resume()
+
+            except psutil.NoSuchProcess:
+                pass
+
+            if entry["method"] == "cgroup" and entry["cgroup"] is not None:
+                try:
+                    with open(
+                        os.path.join(entry["cgroup"], "cgroup.procs"), "w"
+                    ) as procs_file:
+                        procs_file.write(str(pid))
+
+                except OSError as error:
+                    if not terminate:
+                        print(f"Could not move {app_name} back to its cgroup: {error}")
+
+        if any(entry["method"] == "cgroup" for _, entry in released):
+            try:
+                with open(
+                    os.path.join(self._app_cgroup(app_name), "cgroup.freeze"), "w"
+                ) as freeze_file:
+                    freeze_file.write("0")
+
+            except OSError as error:
+                print(f"Could not thaw {app_name}: {error}")
+
+        return pids
@@ -0,0 +1,614 @@
+"""Offline bulk evaluation of the verification pipeline.
+
+Runs the same preprocessing, scoring and decision the app uses over folders of
+labeled images and recorded videos, spread across a process pool:
+
+    python -m face_id.evaluation --data path/to/probes --workers 4
+
+The data folder needs a "genuine" folder of the user's images or videos and an
+"impostor" folder of other people's. Video frames are cropped like the webcam
+image and every `--frame-step` frame is scored. The report has FAR/FRR curves
+for the detection and verification thresholds, the accuracy at every threshold,
+and the latency and throughput of every pipeline stage. The thresholds are the
+app's "scoring" settings unless they're given on the command line, and when the
+cascade is enabled its cheap model also scores every frame, so the report shows
+how many frames it decides, their accuracy and the latency saved. Use `--model`
+to evaluate a candidate model against the same data before rolling it out.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from face_id.cascade import CascadeScorer
+from face_id.condensation import PrototypeStore, condense, weighted_verification
+from face_id.gallery import GalleryStore
+from face_id.preprocessing import crop_frame, preprocess, preprocess_frame
+from face_id.scoring import load_scorer
+from face_id.settings import load_settings
+
+LABELS = (("genuine", True), ("impostor", False))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+STAGES = ("decode", "preprocess", "embed", "score")
+
+_worker = {}
+
+
+def list_probes(data_path):
+    """Lists the labeled images and videos of an evaluation folder.
+
+    Args:
+        data_path (str): Folder with "genuine" and "impostor" folders.
+
+    Returns:
+        list: File path and label of every image and video, True for genuine.
+    """
+
+    probes = []
+
+    for label_name, label in LABELS:
+        folder = os.path.join(data_path, label_name)
+
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS):
+                probes.append((os.path.join(folder, name), label))
+
+    return probes
+
+
+def init_worker(settings, condensation, cascade):
+    """Loads the scorer and embeds the gallery once per worker process.
+
+    Args:
+        settings (dict): Scoring settings.
+        condensation (dict): Condensation settings, prototypes are scored if enabled.
+        cascade (dict): Cascade settings, the cheap model also scores every frame if enabled.
+    """
+
+    scorer = load_scorer(settings)
+    store = GalleryStore()
+    manifest = store.load()
+    gallery = np.stack([preprocess(path) for path in store.file_paths(manifest)])
+    templates = scorer.embed(gallery)
+    weights = np.ones(len(templates), np.float32)
+
+    if condensation["enabled"]:
+        saved = PrototypeStore().load(manifest, settings["model_path"])
+
+        if saved is None:
+            saved = condense(templates, condensation["prototypes"], condensation["method"])
+
+        templates, weights = saved
+
+    cascade_scorer = None
+
+    if cascade["enabled"] and len(gallery) > 0:
+        cascade_scorer = CascadeScorer(**cascade)
+        # Embeds the gallery with the cheap model, so the first frame isn't slower.
+        cascade_scorer.first_stage(
+            gallery[0],
+            gallery,
+            settings["detection_threshold"],
+            settings["verification_threshold"],
+        )
+
+    _worker.update(
+        scorer=scorer,
+        templates=templates,
+        weights=weights,
+        settings=settings,
+        gallery=gallery,
+        cascade=cascade_scorer,
+    )
+
+
+def read_frames(file_path, frame_step):
+    """Decodes the frames of an image or video file.
+
+    Args:
+        file_path (str): File path of an image or video.
+        frame_step (int): Every how many video frames one is scored.
+
+    Yields:
+        tuple: Frame index, OpenCV image and the time it took to decode in milliseconds.
+    """
+
+    if file_path.lower().endswith(IMAGE_EXTENSIONS):
+        start = time.perf_counter()
+        image = cv2.imread(file_path)
+
+        if image is not None:
+            yield 0, image, (time.perf_counter() - start) * 1000
+
+        return
+
+    capture = cv2.VideoCapture(file_path)
+    index = 0
+
+    while True:
+        start = time.perf_counter()
+        ret, frame = capture.read()
+        decode_ms = (time.perf_counter() - start) * 1000
+
+        if not ret:
+            break
+
+        if index % frame_step == 0:
+            yield index, crop_frame(frame), decode_ms
+
+        index += 1
+
+    capture.release()
+
+
+def evaluate_file(task):
+    """Scores every frame of one probe file against the gallery.
+
+    Runs in a worker process started with init_worker.
+
+    Args:
+        task (tuple): File path, label and frame step of the probe.
+
+    Returns:
+        dict: The template weights and the scores, stage timings and cascade decision of every frame.
+    """
+
+    file_path, label, frame_step = task
+    scorer = _worker["scorer"]
+    settings = _worker["settings"]
+    cascade = _worker["cascade"]
+    frames = []
+
+    for index, cv_image, decode_ms in read_frames(file_path, frame_step):
+        start = time.perf_counter()
+        input_image = preprocess_frame(cv_image)
+        preprocessed = time.perf_counter()
+        probe_embedding = scorer.embed(np.expand_dims(input_image, axis=0))
+        embedded = time.perf_counter()
+        results = scorer.score_embeddings(probe_embedding, _worker["templates"])
+        scored = time.perf_counter()
+
+        frame = {
+            "source": file_path,
+            "frame": index,
+            "label": label,
+            "scores": np.reshape(results, [-1]).tolist(),
+            "decode": decode_ms,
+            "preprocess": (preprocessed - start) * 1000,
+            "embed": (embedded - preprocessed) * 1000,
+            "score": (scored - embedded) * 1000,
+        }
+
+        if cascade is not None:
+            _, decision = cascade.first_stage(
+                input_image,
+                _worker["gallery"],
+                settings["detection_threshold"],
+                settings["verification_threshold"],
+            )
+            frame["cascade"] = decision
+            frame["cheap"] = (time.perf_counter() - scored) * 1000
+
+        frames.append(frame)
+
+    return {"weights": _worker["weights"].tolist(), "frames": frames}
+
+
+def error_rates(shares, labels, verification_threshold):
+    """Finds the false accept and false reject rates at one verification threshold.
+
+    Args:
+        shares (ndarray): Weighted share of detected templates for every probe.
+        labels (ndarray): True for genuine probes.
+        verification_threshold (float): Share of detections needed to be verified.
+
+    Returns:
+        dict: False accept rate, false reject rate and accuracy.
+    """
+
+    return decision_rates(shares > verification_threshold, labels)
+
+
+def decision_rates(accepted, labels):
+    """Finds the false accept and false reject rates of verification decisions.
+
+    Args:
+        accepted (ndarray): True for every probe that was verified.
+        labels (ndarray): True for genuine probes.
+
+    Returns:
+        dict: False accept rate, false reject rate and accuracy.
+    """
+
+    impostors = np.sum(~labels)
+    genuines = np.sum(labels)
+
+    return {
+        "far": float(np.sum(accepted & ~labels) / impostors) if impostors else 0.0,
+        "frr": float(np.sum(~accepted & labels) / genuines) if genuines else 0.0,
+        "accuracy": float(np.mean(accepted == labels)) if len(labels) else 0.0,
+    }
+
+
+def threshold_curves(frames, weights, detection_threshold, verification_threshold, steps):
+    """Sweeps the detection and verification thresholds.
+
+    Each threshold is swept while the other stays at its configured value.
+
+    Args:
+        frames (list): Scores and label of every probe frame.
+        weights (ndarray): Weight of every template.
+        detection_threshold (float): Configured detection threshold.
+        verification_threshold (float): Configured verification threshold.
+        steps (int): Number of thresholds in each sweep.
+
+    Returns:
+        dict: Rows of threshold, FAR, FRR and accuracy for each swept threshold.
+    """
+
+    scores = [np.asarray(frame["scores"]) for frame in frames]
+    labels = np.array([frame["label"] for frame in frames], bool)
+    thresholds = np.linspace(0.0, 1.0, steps)
+
+    def shares_at(threshold):
+        return np.array(
+            [weighted_verification(result, weights, threshold) for result in scores]
+        )
+
+    configured_shares = shares_at(detection_threshold)
+    curves = {"verification": [], "detection": []}
+
+    for threshold in thresholds:
+        row = {"threshold": float(threshold)}
+        row.update(error_rates(configured_shares, labels, threshold))
+        curves["verification"].append(row)
+
+        row = {"threshold": float(threshold)}
+        row.update(error_rates(shares_at(threshold), labels, verification_threshold))
+        curves["detection"].append(row)
+
+    return curves
+
+
+def equal_error_rate(curve):
+    """Finds the point of a curve where the FAR and FRR are closest.
+
+    Args:
+        curve (list): Rows of threshold, FAR, FRR and accuracy.
+
+    Returns:
+        dict: The row with the smallest difference between FAR and FRR.
+    """
+
+    return min(curve, key=lambda row: abs(row["far"] - row["frr"]))
+
+
+def latency_summary(frames, wall_seconds, workers):
+    """Summarizes the latency and throughput of every pipeline stage.
+
+    Args:
+        frames (list): Stage timings of every probe frame.
+        wall_seconds (float): Time the whole evaluation took.
+        workers (int): Number of worker processes.
+
+    Returns:
+        dict: Mean, median and tail latency and throughput for every stage and the total.
+    """
+
+    summary = {}
+
+    for stage in STAGES + ("total",):
+        if stage == "total":
+            timings = np.array([sum(frame[name] for name in STAGES) for frame in frames])
+
+        else:
+            timings = np.array([frame[stage] for frame in frames])
+
+        summary[stage] = {
+            "mean_ms": float(np.mean(timings)),
+            "p50_ms": float(np.percentile(timings, 50)),
+            "p95_ms": float(np.percentile(timings, 95)),
+            "p99_ms": float(np.percentile(timings, 99)),
+            "per_second_per_worker": (
+                float(1000 / np.mean(timings)) if np.mean(timings) else 0.0
+            ),
+        }
+
+    summary["throughput"] = {
+        "frames": len(frames),
+        "wall_seconds": wall_seconds,
+        "frames_per_second": len(frames) / wall_seconds if wall_seconds else 0.0,
+        "workers": workers,
+    }
+    return summary
+
+
+def cascade_summary(frames, shares, labels, verification_threshold):
+    """Summarizes how the cascade would have decided every probe frame.
+
+    Frames the cheap model is certain about take its decision and only pay for
+    the cheap stage, the others take the full model's decision and pay for both.
+
+    Args:
+        frames (list): Stage timings and cascade decision of every probe frame.
+        shares (ndarray): Weighted share of detected templates of every frame with the full model.
+        labels (ndarray): True for genuine probes.
+        verification_threshold (float): Share of detections needed to be verified.
+
+    Returns:
+        dict: Hit rate, agreement with the full model, error rates and latency of the cascade.
+    """
+
+    full_accepted = shares > verification_threshold
+    decided = np.array([frame["cascade"] is not None for frame in frames], bool)
+    accepted = np.array(
+        [
+            frame["cascade"] if frame["cascade"] is not None else full
+            for frame, full in zip(frames, full_accepted)
+        ],
+        bool,
+    )
+
+    cheap = np.array([frame["cheap"] for frame in frames])
+    full = np.array([frame["embed"] + frame["score"] for frame in frames])
+    timings = np.where(decided, cheap, cheap + full)
+
+    return {
+        "hit_rate": float(np.mean(decided)),
+        "agreement": (
+            float(np.mean(accepted[decided] == full_accepted[decided]))
+            if np.any(decided)
+            else 0.0
+        ),
+        "configured": decision_rates(accepted, labels),
+        "cheap_mean_ms": float(np.mean(cheap)),
+        "full_mean_ms": float(np.mean(full)),
+        "mean_ms": float(np.mean(timings)),
+        "p95_ms": float(np.percentile(timings, 95)),
+    }
+
+
+def evaluate(
+    data_path,
+    workers=None,
+    frame_step=5,
+    detection_threshold=None,
+    verification_threshold=None,
+    steps=21,
+    settings=None,
+    cascade=None,
+):
+    """Evaluates the verification pipeline over a folder of labeled probes.
+
+    Args:
+        data_path (str): Folder with "genuine" and "impostor" folders.
+        workers (int): Number of worker processes, the number of CPUs if None.
+        frame_step (int): Every how many video frames one is scored.
+        detection_threshold (float): Score a template needs to be counted as a detection, the scoring setting if None.
+        verification_threshold (float): Share of detections needed to be verified, the scoring setting if None.
+        steps (int): Number of thresholds in each sweep.
+        settings (dict): Scoring settings, the saved "scoring" settings if None.
+        cascade (dict): Cascade settings, the saved "cascade" settings if None.
+
+    Returns:
+        dict: Accuracy and error rates at the configured thresholds, the threshold curves, latency summary and cascade summary.
+    """
+
+    if settings is None:
+        settings = load_settings("scoring")
+
+    if cascade is None:
+        cascade = load_settings("cascade")
+
+    if detection_threshold is None:
+        detection_threshold = settings["detection_threshold"]
+
+    if verification_threshold is None:
+        verification_threshold = settings["verification_threshold"]
+
+    settings = dict(
+        settings,
+        detection_threshold=detection_threshold,
+        verification_threshold=verification_threshold,
+    )
+    workers = workers or os.cpu_count()
+    tasks = [(path, label, frame_step) for path, label in list_probes(data_path)]
+    frames = []
+    weights = None
+
+    start = time.perf_counter()
+
+    # TensorFlow isn't safe to use in forked processes, so workers are spawned.
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(settings, load_settings("condensation"), cascade),
+    ) as executor:
+        for result in executor.map(evaluate_file, tasks):
+            weights = np.asarray(result["weights"], np.float32)
+            frames.extend(result["frames"])
+
+    wall_seconds = time.perf_counter() - start
+
+    if len(frames) == 0:
+        raise ValueError(f"No images or videos found in {data_path}")
+
+    labels = np.array([frame["label"] for frame in frames], bool)
+    shares = np.array(
+        [
+            weighted_verification(frame["scores"], weights, detection_threshold)
+            for frame in frames
+        ]
+    )
+    curves = threshold_curves(
+        frames, weights, detection_threshold, verification_threshold, steps
+    )
+
+    report = {
+        "model_path": settings["model_path"],
+        "probes": len(tasks),
+        "frames": len(frames),
+        "genuine_frames": int(np.sum(labels)),
+        "impostor_frames": int(np.sum(~labels)),
+        "detection_threshold": detection_threshold,
+        "verification_threshold": verification_threshold,
+        "configured": error_rates(shares, labels, verification_threshold),
+        "equal_error_rate": equal_error_rate(curves["verification"]),
+        "curves": curves,
+        "latency": latency_summary(frames, wall_seconds, workers),
+        "cascade": None,
+    }
+
+    if all("cascade" in frame for frame in frames):
+        report["cascade"] = cascade_summary(frames, shares, labels, verification_threshold)
+
+    return report
+
+
+def print_report(report):
+    """Prints the accuracy, threshold curves and latency of an evaluation.
+
+    Args:
+        report (dict): Report returned by evaluate.
+    """
+
+    print(
+        f"{report['model_path']}: {report['frames']} frames from {report['probes']} "
+        f"probes ({report['genuine_frames']} genuine, {report['impostor_frames']} impostor)"
+    )
+
+    configured = report["configured"]
+    print(
+        f"At detection {report['detection_threshold']} / verification "
+        f"{report['verification_threshold']}: accuracy {configured['accuracy']:.4f}, "
+        f"FAR {configured['far']:.4f}, FRR {configured['frr']:.4f}"
+    )
+
+    equal = report["equal_error_rate"]
+    print(
+        f"Equal error rate {(equal['far'] + equal['frr']) / 2:.4f} "
+        f"at verification threshold {equal['threshold']:.2f}"
+    )
+
+    for name, curve in report["curves"].items():
+        print(f"\n{name} threshold   FAR      FRR      accuracy")
+
+        for row in curve:
+            print(
+                f"{row['threshold']:17.2f}   {row['far']:.4f}   "
+                f"{row['frr']:.4f}   {row['accuracy']:.4f}"
+            )
+
+    print("\nstage        mean ms   p50 ms   p95 ms   p99 ms   per second")
+
+    for stage in STAGES + ("total",):
+        timing = report["latency"][stage]
+        print(
+            f"{stage:10} {timing['mean_ms']:9.2f} {timing['p50_ms']:8.2f} "
+            f"{timing['p95_ms']:8.2f} {timing['p99_ms']:8.2f} "
+            f"{timing['per_second_per_worker']:12.1f}"
+        )
+
+    throughput = report["latency"]["throughput"]
+    print(
+        f"\n{throughput['frames']} frames in {throughput['wall_seconds']:.1f} s with "
+        f"{throughput['workers']} workers: {throughput['frames_per_second']:.1f} frames/s"
+    )
+
+    cascade = report["cascade"]
+
+    if cascade is not None:
+        configured = cascade["configured"]
+        print(
+            f"\nCascade: {cascade['hit_rate']:.0%} of frames decided by the cheap model, "
+            f"{cascade['agreement']:.2%} agreeing with the full model\n"
+            f"Accuracy {configured['accuracy']:.4f}, FAR {configured['far']:.4f}, "
+            f"FRR {configured['frr']:.4f}\n"
+            f"Scoring {cascade['mean_ms']:.2f} ms mean, {cascade['p95_ms']:.2f} ms p95 "
+            f"(cheap model {cascade['cheap_mean_ms']:.2f} ms, "
+            f"full model {cascade['full_mean_ms']:.2f} ms)"
+        )
+
+
+def save_curves(report, file_path):
+    """Saves the threshold curves of an evaluation as a csv file.
+
+    Args:
+        report (dict): Report returned by evaluate.
+        file_path (str): File path of the csv file.
+    """
+
+    with open(file_path, "w", newline="") as open_file:
+        writer = csv.writer(open_file)
+        writer.writerow(["sweep", "threshold", "far", "frr", "accuracy"])
+
+        for name, curve in report["curves"].items():
+            for row in curve:
+                writer.writerow(
+                    [name, row["threshold"], row["far"], row["frr"], row["accuracy"]]
+                )
+
+
+def main(argv=None):
+    """Runs the evaluation command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    settings = load_settings("scoring")
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.evaluation",
+        description="Evaluate the verification pipeline over labeled images and videos.",
+    )
+    parser.add_argument("--data", required=True)
+    parser.add_argument("--model", default=settings["model_path"])
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--frame-step", type=int, default=5)
+    parser.add_argument(
+        "--detection-threshold", type=float, default=settings["detection_threshold"]
+    )
+    parser.add_argument(
+        "--verification-threshold",
+        type=float,
+        default=settings["verification_threshold"],
+    )
+    parser.add_argument("--steps", type=int, default=21)
+    parser.add_argument("--output", help="json file the full report is saved to")
+    parser.add_argument("--curves", help="csv file the FAR/FRR curves are saved to")
+
+    args = parser.parse_args(argv)
+    settings["model_path"] = args.model
+
+    report = evaluate(
+        args.data,
+        args.workers,
+        args.frame_step,
+        args.detection_threshold,
+        args.verification_threshold,
+        args.steps,
+        settings,
+    )
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as open_file:
+            json.dump(report, open_file, indent=4)
+
+    if args.curves:
+        save_curves(report, args.curves)
+
+
+if __name__ == "__main__":
+    main()
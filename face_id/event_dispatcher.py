@@ -0,0 +1,159 @@
+import threading
+import time
+
+from face_id.settings import load_settings
+
+
+class ProcessEventDispatcher:
+    """
+    Coalesces protected process detections into one verification request per launch.
+
+    Sits between the monitor thread's process scans and the GUI. Detections of the same
+    app are treated as one launch burst until the app hasn't been seen for the debounce
+    window, and only the first detection of a burst asks for verification. Processes that
+    were already sent a terminate signal aren't signalled again until the termination
+    timeout passes. Suppressed events and terminations are counted.
+
+    Attributes:
+        debounce_seconds (float): Seconds without a detection that end a launch burst.
+        termination_timeout_seconds (float): Seconds to wait for a process to exit before signalling it again.
+    """
+
+    def __init__(self, debounce_seconds=5, termination_timeout_seconds=10):
+        """Initializes the event dispatcher.
+
+        Args:
+            debounce_seconds (float): Seconds without a detection that end a launch burst.
+            termination_timeout_seconds (float): Seconds to wait for a process to exit.
+        """
+
+        self.debounce_seconds = debounce_seconds
+        self.termination_timeout_seconds = termination_timeout_seconds
+
+        self._last_seen = {}
+        self._pending = set()
+        self._terminating = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "events": 0,
+            "requests": 0,
+            "suppressed_events": 0,
+            "terminations": 0,
+            "suppressed_terminations": 0,
+        }
+
+    @classmethod
+    def from_settings(cls):
+        """Creates an event dispatcher from the "event_dispatcher" settings section.
+
+        Returns:
+            ProcessEventDispatcher: Dispatcher using the saved or default settings.
+        """
+
+        return cls(**load_settings("event_dispatcher"))
+
+    def should_terminate(self, pid):
+        """Checks if a process needs to be sent a terminate signal.
+
+        A process that was signalled less than the termination timeout ago is
+        still exiting, so it isn't signalled again.
+
+        Args:
+            pid (int): Process id of a protected app.
+
+        Returns:
+            bool: True if the process should be terminated now.
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            signalled_at = self._terminating.get(pid)
+
+            if (
+                signalled_at is not None
+                and now - signalled_at < self.termination_timeout_seconds
+            ):
+                self._stats["suppressed_terminations"] += 1
+                return False
+
+            self._terminating[pid] = now
+            self._stats["terminations"] += 1
+            return True
+
+    def submit(self, app_name):
+        """Records a detection and checks if it should ask for verification.
+
+        Args:
+            app_name (str): Name of the detected app.
+
+        Returns:
+            bool: True if this detection starts a new launch burst and should ask for verification.
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            self._stats["events"] += 1
+            last_seen = self._last_seen.get(app_name)
+            self._last_seen[app_name] = now
+
+            if app_name in self._pending or (
+                last_seen is not None and now - last_seen < self.debounce_seconds
+            ):
+                self._stats["suppressed_events"] += 1
+                return False
+
+            self._pending.add(app_name)
+            self._stats["requests"] += 1
+            return True
+
+    def resolve(self, app_name):
+        """Marks the verification request of an app as finished.
+
+        The next launch of the app asks for verification again, even if it's
+        within the debounce window.
+
+        Args:
+            app_name (str): Name of the app.
+        """
+
+        with self._lock:
+            self._pending.discard(app_name)
+            self._last_seen.pop(app_name, None)
+
+    def prune(self, running_pids):
+        """Forgets terminations of processes that have exited.
+
+        Args:
+            running_pids (set): Process ids that are still running.
+        """
+
+        with self._lock:
+            for pid in list(self._terminating):
+                if pid not in running_pids:
+                    del self._terminating[pid]
+
+    def stats(self):
+        """Returns the dispatcher's counters.
+
+        Returns:
+            dict: Number of events, requests, suppressed events and terminations.
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+
+        return stats
+
+    def report(self):
+        """Prints the dispatcher's counters."""
+
+        stats = self.stats()
+        print(
+            f"Process events: {stats['events']} detected, {stats['requests']} "
+            f"verification requests, {stats['suppressed_events']} suppressed, "
+            f"{stats['terminations']} terminations, "
+            f"{stats['suppressed_terminations']} repeat terminations suppressed"
+        )
@@ -0,0 +1,131 @@
+import cv2
+import numpy as np
+
+POLICIES = ("any", "primary", "reject_unknown")
+
+
+class FaceDetector:
+    """
+    Finds every face in a full webcam frame with an OpenCV Haar cascade.
+
+    Faces are returned largest first, so the first face is the primary one, the
+    person closest to the webcam. Each face is cropped to a square with a margin
+    around it, like the fixed crop of the verify window.
+
+    Attributes:
+        scale_factor (float): How much the image is shrunk between detection scales.
+        min_neighbors (int): Number of overlapping detections needed to keep a face.
+        min_size (int): Smallest face width and height in pixels.
+        margin (float): Share of the face size added around each crop.
+    """
+
+    def __init__(self, scale_factor=1.1, min_neighbors=5, min_size=60, margin=0.2):
+        """Initializes the face detector and loads its cascade.
+
+        Args:
+            scale_factor (float): How much the image is shrunk between detection scales.
+            min_neighbors (int): Number of overlapping detections needed to keep a face.
+            min_size (int): Smallest face width and height in pixels.
+            margin (float): Share of the face size added around each crop.
+        """
+
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.margin = margin
+
+        self._cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        )
+
+    def detect(self, frame):
+        """Finds the faces in a frame.
+
+        Args:
+            frame (ndarray): OpenCV image of the full webcam frame.
+
+        Returns:
+            list: Box of every face as (x, y, width, height), largest first.
+        """
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        boxes = self._cascade.detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=(self.min_size, self.min_size),
+        )
+
+        return sorted(
+            (tuple(int(value) for value in box) for box in boxes),
+            key=lambda box: box[2] * box[3],
+            reverse=True,
+        )
+
+    def crop(self, frame, box):
+        """Crops a square around a face, with a margin, clipped to the frame.
+
+        Args:
+            frame (ndarray): OpenCV image of the full webcam frame.
+            box (tuple): Box of the face as (x, y, width, height).
+
+        Returns:
+            ndarray: The cropped OpenCV image.
+        """
+
+        x, y, width, height = box
+        size = int(max(width, height) * (1 + self.margin))
+        center_x = x + width // 2
+        center_y = y + height // 2
+
+        top = max(center_y - size // 2, 0)
+        left = max(center_x - size // 2, 0)
+        bottom = min(top + size, frame.shape[0])
+        right = min(left + size, frame.shape[1])
+
+        return frame[top:bottom, left:right, :]
+
+
+def check_policy(policy):
+    """Checks that a multiple face policy is one of the known policies.
+
+    Args:
+        policy (str): Name of the policy.
+
+    Raises:
+        ValueError: If the policy isn't in POLICIES.
+    """
+
+    if policy not in POLICIES:
+        raise ValueError(
+            f"Unknown multiple face policy {policy!r}, use one of {', '.join(POLICIES)}"
+        )
+
+
+def apply_policy(decisions, policy):
+    """Combines the decisions of every face in a frame into one verification.
+
+    Args:
+        decisions (list): If each face was verified, largest face first.
+        policy (str): "any" to verify if any face is the user, "primary" to only use the
+            largest face, or "reject_unknown" to reject if any face isn't the user.
+
+    Returns:
+        bool: True if the frame is verified.
+
+    Raises:
+        ValueError: If the policy isn't in POLICIES.
+    """
+
+    check_policy(policy)
+
+    if len(decisions) == 0:
+        return False
+
+    if policy == "primary":
+        return bool(decisions[0])
+
+    if policy == "reject_unknown":
+        return bool(np.all(decisions))
+
+    return bool(np.any(decisions))
@@ -1,14 +1,32 @@
 import cv2
 import numpy as np
-import psutil
-import json
 import os
+import time
 
-os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
+from face_id import runtime
+
+runtime.apply_environment()
 
 import tensorflow as tf
 
-from face_id.layers import L1Dist
+runtime.configure_tensorflow(tf)
+
+from face_id.approval_cache import ApprovalCache
+from face_id.audit_log import audit
+from face_id.cascade import CascadeScorer
+from face_id.condensation import PrototypeStore, condense, weighted_verification
+from face_id.enforcement import ProcessHolder
+from face_id.event_dispatcher import ProcessEventDispatcher
+from face_id.face_detection import FaceDetector, apply_policy, check_policy
+from face_id.gallery import AdaptiveGallery, GalleryStore
+from face_id.governor import get_governor
+from face_id.lifetime import LifetimeTracker
+from face_id.model_manager import ModelManager
+from face_id.preprocessing import crop_frame, preprocess, preprocess_frame
+from face_id.process_monitor import ProcessMonitor
+from face_id.settings import load_settings
+from face_id.shadow import ShadowEvaluator
+from face_id.speculative import SpeculativeVerifier
 from PyQt5 import QtGui
 from PyQt5.QtCore import pyqtSignal as Signal, Qt, QThread, QObject
 from PyQt5.QtGui import QPixmap
@@ -20,73 +38,386 @@ class FaceVerifier(QObject):
 
     Uses the siamese neural network to determine the distance, similarity, between the current
     webcam image and the user's face id images. If enough distances are considered verified
-    then true is emited for other classes to perform operations.
+    then true is emited for other classes to perform operations. The model manager and the preprocessed
+    face id images are shared between every verifier, so they are only loaded once.
 
     Attributes:
         verified_signal (pyqtSignal): signal that emits a bool if the image is verified or not.
+        speculative_signal (pyqtSignal): signal emitted when a background verification is accepted without pressing verify.
+        detection_threshold (float): score a face id image needs to be counted as a detection.
+        verification_threshold (float): share of detected face id images needed to be verified.
+        model_manager (ModelManager): loads the scorer for the webcam image on demand and releases it when idle.
+        cascade (CascadeScorer): decides confident verifications with a cheap model before the full model.
+        shadow (ShadowEvaluator): scores verifications with a candidate model in the background.
+        speculative (SpeculativeVerifier): verifies webcam frames in the background from the moment an app is detected.
+        adaptive_gallery (AdaptiveGallery): adds confidently verified images to the face id images.
+        condensation (dict): settings for scoring against weighted prototypes of the face id images.
+        multi_face (dict): settings for verifying every face found in the full webcam frame.
+        face_detector (FaceDetector): finds the faces in the full webcam frame.
+        app_name (str): name of the app being verified for, saved to the audit log.
     """
 
     verified_signal = Signal(bool)
+    speculative_signal = Signal()
+
+    detection_threshold = load_settings("scoring")["detection_threshold"]
+    verification_threshold = load_settings("scoring")["verification_threshold"]
+
+    model_manager = ModelManager.from_settings()
+    cascade = CascadeScorer.from_settings()
+    shadow = ShadowEvaluator.from_settings()
+    speculative = SpeculativeVerifier.from_settings()
+    _gallery = None
+    _gallery_key = None
+    _gallery_embeddings = None
+    _embedded_gallery = None
 
     def __init__(self):
-        """Initializes the FaceVerifier class."""
+        """Initializes the FaceVerifier class.
+
+        Raises:
+            ValueError: If the multiple face policy in the settings is unknown.
+        """
 
         super().__init__()
+        self.adaptive_gallery = AdaptiveGallery()
+        self.condensation = load_settings("condensation")
+        self.prototype_store = PrototypeStore()
+        self.multi_face = load_settings("multi_face")
+        check_policy(self.multi_face["policy"])
+        self.face_detector = FaceDetector(
+            self.multi_face["scale_factor"],
+            self.multi_face["min_neighbors"],
+            self.multi_face["min_size"],
+            self.multi_face["margin"],
+        )
+        self.app_name = ""
 
-    def verify(self, current_image, verified_label, *args):
+    def verify(self, current_image, verified_label, frame=None, *args):
         """Preforms facial verification with a siamese neural network.
 
         Uses a siamese neural network to calculate the distance, similarity,
         between the user's webcam image and the saved face id images. Users are
         considered verified if thier distance values are higher than the detection
         threshold, and when the total number of detected images divided by the total amount of
-        face id images is higher than the verification threshold.
+        face id images is higher than the verification threshold. When the cascade is enabled a
+        cheap model decides first, and the siamese neural network is only used if it's uncertain.
+        In shadow mode the webcam image is also queued to be scored by the candidate model. If
+        a background verification already verified a recent frame, that decision is used.
+        When multiple face verification is enabled every face in the full frame is verified instead.
 
         Args:
             current_image (ndarray): Current webcam image that is saved as the input image.
             verified_label (QLabel): Text label that displays if the verification failed.
+            frame (ndarray): Full webcam frame the current image was cropped from.
             *args: Arbitrary non-keyword arguments with tuple values.
         """
 
-        self.model = tf.keras.models.load_model(
-            "face_id/siamesemodelv2.h5", custom_objects={"L1Dist": L1Dist}
-        )
+        if self.multi_face["enabled"] and frame is not None:
+            self.verify_faces(frame, verified_label)
+            return
+
+        start = time.perf_counter()
+
+        decision = self.speculative.take()
 
-        detection_threshold = 0.5
-        verification_threshold = 0.5
+        if decision is not None:
+            current_image = decision["image"]
 
-        file_path = os.path.join("face_id/image_data", "input_image", "input_image.jpg")
-        cv2.imwrite(file_path, current_image)
+        input_image = preprocess_frame(current_image)
+        gallery = self.load_gallery()
+        weights = None
+        verified = None
+        stage = "full"
 
-        results = []
-        for image in os.listdir(
-            os.path.join("face_id/image_data", "verification_images")
-        ):
-            input_image = self.preprocess(
-                os.path.join("face_id/image_data", "input_image", "input_image.jpg")
+        if decision is not None:
+            results = decision["results"]
+            weights = decision["weights"]
+            verified = True
+            stage = "speculative"
+
+        elif self.cascade.enabled and len(gallery) > 0:
+            results, verified = self.cascade.first_stage(
+                input_image,
+                gallery,
+                self.detection_threshold,
+                self.verification_threshold,
             )
-            validation_image = self.preprocess(
-                os.path.join("face_id/image_data", "verification_images", image)
+            stage = "cheap" if verified is not None else "full"
+
+        if verified is None:
+            results, weights = self.score(input_image, gallery)
+            verified = self.decide(results, weights)
+
+            if self.cascade.enabled:
+                self.cascade.record("full", start)
+
+        results = np.reshape(results, [-1])
+        latency_ms = (time.perf_counter() - start) * 1000
+        audit(
+            "verification",
+            app=self.app_name,
+            verified=verified,
+            latency_ms=latency_ms,
+            templates=len(results),
+            detections=int(np.sum(results > self.detection_threshold)),
+            mean_score=float(np.mean(results)) if len(results) else 0.0,
+            max_score=float(np.max(results)) if len(results) else 0.0,
+            prototypes=weights is not None,
+            stage=stage,
+        )
+        self.shadow.submit(
+            input_image,
+            gallery,
+            results if weights is None and stage != "cheap" else None,
+            verified,
+            latency_ms,
+            self.detection_threshold,
+            self.verification_threshold,
+            self.app_name,
+            stage,
+        )
+
+        # Only full model scores against every face id image line up with the
+        # templates and the adaptive gallery's thresholds.
+        if verified == True and stage == "full" and weights is None:
+            self.adaptive_gallery.submit(
+                current_image,
+                input_image,
+                results,
+                self.detection_threshold,
+                self.model_manager,
+                gallery,
             )
-            result = self.model.predict(
-                list(np.expand_dims([input_image, validation_image], axis=1))
+
+        self.speculative.finish(
+            verified, "speculative" if stage == "speculative" else "verify"
+        )
+
+        if verified == True:
+            self.verified_signal.emit(True)
+
+        else:
+            verified_label.setText("Unverified, please try again")
+            self.verified_signal.emit(False)
+
+    def score(self, input_image, gallery):
+        """Scores a preprocessed webcam image with the siamese neural network.
+
+        Args:
+            input_image (ndarray): Preprocessed webcam image.
+            gallery (ndarray): Batch of preprocessed face id images.
+
+        Returns:
+            tuple: Score against every face id image or prototype, and the prototype weights or None.
+        """
+
+        weights = None
+
+        with self.model_manager.use() as scorer:
+            if self.condensation["enabled"] and len(gallery) > 0:
+                prototypes, weights = self.load_prototypes(gallery, scorer)
+                probe_embedding = scorer.embed(np.expand_dims(input_image, axis=0))
+                results = scorer.score_embeddings(probe_embedding, prototypes)
+
+            else:
+                results = scorer.score(input_image, gallery)
+
+        return results, weights
+
+    def analyze_frame(self, frame):
+        """Finds and verifies every face in a webcam frame.
+
+        The faces are preprocessed into one batch, embedded in one pass and
+        scored against the embedded face id images, or their prototypes when
+        condensation is enabled.
+
+        Args:
+            frame (ndarray): Full webcam frame.
+
+        Returns:
+            list: Box, weighted share of detections and decision of every face, largest first.
+        """
+
+        boxes = self.face_detector.detect(frame)
+        gallery = self.load_gallery()
+
+        if len(boxes) == 0 or len(gallery) == 0:
+            return [{"box": box, "verification": 0.0, "verified": False} for box in boxes]
+
+        inputs = np.stack(
+            [preprocess_frame(self.face_detector.crop(frame, box)) for box in boxes]
+        )
+
+        with self.model_manager.use() as scorer:
+            probe_embeddings = scorer.embed(inputs)
+
+            if self.condensation["enabled"]:
+                templates, weights = self.load_prototypes(gallery, scorer)
+
+            else:
+                templates = self.embed_gallery(gallery, scorer)
+                weights = np.ones(len(templates), np.float32)
+
+            results = [
+                scorer.score_embeddings(probe_embedding, templates)
+                for probe_embedding in probe_embeddings
+            ]
+
+        faces = []
+        for box, face_results in zip(boxes, results):
+            faces.append(
+                {
+                    "box": box,
+                    "verification": weighted_verification(
+                        face_results, weights, self.detection_threshold
+                    ),
+                    "verified": self.decide(face_results, weights),
+                }
             )
-            results.append(result)
 
-        detection = np.sum(np.array(results) > detection_threshold)
+        return faces
+
+    def verify_faces(self, frame, verified_label):
+        """Verifies every face in a webcam frame and combines them with the multiple face policy.
 
-        verification = detection / len(
-            os.listdir(os.path.join("face_id/image_data", "verification_images"))
+        Every face is scored with the full model, the cascade, shadow evaluation
+        and adaptive gallery only handle single face verifications.
+
+        Args:
+            frame (ndarray): Full webcam frame.
+            verified_label (QLabel): Text label that displays if the verification failed.
+        """
+
+        start = time.perf_counter()
+        faces = self.analyze_frame(frame)
+        verified = apply_policy(
+            [face["verified"] for face in faces], self.multi_face["policy"]
         )
-        verified = verification > verification_threshold
+
+        audit(
+            "verification",
+            app=self.app_name,
+            verified=verified,
+            latency_ms=(time.perf_counter() - start) * 1000,
+            faces=len(faces),
+            face_verifications=[face["verification"] for face in faces],
+            policy=self.multi_face["policy"],
+        )
+        self.speculative.finish(verified, "verify")
 
         if verified == True:
             self.verified_signal.emit(True)
 
         else:
-            verified_label.setText("Unverified, please try again")
+            if len(faces) == 0:
+                verified_label.setText("No face found, please try again")
+
+            elif self.multi_face["policy"] == "reject_unknown" and any(
+                face["verified"] for face in faces
+            ):
+                verified_label.setText("Unknown face in view, please try again")
+
+            else:
+                verified_label.setText("Unverified, please try again")
+
             self.verified_signal.emit(False)
 
+    def embed_gallery(self, gallery, scorer):
+        """Embeds the face id images, keeping the embeddings until the gallery changes.
+
+        Args:
+            gallery (ndarray): Batch of preprocessed face id images.
+            scorer (GraphScorer or KerasScorer): Scorer used to embed the face id images.
+
+        Returns:
+            ndarray: Embedding of every face id image.
+        """
+
+        if gallery is not FaceVerifier._embedded_gallery:
+            FaceVerifier._gallery_embeddings = scorer.embed(gallery)
+            FaceVerifier._embedded_gallery = gallery
+
+        return FaceVerifier._gallery_embeddings
+
+    def decide(self, results, weights=None):
+        """Checks if enough face id images were detected for the user to be verified.
+
+        When scoring against prototypes each detection is weighted by the
+        share of face id images its prototype stands for.
+
+        Args:
+            results (ndarray): Score of the input image against every face id image or prototype.
+            weights (ndarray): Weight of every prototype, every result counts the same if None.
+
+        Returns:
+            bool: True if the user is verified.
+        """
+
+        if len(results) == 0:
+            return False
+
+        if weights is None:
+            weights = np.ones(len(results), np.float32)
+
+        verification = weighted_verification(
+            results, weights, self.detection_threshold
+        )
+        return bool(verification > self.verification_threshold)
+
+    def load_prototypes(self, gallery, scorer):
+        """Loads the prototypes of the active gallery, building them if they're out of date.
+
+        Args:
+            gallery (ndarray): Batch of preprocessed face id images.
+            scorer (GraphScorer or KerasScorer): Scorer used to embed the face id images.
+
+        Returns:
+            tuple: The prototype embeddings and their weights.
+        """
+
+        manifest = self.adaptive_gallery.store.load()
+        model_path = load_settings("scoring")["model_path"]
+        saved = self.prototype_store.load(manifest, model_path)
+
+        if saved is not None:
+            return saved
+
+        prototypes, weights = condense(
+            scorer.embed(gallery),
+            self.condensation["prototypes"],
+            self.condensation["method"],
+        )
+        self.prototype_store.save(prototypes, weights, manifest, model_path)
+        return prototypes, weights
+
+    def load_gallery(self):
+        """Loads and preprocesses the saved face id images.
+
+        The images are listed by the active version of the gallery. The
+        preprocessed images are kept until a face id image is added, removed
+        or changed, so they aren't decoded again on every verification.
+
+        Returns:
+            ndarray: Batch of preprocessed face id images.
+        """
+
+        file_paths = self.adaptive_gallery.store.file_paths()
+        gallery_key = [(path, os.path.getmtime(path)) for path in file_paths]
+
+        if gallery_key != FaceVerifier._gallery_key:
+            if len(file_paths) == 0:
+                FaceVerifier._gallery = np.zeros((0, 100, 100, 3), np.float32)
+
+            else:
+                FaceVerifier._gallery = np.stack(
+                    [self.preprocess(path) for path in file_paths]
+                )
+
+            FaceVerifier._gallery_key = gallery_key
+
+        return FaceVerifier._gallery
+
     def preprocess(self, file_path):
         """Loads an image and alters its size/scale.
 
@@ -102,52 +433,58 @@ class FaceVerifier(QObject):
             tensorflow.python.framework.ops.EagerTensor: image data used in verification calculations.
         """
 
-        byte_image = tf.io.read_file(file_path)
-        image = tf.io.decode_jpeg(byte_image)
-        image = tf.image.resize(image, (100, 100))
-        image = image / 255.0
-        return image
+        return preprocess(file_path)
 
 
-class IDUpdater:
+class IDUpdater(QObject):
     """
-    Deletes old face id images and saves the user's new ones to a folder.
+    Replaces the user's face id images with new ones.
+
+    The new images are encoded in parallel into a new gallery generation, which only
+    becomes the active gallery once every image is saved to disk. Verifications keep
+    using the old images until then, and the old generation can still be restored.
+    The new images replace every template in the gallery, including ones added by the
+    adaptive gallery.
 
-    Updates the user's face id images by deleting any old images in the
-    verification_images folder before saving their new ones into the
-    same folder.
+    Attributes:
+        updated_signal (pyqtSignal): signal that emits a bool once the update finished or failed.
+        workers (int): number of threads encoding images.
     """
 
+    updated_signal = Signal(bool)
+
+    def __init__(self):
+        """Initializes the IDUpdater class."""
+
+        super().__init__()
+        self.workers = load_settings("enrollment")["workers"]
+
     def update(self, image_array, *args):
         """Updates old face id images with new images.
 
-        Takes a list of images that have been captured from the user's
-        webcam and adds them to the "verification_images" folder. If
-        this folder has images inside of it then the old images are
-        deleted before adding the new images.
+        Takes a list of images that have been captured from the user's webcam
+        and saves them as a new gallery generation, then emits if the update
+        succeeded.
 
         Args:
             image_array (list): List containing images from the user's webcam.
             *args: Arbitrary non-keyword arguments with tuple values.
         """
 
-        dir_path = os.path.join("face_id/image_data", "verification_images")
-
-        if len(os.listdir(dir_path)) > 0:
-            for filename in os.listdir(dir_path):
-                file_path = os.path.join(dir_path, filename)
-                os.remove(file_path)
-                print(f"Deleted file: {filename}")
-
-        for idx in range(len(image_array)):
-            cv2.imwrite(
-                os.path.join(
-                    "face_id/image_data",
-                    "verification_images",
-                    "verfication_image_" + str(idx) + ".jpg",
-                ),
-                image_array[idx],
-            )
+        store = GalleryStore(
+            keep_versions=load_settings("adaptive_gallery")["keep_versions"]
+        )
+
+        try:
+            manifest = store.replace_enrolled(image_array, self.workers)
+
+        except (OSError, ValueError) as error:
+            print(f"Could not update ID images: {error}")
+            self.updated_signal.emit(False)
+            return
+
+        print(f"Saved {len(manifest['templates'])} ID images")
+        self.updated_signal.emit(True)
 
 
 class VideoThread(QThread):
@@ -161,16 +498,20 @@ class VideoThread(QThread):
     Attributes:
         pixmap_signal (pyqtSignal): signal that emits a pixmap used to update the verify window's image label.
         image_signal (pyqtSignal): signal that emits a opencv image used in the id image updater.
+        frame_signal (pyqtSignal): signal that emits the full opencv frame used to find multiple faces.
+        governor (ResourceGovernor): sets the capture frame rate.
     """
 
     pixmap_signal = Signal(QPixmap)
     image_signal = Signal(np.ndarray)
+    frame_signal = Signal(np.ndarray)
 
     def __init__(self):
         """Initializes the video thread class."""
 
         super().__init__()
         self._run_flag = True
+        self.governor = get_governor()
 
     def run(self):
         """Captures and resizes the user's webcam image.
@@ -179,7 +520,8 @@ class VideoThread(QThread):
         captured and resized to match to match the images
         used for verification. Also emits the current image
         to be used in verification and sends it to be converted
-        to a pixmap.
+        to a pixmap. Frames are captured at the rate set by the
+        resource governor.
 
         Raises:
             TypeError: If any wrong data types are passed through while trying to capture the webcam image.
@@ -189,13 +531,19 @@ class VideoThread(QThread):
             cap = cv2.VideoCapture(0)
 
             while self._run_flag:
+                start = time.perf_counter()
                 ret, cv_image = cap.read()
-                cv_image = cv_image[120 : 120 + 250, 200 : 200 + 250, :]
 
                 if ret:
+                    self.frame_signal.emit(cv_image)
+                    cv_image = crop_frame(cv_image)
                     self.image_signal.emit(cv_image)
                     self.convert_cv_qt(cv_image)
 
+                delay = self.governor.frame_interval() - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
             cap.release()
 
         except TypeError:
@@ -242,22 +590,38 @@ class MonitorThread(QThread):
 
     Attributes:
         file_opened (pyqtSignal): signal that emits an app's name and path.
-        approved_array (list): list used to store if the user was verified to use a protected app.
+        approval_cache (ApprovalCache): cache of the apps the user was verified to use, shared by every monitor thread.
+        event_dispatcher (ProcessEventDispatcher): coalesces detections into one verification request per launch.
+        process_holder (ProcessHolder): suspends protected apps during verification when in hold mode.
+        lifetime_tracker (LifetimeTracker): revokes an app's approval when its last approved process exits.
     """
 
     file_opened = Signal(str, str)
 
-    approved_array = []
+    approval_cache = ApprovalCache.from_settings()
+    event_dispatcher = ProcessEventDispatcher.from_settings()
+    process_holder = ProcessHolder.from_settings()
+    lifetime_tracker = LifetimeTracker.from_settings(
+        approval_cache=approval_cache, process_holder=process_holder
+    )
 
     def __init__(self):
         """Initializes the monitor thread class.
 
         Initializes the class by calling the super's __init__
-        function, loading the list of protected apps, and starting
-        the thread.
+        function, creating the process monitor that loads the list
+        of protected apps, and starting the thread.
         """
 
         super().__init__()
+        self.monitor = ProcessMonitor.from_settings(
+            approval_cache=self.approval_cache,
+            event_dispatcher=self.event_dispatcher,
+            process_holder=self.process_holder,
+            governor=get_governor(),
+            lifetime_tracker=self.lifetime_tracker,
+            on_request=self.file_opened.emit,
+        )
         self.get_process_list()
         self.run_flag = True
 
@@ -270,65 +634,119 @@ class MonitorThread(QThread):
         """Searches for and stops protected apps if they are running.
 
         Looks through all running processes to see if any app in the
-        process_names list is open, and closes the app if it's running.
-        If the user has been verified to use the app, having "True" in the
-        approved_array with the same index as an app's name in process_names, then
-        that app will remain open. Also, the app's name and path are emitted to be
-        used in the verification process.
+        process_names list is open, and closes the app, together with the
+        helper processes it started, if it's running.
+        If the user has been verified to use the app, having an approval in the
+        approval_cache that hasn't expired, then that app will remain open. Also,
+        the app's name and path are emitted to be used in the verification process,
+        once per launch burst as decided by the event_dispatcher. The scan itself
+        is done by the process monitor in "face_id/process_monitor".
 
         Args:
             process_names (list): List of processes that are protected by this app.
+        """
 
-        Raises:
-            psutil.NoSuchProcess: If a protected process is open but can't be properly closed.
+        self.monitor.protected_processes = set(process_names)
+        self.monitor.run(lambda: self.run_flag)
+
+    def get_process_list(self):
+        """Gets a list of protected processes.
+
+        Loads a list of protected processes from the protected apps file and sets it to a variable.
         """
 
-        while self.run_flag:
-            for proc in psutil.process_iter(["pid", "name", "exe"]):
-                if proc.info["name"] in process_names:
-                    if (
-                        self.approved_array[
-                            self.protected_processes.index(proc.info["name"])
-                        ]
-                        == False
-                    ):
-                        try:
+        self.monitor.load_protected()
+        self.protected_processes = list(self.monitor.protected_processes)
 
-                            if proc.is_running():
-                                proc.terminate()
+    def update_verified_status(self, app_name, app_path=None, pid=None):
+        """Updates the approved status for an app the user has been verified to use.
 
-                            self.file_opened.emit(proc.info["name"], proc.info["exe"])
-                            print(f"Killed process: {proc.info['name']}")
+        Adds an approval for the app to the approval_cache, which lets new
+        launches of the app run until the cache's time to live or idle timeout
+        runs out. Without a process id, an approval kept per process id is taken
+        by the next launch of the app.
 
-                        except psutil.NoSuchProcess:
-                            print(f"Process not found: {proc.info['name']}")
+        Args:
+            app_name (str): Name of an app that the user is verified to use.
+            app_path (str): File path of the app.
+            pid (int): Process id of the app.
+        """
+        self.approval_cache.approve(app_name, app_path, pid)
+        audit("approval", app=app_name, exe=app_path, pid=pid)
 
-    def get_process_list(self):
-        """Gets a list of protected processes and sets a default approval status.
+    def revoke_verified_status(self, app_name, app_path=None):
+        """Removes the approved status for an app.
 
-        Loads a list of protected processes from a file and sets it to a variable.
-        Also, adds a "False" to the approval array for each process if the
-        approval array is empty.
+        Args:
+            app_name (str): Name of an app.
+            app_path (str): File path of the app.
         """
+        self.approval_cache.revoke(app_name, app_path)
+        audit("revocation", app=app_name, exe=app_path)
 
-        with open("face_id/protected_data.json", "r") as open_file:
-            self.protected_processes = json.load(open_file)
+    def resume_held(self, app_name, app_path=None):
+        """Resumes the held processes of an app the user was verified for.
 
-        if len(self.approved_array) == 0:
-            for idx in self.protected_processes:
-                self.approved_array.append(False)
+        The held processes are admitted before they're resumed, so they
+        aren't held again by the next scan and run until they exit.
 
-    def update_verified_status(self, app_name):
-        """Updates the approved status for an app the user has been verified to use.
+        Args:
+            app_name (str): Name of the app.
+            app_path (str): File path of the app.
+
+        Returns:
+            list: Process ids that were resumed.
+        """
+        self.approval_cache.admit(
+            app_name, app_path, self.process_holder.held_processes(app_name)
+        )
 
-        Changes an index in the approved_array to "True",
-        with the index being the same value as the index
-        of app_name inside the protected_processes array.
+        pids = self.process_holder.resume(app_name)
+
+        if len(pids) > 0:
+            audit("resume", app=app_name, pids=pids)
+
+        return pids
+
+    def terminate_held(self, app_name, reason):
+        """Terminates the held processes of an app.
 
         Args:
-            app_name (str): Name of an app that the user is verified to use.
+            app_name (str): Name of the app.
+            reason (str): Why the processes were terminated, saved to the audit log.
+
+        Returns:
+            list: Process ids that were terminated.
+        """
+        pids = self.process_holder.terminate(app_name)
+
+        if len(pids) > 0:
+            print(f"Killed held process: {app_name}")
+            audit("termination", app=app_name, pids=pids, reason=reason)
+
+        return pids
+
+    def terminate_all_held(self):
+        """Terminates every held process, used when monitoring ends.
+
+        Returns:
+            list: Process ids that were terminated.
+        """
+        pids = self.process_holder.terminate_all()
+
+        if len(pids) > 0:
+            print(f"Killed {len(pids)} held processes")
+            audit("termination", pids=pids, reason="monitor_closed")
+
+        return pids
+
+    def resolve_request(self, app_name):
+        """Marks the verification request of an app as finished.
+
+        Args:
+            app_name (str): Name of the app the verify window was open for.
         """
-        self.approved_array[self.protected_processes.index(app_name)] = True
+        self.event_dispatcher.resolve(app_name)
 
     def stop(self):
         """Stops the monitor thread when called."""
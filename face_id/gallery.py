@@ -0,0 +1,699 @@
+"""Versioned gallery of face id templates.
+
+The images used for verification are listed in a manifest instead of being read
+from whatever is in the "verification_images" folder. Every change writes a new
+manifest version and then atomically replaces the "gallery.json" pointer, so a
+verification always sees a complete gallery and older versions can be restored.
+Enrolled images are saved into a new generation folder that is only renamed into
+place once every image is on disk, and generations stay until no kept version
+uses them:
+
+    python -m face_id.gallery history
+    python -m face_id.gallery rollback [--version N]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from face_id.audit_log import audit
+from face_id.settings import load_settings
+
+IMAGE_DATA_PATH = "face_id/image_data"
+GENERATIONS_DIR = "generations"
+STAGING_SUFFIX = ".staging"
+
+
+def write_json_atomic(file_path, data):
+    """Writes a json file so readers only ever see the old or the new contents.
+
+    Args:
+        file_path (str): File path to write to.
+        data (dict): Data to save.
+    """
+
+    temp_path = file_path + ".tmp"
+
+    with open(temp_path, "w") as save_file:
+        json.dump(data, save_file, indent=4)
+        save_file.flush()
+        os.fsync(save_file.fileno())
+
+    os.replace(temp_path, file_path)
+
+
+def fsync_directory(dir_path):
+    """Saves a folder's entries to disk, so renamed and new files survive a crash.
+
+    Folders can't be opened on Windows, where renames are already saved.
+
+    Args:
+        dir_path (str): Folder to sync.
+    """
+
+    if os.name == "nt":
+        return
+
+    dir_fd = os.open(dir_path, os.O_RDONLY)
+
+    try:
+        os.fsync(dir_fd)
+
+    finally:
+        os.close(dir_fd)
+
+
+def write_image(file_path, cv_image):
+    """Encodes an OpenCV image as a jpeg and saves it to disk.
+
+    Args:
+        file_path (str): File path to write to.
+        cv_image (ndarray): OpenCV image to save.
+
+    Raises:
+        ValueError: If the image can't be encoded.
+    """
+
+    encoded, buffer = cv2.imencode(".jpg", cv_image)
+
+    if not encoded:
+        raise ValueError(f"Could not encode {file_path}")
+
+    with open(file_path, "wb") as image_file:
+        image_file.write(buffer.tobytes())
+        image_file.flush()
+        os.fsync(image_file.fileno())
+
+
+class GalleryStore:
+    """
+    Stores the versioned list of face id templates used for verification.
+
+    Attributes:
+        root (str): Folder containing the image data.
+        pointer_path (str): File path of the manifest of the active gallery.
+        manifest_dir (str): Folder containing every kept manifest version.
+        keep_versions (int): Number of manifest versions kept for rollback.
+    """
+
+    _lock = threading.Lock()
+    _staging = set()
+
+    def __init__(self, root=IMAGE_DATA_PATH, keep_versions=5):
+        """Initializes the gallery store.
+
+        Args:
+            root (str): Folder containing the image data.
+            keep_versions (int): Number of manifest versions kept for rollback.
+        """
+
+        self.root = root
+        self.pointer_path = os.path.join(root, "gallery.json")
+        self.manifest_dir = os.path.join(root, "gallery_manifests")
+        self.keep_versions = keep_versions
+
+    def load(self):
+        """Loads the manifest of the active gallery.
+
+        If there's no manifest yet, one is created from the images in the
+        "verification_images" folder.
+
+        Returns:
+            dict: Version number and templates of the active gallery.
+        """
+
+        if os.path.exists(self.pointer_path):
+            with open(self.pointer_path, "r") as manifest_file:
+                return json.load(manifest_file)
+
+        dir_path = os.path.join(self.root, "verification_images")
+        file_names = sorted(os.listdir(dir_path)) if os.path.exists(dir_path) else []
+        return {
+            "version": 0,
+            "created": time.time(),
+            "templates": [
+                self.make_template(os.path.join("verification_images", name), "enrolled")
+                for name in file_names
+            ],
+        }
+
+    def make_template(self, file_name, source, score=None):
+        """Creates the manifest entry of a template.
+
+        Args:
+            file_name (str): File path of the template, relative to the image data folder.
+            source (str): "enrolled" for images saved by the user, "adaptive" for added ones.
+            score (float): Mean verification score of an adaptive template.
+
+        Returns:
+            dict: Manifest entry of the template.
+        """
+
+        return {
+            "file": file_name,
+            "source": source,
+            "added": time.time(),
+            "score": score,
+        }
+
+    def file_paths(self, manifest=None):
+        """Gets the file paths of every template in a gallery.
+
+        Args:
+            manifest (dict): Manifest of a gallery, the active one if None.
+
+        Returns:
+            list: File paths of the templates.
+        """
+
+        if manifest is None:
+            manifest = self.load()
+
+        return [
+            os.path.join(self.root, template["file"])
+            for template in manifest["templates"]
+        ]
+
+    def commit(self, templates, reason="update"):
+        """Saves a new version of the gallery and makes it the active one.
+
+        The new manifest is saved with its version number first, then the
+        pointer is replaced in one step. The first commit also saves the
+        manifest created from the "verification_images" folder as version 0,
+        so the original gallery can be restored with rollback.
+
+        Args:
+            templates (list): Manifest entries of every template in the new gallery.
+            reason (str): Why the gallery changed, saved to the audit log.
+
+        Returns:
+            dict: The new manifest.
+        """
+
+        with self._lock:
+            previous = self.load()
+            manifest = {
+                "version": previous["version"] + 1,
+                "created": time.time(),
+                "templates": templates,
+            }
+
+            os.makedirs(self.manifest_dir, exist_ok=True)
+
+            if previous["version"] == 0 and not os.path.exists(self.version_path(0)):
+                write_json_atomic(self.version_path(0), previous)
+
+            write_json_atomic(self.version_path(manifest["version"]), manifest)
+            write_json_atomic(self.pointer_path, manifest)
+            self.prune()
+
+        audit(
+            "gallery_change",
+            reason=reason,
+            version=manifest["version"],
+            templates=len(templates),
+            adaptive=sum(template["source"] == "adaptive" for template in templates),
+        )
+        return manifest
+
+    def stage_generation(self, images, workers=4):
+        """Saves enrolled images into a new generation folder.
+
+        The images are encoded in parallel into a staging folder and synced to
+        disk, then the folder is renamed to its final name in one step. A crash
+        only ever leaves a staging folder behind, which prune deletes.
+
+        Args:
+            images (list): OpenCV images of the user's face.
+            workers (int): Number of threads encoding images.
+
+        Returns:
+            list: Manifest entries of the saved images.
+        """
+
+        generations_dir = os.path.join(self.root, GENERATIONS_DIR)
+        name = f"generation_{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        staging_dir = os.path.join(generations_dir, name + STAGING_SUFFIX)
+        file_names = [f"verfication_image_{idx}.jpg" for idx in range(len(images))]
+
+        staging_paths = [os.path.join(staging_dir, file_name) for file_name in file_names]
+
+        os.makedirs(staging_dir)
+        self._staging.add(name)
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(write_image, staging_paths, images))
+
+            fsync_directory(staging_dir)
+            os.replace(staging_dir, os.path.join(generations_dir, name))
+            fsync_directory(generations_dir)
+
+        except (OSError, ValueError):
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        finally:
+            self._staging.discard(name)
+
+        return [
+            self.make_template(os.path.join(GENERATIONS_DIR, name, file_name), "enrolled")
+            for file_name in file_names
+        ]
+
+    def replace_enrolled(self, images, workers=4):
+        """Replaces every template with newly enrolled images.
+
+        Verifications keep using the previous gallery until the new generation
+        is complete and the pointer is replaced, and the previous generation
+        can still be restored with rollback. On an install without a gallery
+        version yet, the previous generation is the "verification_images"
+        folder, saved as version 0 by the first commit.
+
+        Args:
+            images (list): OpenCV images of the user's face.
+            workers (int): Number of threads encoding images.
+
+        Returns:
+            dict: The new manifest.
+        """
+
+        return self.commit(self.stage_generation(images, workers), "enrollment")
+
+    def version_path(self, version):
+        """Gets the file path of a manifest version.
+
+        Args:
+            version (int): Manifest version number.
+
+        Returns:
+            str: File path of the manifest.
+        """
+
+        return os.path.join(self.manifest_dir, f"manifest_{version:06d}.json")
+
+    def versions(self):
+        """Lists the manifest versions that can be restored.
+
+        Returns:
+            list: Sorted version numbers.
+        """
+
+        if not os.path.exists(self.manifest_dir):
+            return []
+
+        return sorted(
+            int(name[len("manifest_") : -len(".json")])
+            for name in os.listdir(self.manifest_dir)
+            if name.startswith("manifest_") and name.endswith(".json")
+        )
+
+    def load_version(self, version):
+        """Loads a kept manifest version.
+
+        Args:
+            version (int): Manifest version number.
+
+        Returns:
+            dict: The manifest.
+        """
+
+        with open(self.version_path(version), "r") as manifest_file:
+            return json.load(manifest_file)
+
+    def rollback(self, version=None):
+        """Makes an older gallery version active again.
+
+        The older templates are saved as a new version, so the rollback itself
+        can also be undone.
+
+        Args:
+            version (int): Version to restore, the one before the active version if None.
+
+        Returns:
+            dict: The new manifest, or None if there's no version to restore.
+        """
+
+        current = self.load()
+
+        if version is None:
+            older = [number for number in self.versions() if number < current["version"]]
+
+            if len(older) == 0:
+                return None
+
+            version = older[-1]
+
+        return self.commit(self.load_version(version)["templates"], "rollback")
+
+    def prune(self):
+        """Deletes old manifest versions, and adaptive images and generations no kept version uses."""
+
+        versions = self.versions()
+
+        for version in versions[: -self.keep_versions]:
+            os.remove(self.version_path(version))
+
+        used_files = set()
+        for version in self.versions():
+            for template in self.load_version(version)["templates"]:
+                used_files.add(os.path.normpath(template["file"]))
+
+        adaptive_dir = os.path.join(self.root, "adaptive_images")
+        if os.path.exists(adaptive_dir):
+            for name in os.listdir(adaptive_dir):
+                file_name = os.path.normpath(os.path.join("adaptive_images", name))
+
+                if file_name not in used_files:
+                    os.remove(os.path.join(self.root, file_name))
+                    print(f"Deleted file: {name}")
+
+        used_generations = {
+            file_name.split(os.sep)[1]
+            for file_name in used_files
+            if file_name.split(os.sep)[0] == GENERATIONS_DIR
+        }
+
+        generations_dir = os.path.join(self.root, GENERATIONS_DIR)
+        if os.path.exists(generations_dir):
+            for name in os.listdir(generations_dir):
+                if name.endswith(STAGING_SUFFIX):
+                    if name[: -len(STAGING_SUFFIX)] in self._staging:
+                        continue
+
+                elif name in used_generations:
+                    continue
+
+                shutil.rmtree(os.path.join(generations_dir, name), ignore_errors=True)
+                print(f"Deleted gallery generation: {name}")
+
+
+def enrolled_folder(root=IMAGE_DATA_PATH):
+    """Finds the folder with the enrolled images of the active gallery.
+
+    Args:
+        root (str): Folder containing the image data.
+
+    Returns:
+        str: The active generation folder, or "verification_images" if there's none yet.
+    """
+
+    for template in GalleryStore(root).load()["templates"]:
+        if template["source"] == "enrolled":
+            return os.path.join(root, os.path.dirname(template["file"]))
+
+    return os.path.join(root, "verification_images")
+
+
+class AdaptiveGallery:
+    """
+    Adds webcam images that verify with high confidence to the gallery as new templates.
+
+    Keeps the gallery current as the user's appearance changes, while a hard limit on
+    the number of templates keeps verification fast. When the limit is passed the most
+    redundant adaptive template, the one closest to another template, is evicted. The
+    images saved by the user are never evicted.
+
+    Attributes:
+        store (GalleryStore): Versioned gallery the templates are saved to.
+        enabled (bool): If new templates are added.
+        min_score (float): Mean score of detected templates needed to add an image.
+        min_verification (float): Share of detected templates needed to add an image.
+        max_templates (int): Largest number of templates in the gallery.
+        min_interval_seconds (float): Seconds between added templates.
+    """
+
+    def __init__(self, store=None, settings=None):
+        """Initializes the adaptive gallery.
+
+        Args:
+            store (GalleryStore): Versioned gallery, a new one if None.
+            settings (dict): Adaptive gallery settings, the saved "adaptive_gallery" settings if None.
+        """
+
+        if settings is None:
+            settings = load_settings("adaptive_gallery")
+
+        self.enabled = settings["enabled"]
+        self.min_score = settings["min_score"]
+        self.min_verification = settings["min_verification"]
+        self.max_templates = settings["max_templates"]
+        self.min_interval_seconds = settings["min_interval_seconds"]
+        self.store = store or GalleryStore(keep_versions=settings["keep_versions"])
+
+        self._last_added = 0.0
+        self._busy = False
+        self._lock = threading.Lock()
+
+    def is_confident(self, results, detection_threshold):
+        """Checks if a verification was confident enough to add its image.
+
+        Args:
+            results (ndarray): Score of the webcam image against every template.
+            detection_threshold (float): Score a template needs to be counted as a detection.
+
+        Returns:
+            bool: True if the image can be added as a template.
+        """
+
+        results = np.reshape(results, [-1])
+
+        if len(results) == 0:
+            return False
+
+        detected = results > detection_threshold
+        verification = np.mean(detected)
+        mean_score = np.mean(results[detected]) if np.any(detected) else 0.0
+
+        return bool(
+            verification >= self.min_verification and mean_score >= self.min_score
+        )
+
+    def submit(
+        self,
+        cv_image,
+        input_image,
+        results,
+        detection_threshold,
+        model_manager,
+        gallery,
+    ):
+        """Considers a verified webcam image on a background thread.
+
+        Embedding the gallery and saving the new version take too long for the
+        GUI thread, so they're done by a worker. Images verified while the
+        worker is still busy are skipped.
+
+        Args:
+            cv_image (ndarray): OpenCV image that was verified.
+            input_image (Tensor): Preprocessed version of the image.
+            results (ndarray): Full model score of the image against every template.
+            detection_threshold (float): Score a template needs to be counted as a detection.
+            model_manager (ModelManager): Manager of the scorer used to embed the templates.
+            gallery (ndarray): Batch of preprocessed templates of the active gallery.
+
+        Returns:
+            bool: True if the worker was started.
+        """
+
+        if not self.enabled:
+            return False
+
+        with self._lock:
+            if self._busy:
+                return False
+
+            self._busy = True
+
+        threading.Thread(
+            target=self._consider_in_background,
+            args=(
+                cv_image,
+                input_image,
+                results,
+                detection_threshold,
+                model_manager,
+                gallery,
+            ),
+            name="adaptive-gallery",
+            daemon=True,
+        ).start()
+        return True
+
+    def consider(
+        self, cv_image, input_image, results, detection_threshold, scorer, gallery
+    ):
+        """Adds a verified webcam image to the gallery if it was a confident match.
+
+        Args:
+            cv_image (ndarray): OpenCV image that was verified.
+            input_image (Tensor): Preprocessed version of the image.
+            results (ndarray): Score of the image against every template.
+            detection_threshold (float): Score a template needs to be counted as a detection.
+            scorer (GraphScorer or KerasScorer): Scorer used to embed the templates.
+            gallery (ndarray): Batch of preprocessed templates of the active gallery.
+
+        Returns:
+            bool: True if the image was added.
+        """
+
+        if not self.enabled:
+            return False
+
+        if time.monotonic() - self._last_added < self.min_interval_seconds:
+            return False
+
+        if not self.is_confident(results, detection_threshold):
+            return False
+
+        adaptive_dir = os.path.join(self.store.root, "adaptive_images")
+        os.makedirs(adaptive_dir, exist_ok=True)
+        file_name = os.path.join("adaptive_images", f"adaptive_{uuid.uuid4().hex}.jpg")
+        write_image(os.path.join(self.store.root, file_name), cv_image)
+
+        manifest = self.store.load()
+        templates = manifest["templates"] + [
+            self.store.make_template(
+                file_name, "adaptive", float(np.mean(np.reshape(results, [-1])))
+            )
+        ]
+
+        if len(templates) > self.max_templates:
+            images = np.concatenate(
+                [gallery, np.expand_dims(input_image, axis=0)]
+            )
+            templates = self.evict(templates, scorer.embed(images))
+
+        self.store.commit(templates, "adaptive")
+        self._last_added = time.monotonic()
+        print(f"Added gallery template: {file_name}")
+        return True
+
+    def _consider_in_background(
+        self,
+        cv_image,
+        input_image,
+        results,
+        detection_threshold,
+        model_manager,
+        gallery,
+    ):
+        """Considers a verified webcam image and marks the worker as free.
+
+        Args:
+            cv_image (ndarray): OpenCV image that was verified.
+            input_image (Tensor): Preprocessed version of the image.
+            results (ndarray): Full model score of the image against every template.
+            detection_threshold (float): Score a template needs to be counted as a detection.
+            model_manager (ModelManager): Manager of the scorer used to embed the templates.
+            gallery (ndarray): Batch of preprocessed templates of the active gallery.
+        """
+
+        try:
+            with model_manager.use() as scorer:
+                self.consider(
+                    cv_image, input_image, results, detection_threshold, scorer, gallery
+                )
+
+        except (OSError, ValueError) as error:
+            print(f"Could not add gallery template: {error}")
+
+        finally:
+            with self._lock:
+                self._busy = False
+
+    def evict(self, templates, embeddings):
+        """Removes the most redundant adaptive templates until the limit is met.
+
+        A template's redundancy is how close its embedding is to the nearest
+        other template's embedding. Only adaptive templates can be removed.
+
+        Args:
+            templates (list): Manifest entries of every template.
+            embeddings (ndarray): Embedding of every template, in the same order.
+
+        Returns:
+            list: Manifest entries of the templates that are kept.
+        """
+
+        templates = list(templates)
+        embeddings = np.asarray(embeddings)
+
+        while len(templates) > self.max_templates:
+            adaptive = [
+                idx for idx, template in enumerate(templates)
+                if template["source"] == "adaptive"
+            ]
+
+            if len(adaptive) == 0:
+                break
+
+            distances = np.mean(
+                np.abs(embeddings[:, np.newaxis, :] - embeddings[np.newaxis, :, :]),
+                axis=-1,
+            )
+            np.fill_diagonal(distances, np.inf)
+            nearest = np.min(distances, axis=1)
+
+            evict_idx = min(adaptive, key=lambda idx: nearest[idx])
+            print(f"Evicted gallery template: {templates[evict_idx]['file']}")
+            templates.pop(evict_idx)
+            embeddings = np.delete(embeddings, evict_idx, axis=0)
+
+        return templates
+
+
+def main(argv=None):
+    """Runs the gallery command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.gallery",
+        description="List and restore versions of the face id gallery.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("history")
+    rollback_parser = subparsers.add_parser("rollback")
+    rollback_parser.add_argument("--version", type=int, default=None)
+
+    args = parser.parse_args(argv)
+    store = GalleryStore(keep_versions=load_settings("adaptive_gallery")["keep_versions"])
+
+    if args.command == "history":
+        active = store.load()["version"]
+
+        for version in store.versions():
+            manifest = store.load_version(version)
+            adaptive = sum(
+                template["source"] == "adaptive" for template in manifest["templates"]
+            )
+            marker = "*" if version == active else " "
+            print(
+                f"{marker} {version:6d}  {time.ctime(manifest['created'])}  "
+                f"{len(manifest['templates'])} templates ({adaptive} adaptive)"
+            )
+
+    else:
+        manifest = store.rollback(args.version)
+
+        if manifest is None:
+            print("No older gallery version to restore")
+
+        else:
+            print(f"Restored gallery as version {manifest['version']}")
+
+
+if __name__ == "__main__":
+    main()
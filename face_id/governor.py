@@ -0,0 +1,318 @@
+import os
+import threading
+import time
+
+import psutil
+
+from face_id.settings import load_settings
+
+
+def read_value(path):
+    """Reads a one line value from a sysfs file.
+
+    Args:
+        path (str): File path of the value.
+
+    Returns:
+        str: The value, or None if it can't be read.
+    """
+
+    try:
+        with open(path, "r") as open_file:
+            return open_file.read().strip()
+
+    except OSError:
+        return None
+
+
+def on_battery(power_supply_path="/sys/class/power_supply"):
+    """Checks if the computer is running on battery power.
+
+    Reads the power supplies in sysfs on Linux, where a battery that is
+    discharging, or a battery with no online mains or USB supply, means the
+    computer is on battery. Other systems use psutil's battery sensor.
+
+    Args:
+        power_supply_path (str): Folder of the power supplies.
+
+    Returns:
+        bool: True if the computer is on battery power.
+    """
+
+    if not os.path.isdir(power_supply_path):
+        battery = psutil.sensors_battery() if hasattr(psutil, "sensors_battery") else None
+        return battery is not None and not battery.power_plugged
+
+    has_battery = False
+    external_online = False
+
+    for name in os.listdir(power_supply_path):
+        supply_path = os.path.join(power_supply_path, name)
+        supply_type = read_value(os.path.join(supply_path, "type"))
+
+        if supply_type == "Battery":
+            has_battery = True
+
+            if read_value(os.path.join(supply_path, "status")) == "Discharging":
+                return True
+
+        elif supply_type in ("Mains", "USB", "USB_C", "USB_PD"):
+            if read_value(os.path.join(supply_path, "online")) == "1":
+                external_online = True
+
+    return has_battery and not external_online
+
+
+class ResourceGovernor:
+    """
+    Duty-cycles webcam capture and process monitoring to fit a CPU budget.
+
+    A background thread measures the app's CPU use and the power state every check
+    interval, and moves a duty level between 0 and 1: down when the app uses more than
+    the budget of the current power state, and slowly back up when it uses much less.
+    The capture frame rate and the monitor's scan interval follow the level. Detecting a
+    protected app or using the verify window boosts the level to 1 right away, for the
+    boost time. The inference thread count is chosen from the power state when
+    TensorFlow starts, since its thread pools can't change after that.
+
+    Attributes:
+        enabled (bool): If capture and monitoring are duty-cycled.
+        ac_cpu_budget_percent (float): Share of the total CPU the app may use on AC power.
+        battery_cpu_budget_percent (float): Share of the total CPU the app may use on battery.
+        min_fps (float): Capture frame rate at the lowest level.
+        max_fps (float): Capture frame rate at the highest level.
+        min_scan_interval_seconds (float): Monitor scan interval at the highest level.
+        max_scan_interval_seconds (float): Monitor scan interval at the lowest level.
+        battery_inference_threads (int): TensorFlow intra-op threads when starting on battery, 0 for the default.
+        boost_seconds (float): Seconds a detection or verify window keeps the level at 1.
+        check_interval_seconds (float): Seconds between CPU and power checks.
+        power_supply_path (str): Folder of the power supplies in sysfs.
+    """
+
+    def __init__(
+        self,
+        enabled=False,
+        ac_cpu_budget_percent=20,
+        battery_cpu_budget_percent=5,
+        min_fps=5,
+        max_fps=30,
+        min_scan_interval_seconds=0.05,
+        max_scan_interval_seconds=1.0,
+        battery_inference_threads=2,
+        boost_seconds=15,
+        check_interval_seconds=2,
+        power_supply_path="/sys/class/power_supply",
+    ):
+        """Initializes the governor and starts its check thread if it's enabled.
+
+        Args:
+            enabled (bool): If capture and monitoring are duty-cycled.
+            ac_cpu_budget_percent (float): Share of the total CPU the app may use on AC power.
+            battery_cpu_budget_percent (float): Share of the total CPU the app may use on battery.
+            min_fps (float): Capture frame rate at the lowest level.
+            max_fps (float): Capture frame rate at the highest level.
+            min_scan_interval_seconds (float): Monitor scan interval at the highest level.
+            max_scan_interval_seconds (float): Monitor scan interval at the lowest level.
+            battery_inference_threads (int): TensorFlow intra-op threads when starting on battery.
+            boost_seconds (float): Seconds a detection or verify window keeps the level at 1.
+            check_interval_seconds (float): Seconds between CPU and power checks.
+            power_supply_path (str): Folder of the power supplies in sysfs.
+        """
+
+        self.enabled = enabled
+        self.ac_cpu_budget_percent = ac_cpu_budget_percent
+        self.battery_cpu_budget_percent = battery_cpu_budget_percent
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.min_scan_interval_seconds = min_scan_interval_seconds
+        self.max_scan_interval_seconds = max_scan_interval_seconds
+        self.battery_inference_threads = battery_inference_threads
+        self.boost_seconds = boost_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.power_supply_path = power_supply_path
+
+        self._level = 1.0
+        self._boost_until = 0.0
+        self._usage_percent = 0.0
+        self._on_battery = False
+        self._process = psutil.Process()
+        self._lock = threading.Lock()
+        self._stats = {"checks": 0, "boosts": 0, "over_budget": 0}
+
+        if self.enabled:
+            self._on_battery = on_battery(self.power_supply_path)
+            self._process.cpu_percent(None)
+            threading.Thread(target=self._run, name="governor", daemon=True).start()
+
+    @classmethod
+    def from_settings(cls):
+        """Creates a governor from the "governor" settings section.
+
+        Returns:
+            ResourceGovernor: Governor using the saved or default settings.
+        """
+
+        return cls(**load_settings("governor"))
+
+    @property
+    def budget_percent(self):
+        """float: Share of the total CPU the app may use in the current power state."""
+
+        if self._on_battery:
+            return self.battery_cpu_budget_percent
+
+        return self.ac_cpu_budget_percent
+
+    @property
+    def level(self):
+        """float: Current duty level, 1 while boosted."""
+
+        with self._lock:
+            if time.monotonic() < self._boost_until:
+                return 1.0
+
+            return self._level
+
+    def boost(self, reason=""):
+        """Raises the level to 1 right away and keeps it there for the boost time.
+
+        Args:
+            reason (str): What the boost is for, such as "detection" or "verify_window".
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._boost_until = time.monotonic() + self.boost_seconds
+            self._stats["boosts"] += 1
+
+    def frame_interval(self):
+        """Gets the seconds between captured webcam frames.
+
+        Returns:
+            float: Seconds between frames, 0 to capture as fast as the webcam allows.
+        """
+
+        if not self.enabled:
+            return 0.0
+
+        fps = self.min_fps + self.level * (self.max_fps - self.min_fps)
+        return 1 / fps if fps > 0 else 0.0
+
+    def scan_interval(self, default=0):
+        """Gets the seconds the process monitor waits between scans.
+
+        Args:
+            default (float): Interval used when the governor is disabled.
+
+        Returns:
+            float: Seconds between scans.
+        """
+
+        if not self.enabled:
+            return default
+
+        return self.max_scan_interval_seconds - self.level * (
+            self.max_scan_interval_seconds - self.min_scan_interval_seconds
+        )
+
+    def inference_threads(self):
+        """Gets the TensorFlow intra-op thread count for the current power state.
+
+        Returns:
+            int: Number of threads, 0 to use TensorFlow's default.
+        """
+
+        if self.enabled and on_battery(self.power_supply_path):
+            return self.battery_inference_threads
+
+        return 0
+
+    def check(self):
+        """Measures the app's CPU use and power state, and moves the level toward the budget.
+
+        Returns:
+            float: The new level.
+        """
+
+        usage_percent = self._process.cpu_percent(None) / (psutil.cpu_count() or 1)
+        battery = on_battery(self.power_supply_path)
+
+        with self._lock:
+            self._usage_percent = usage_percent
+            self._on_battery = battery
+            self._stats["checks"] += 1
+            budget = self.budget_percent
+
+            if usage_percent > budget:
+                self._level = max(self._level * 0.7, 0.0)
+                self._stats["over_budget"] += 1
+
+            elif usage_percent < budget * 0.7:
+                self._level = min(self._level + 0.1, 1.0)
+
+            return self._level
+
+    def stats(self):
+        """Returns the current budget, measured CPU use, power state and duty cycle.
+
+        Returns:
+            dict: The governor's state and counters.
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats["usage_percent"] = self._usage_percent
+            stats["on_battery"] = self._on_battery
+            boosted = time.monotonic() < self._boost_until
+
+        stats["enabled"] = self.enabled
+        stats["budget_percent"] = self.budget_percent
+        stats["boosted"] = boosted
+        stats["level"] = self.level
+        stats["fps"] = 1 / self.frame_interval() if self.frame_interval() else None
+        stats["scan_interval_seconds"] = self.scan_interval()
+        return stats
+
+    def report(self):
+        """Prints the current budget, measured CPU use and duty cycle."""
+
+        if not self.enabled:
+            return
+
+        stats = self.stats()
+        print(
+            f"Governor: {stats['usage_percent']:.1f}% CPU of a "
+            f"{stats['budget_percent']}% budget on "
+            f"{'battery' if stats['on_battery'] else 'AC'}, level {stats['level']:.2f}, "
+            f"{stats['fps']:.0f} fps, {stats['scan_interval_seconds']:.2f} s scans, "
+            f"{stats['over_budget']} of {stats['checks']} checks over budget"
+        )
+
+    def _run(self):
+        """Checks the CPU use and power state until the process exits."""
+
+        while True:
+            time.sleep(self.check_interval_seconds)
+            self.check()
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """Gets the governor shared by the whole app, creating it on first use.
+
+    Returns:
+        ResourceGovernor: The shared governor.
+    """
+
+    global _governor
+
+    with _governor_lock:
+        if _governor is None:
+            _governor = ResourceGovernor.from_settings()
+
+    return _governor
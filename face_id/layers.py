@@ -1,8 +1,10 @@
-import os
+from face_id import runtime
 
-os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
+runtime.apply_environment()
 
 import tensorflow as tf
+
+runtime.configure_tensorflow(tf)
 from tensorflow.keras.layers import Layer
 
 
@@ -0,0 +1,330 @@
+import os
+import select
+import threading
+import time
+
+import psutil
+
+from face_id.audit_log import audit
+from face_id.settings import load_settings
+
+
+def pidfd_supported():
+    """Checks if processes can be waited on with pidfds and epoll.
+
+    Returns:
+        bool: True on Linux 5.3 or newer with Python 3.9 or newer.
+    """
+
+    if not hasattr(os, "pidfd_open") or not hasattr(select, "epoll"):
+        return False
+
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+
+    except OSError:
+        return False
+
+    return True
+
+
+class LifetimeTracker:
+    """
+    Watches approved and held processes and acts the moment the last one of an app exits.
+
+    On Linux each tracked process gets a pidfd, which becomes readable when the process
+    exits, and one thread waits on every pidfd with epoll, so exits are seen without
+    polling or scanning every process. Where pidfds aren't available, only the tracked
+    processes are checked every fallback interval, so the cost doesn't grow with the
+    number of running processes either way. When a held process exits it's no
+    longer held, and when the last tracked process of an app exits its approvals are
+    revoked, or aged so they expire soon.
+
+    Attributes:
+        enabled (bool): If processes are tracked.
+        on_exit (str): "revoke" to remove an app's approvals when it exits, or "age" to shorten them.
+        age_seconds (float): Seconds an aged approval is still valid for.
+        fallback_interval_seconds (float): Seconds between checks when pidfds aren't available.
+        approval_cache (ApprovalCache): Cache the approvals of exited apps are removed from.
+        process_holder (ProcessHolder): Holder that exited processes are forgotten by.
+        method (str): "pidfd" or "poll", how exits are detected.
+    """
+
+    def __init__(
+        self,
+        enabled=False,
+        on_exit="revoke",
+        age_seconds=30,
+        fallback_interval_seconds=1.0,
+        approval_cache=None,
+        process_holder=None,
+    ):
+        """Initializes the lifetime tracker and starts its thread if it's enabled.
+
+        Args:
+            enabled (bool): If processes are tracked.
+            on_exit (str): "revoke" or "age".
+            age_seconds (float): Seconds an aged approval is still valid for.
+            fallback_interval_seconds (float): Seconds between checks when pidfds aren't available.
+            approval_cache (ApprovalCache): Cache the approvals of exited apps are removed from.
+            process_holder (ProcessHolder): Holder that exited processes are forgotten by.
+        """
+
+        self.enabled = enabled
+        self.on_exit = on_exit
+        self.age_seconds = age_seconds
+        self.fallback_interval_seconds = fallback_interval_seconds
+        self.approval_cache = approval_cache
+        self.process_holder = process_holder
+        self.method = "pidfd" if pidfd_supported() else "poll"
+
+        self._processes = {}
+        self._fds = {}
+        self._apps = {}
+        self._epoll = None
+        self._lock = threading.Lock()
+        self._stats = {"tracked": 0, "exits": 0, "apps_exited": 0}
+
+        if not self.enabled:
+            return
+
+        if self.method == "pidfd":
+            self._epoll = select.epoll()
+            target = self._run_epoll
+
+        else:
+            target = self._run_poll
+
+        threading.Thread(target=target, name="lifetime-tracker", daemon=True).start()
+
+    @classmethod
+    def from_settings(cls, **kwargs):
+        """Creates a lifetime tracker from the "lifetime" settings section.
+
+        Args:
+            **kwargs: Other arguments passed to the lifetime tracker.
+
+        Returns:
+            LifetimeTracker: Tracker using the saved or default settings.
+        """
+
+        return cls(**load_settings("lifetime"), **kwargs)
+
+    def is_tracked(self, pid):
+        """Checks if a process is being tracked.
+
+        Args:
+            pid (int): Process id.
+
+        Returns:
+            bool: True if the process is tracked.
+        """
+
+        with self._lock:
+            return pid in self._processes
+
+    def track(self, pid, app_name, exe=None, create_time=None):
+        """Starts tracking a process of an app until it exits.
+
+        Args:
+            pid (int): Process id.
+            app_name (str): Name of the app the process belongs to.
+            exe (str): File path of the app.
+            create_time (float): Time the process was created, used to tell a reused process id apart.
+
+        Returns:
+            bool: True if the process started being tracked, False if it already was or has exited.
+        """
+
+        if not self.enabled or self.is_tracked(pid):
+            return False
+
+        fd = None
+
+        try:
+            if self.method == "pidfd":
+                fd = os.pidfd_open(pid)
+
+            # The process id may have been reused since the scan, which the
+            # pidfd can't tell apart, so the creation time is checked once the
+            # process is pinned by it.
+            if create_time is not None and not self._is_running(pid, create_time):
+                raise ProcessLookupError(pid)
+
+        except OSError:
+            if fd is not None:
+                os.close(fd)
+
+            return False
+
+        with self._lock:
+            if pid in self._processes:
+                if fd is not None:
+                    os.close(fd)
+
+                return False
+
+            self._processes[pid] = {
+                "app": app_name,
+                "exe": exe,
+                "create_time": create_time,
+                "fd": fd,
+            }
+            self._apps.setdefault(app_name, set()).add(pid)
+            self._stats["tracked"] += 1
+
+            if fd is not None:
+                self._fds[fd] = pid
+                self._epoll.register(fd, select.EPOLLIN)
+
+        return True
+
+    def tracked_pids(self, app_name):
+        """Lists the tracked processes of an app.
+
+        Args:
+            app_name (str): Name of the app.
+
+        Returns:
+            list: Process ids of the app's tracked processes.
+        """
+
+        with self._lock:
+            return sorted(self._apps.get(app_name, ()))
+
+    def exited(self, pid):
+        """Stops tracking a process that exited, and handles the app if it was the last one.
+
+        Args:
+            pid (int): Process id.
+        """
+
+        with self._lock:
+            entry = self._processes.pop(pid, None)
+
+            if entry is None:
+                return
+
+            if entry["fd"] is not None:
+                self._fds.pop(entry["fd"], None)
+                self._epoll.unregister(entry["fd"])
+                os.close(entry["fd"])
+
+            pids = self._apps.get(entry["app"], set())
+            pids.discard(pid)
+            last = len(pids) == 0
+
+            if last:
+                self._apps.pop(entry["app"], None)
+                self._stats["apps_exited"] += 1
+
+            self._stats["exits"] += 1
+
+        if self.process_holder is not None:
+            self.process_holder.forget(pid)
+
+        if last:
+            self.app_exited(entry["app"], entry["exe"])
+
+    def app_exited(self, app_name, exe=None):
+        """Revokes or ages the approvals of an app whose last tracked process exited.
+
+        Args:
+            app_name (str): Name of the app.
+            exe (str): File path of the app.
+        """
+
+        if self.approval_cache is None:
+            return
+
+        if self.on_exit == "age":
+            count = self.approval_cache.age(app_name, exe, self.age_seconds)
+            event = "approval_aged"
+
+        else:
+            count = self.approval_cache.revoke(app_name, exe)
+            event = "revocation"
+
+        if count > 0:
+            action = "aged" if event == "approval_aged" else "revoked"
+            print(f"Approval {action}, app exited: {app_name}")
+            audit(event, app=app_name, exe=exe, reason="exited")
+
+    def stats(self):
+        """Returns the number of tracked processes and exits.
+
+        Returns:
+            dict: The tracker's counters.
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active"] = len(self._processes)
+            stats["apps"] = len(self._apps)
+
+        stats["method"] = self.method
+        return stats
+
+    def report(self):
+        """Prints the number of tracked processes and exits."""
+
+        if not self.enabled:
+            return
+
+        stats = self.stats()
+        print(
+            f"Lifetime tracker ({stats['method']}): {stats['tracked']} processes tracked, "
+            f"{stats['exits']} exited, {stats['apps_exited']} apps exited, "
+            f"{stats['active']} active"
+        )
+
+    def _run_epoll(self):
+        """Waits on the pidfd of every tracked process until the process exits."""
+
+        while True:
+            for fd, _ in self._epoll.poll():
+                with self._lock:
+                    pid = self._fds.get(fd)
+
+                if pid is not None:
+                    self.exited(pid)
+
+    def _run_poll(self):
+        """Checks every tracked process until the process exits."""
+
+        while True:
+            time.sleep(self.fallback_interval_seconds)
+
+            with self._lock:
+                pids = [
+                    (pid, entry["create_time"]) for pid, entry in self._processes.items()
+                ]
+
+            for pid, create_time in pids:
+                if not self._is_running(pid, create_time):
+                    self.exited(pid)
+
+    def _is_running(self, pid, create_time):
+        """Checks if a process is still running, and isn't a reused process id.
+
+        Args:
+            pid (int): Process id.
+            create_time (float): Time the process was created, or None.
+
+        Returns:
+            bool: True if the process is running.
+        """
+
+        try:
+            proc = psutil.Process(pid)
+
+            if create_time is not None and proc.create_time() != create_time:
+                return False
+
+            return proc.status() != psutil.STATUS_ZOMBIE
+
+        except psutil.NoSuchProcess:
+            return False
+
+        except psutil.AccessDenied:
+            return True
@@ -0,0 +1,293 @@
+"""Idle eviction and on-demand reload of the verification model.
+
+The scorer is loaded when it's first needed and, if an idle timeout is set,
+released and garbage collected once it hasn't been used for that long.
+Detecting a protected app starts loading it again in the background, so it's
+usually ready by the time the user presses verify. Compare the memory and reload
+latency of both modes with:
+
+    python -m face_id.model_manager bench --cycles 3
+"""
+
+import argparse
+import contextlib
+import gc
+import threading
+import time
+
+import psutil
+
+from face_id import runtime
+
+runtime.apply_environment()
+
+import tensorflow as tf
+
+runtime.configure_tensorflow(tf)
+
+from face_id.scoring import load_scorer
+from face_id.settings import load_settings
+
+
+def resident_memory():
+    """Finds the resident memory of the current process.
+
+    Returns:
+        float: Resident memory in megabytes.
+    """
+
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+class ModelManager:
+    """
+    Loads the scorer on demand and releases it after it has been idle.
+
+    With an idle timeout of 0 the scorer stays loaded once it's first used, which is
+    the always-warm mode. Otherwise a background thread releases the scorer when it
+    hasn't been used for the idle timeout, which is the low-footprint mode. The global
+    Keras session isn't cleared, since the cascade and shadow scorers keep their own
+    models loaded in it. The scorer is never released while it's in use. The resident
+    memory and the latency of every load are recorded so both modes can be compared.
+
+    Attributes:
+        idle_seconds (float): Seconds without use before the scorer is released, 0 to keep it loaded.
+        check_interval_seconds (float): Seconds between idle checks.
+        warm_on_detection (bool): If detecting a protected app starts loading the scorer.
+    """
+
+    def __init__(
+        self, idle_seconds=0, check_interval_seconds=30, warm_on_detection=True
+    ):
+        """Initializes the model manager.
+
+        Args:
+            idle_seconds (float): Seconds without use before the scorer is released.
+            check_interval_seconds (float): Seconds between idle checks.
+            warm_on_detection (bool): If detecting a protected app starts loading the scorer.
+        """
+
+        self.idle_seconds = idle_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.warm_on_detection = warm_on_detection
+
+        self._scorer = None
+        self._last_used = time.monotonic()
+        self._active = 0
+        self._lock = threading.RLock()
+        self._stats = {
+            "loads": 0,
+            "releases": 0,
+            "load_ms": [],
+            "rss_loaded_mb": None,
+            "rss_released_mb": None,
+        }
+
+        if self.idle_seconds:
+            threading.Thread(
+                target=self._run, name="model-idle-check", daemon=True
+            ).start()
+
+    @classmethod
+    def from_settings(cls):
+        """Creates a model manager from the "model_manager" settings section.
+
+        Returns:
+            ModelManager: Manager using the saved or default settings.
+        """
+
+        return cls(**load_settings("model_manager"))
+
+    @property
+    def loaded(self):
+        """bool: If the scorer is loaded."""
+
+        return self._scorer is not None
+
+    def get_scorer(self):
+        """Gets the scorer, loading it if it was released.
+
+        Returns:
+            GraphScorer or KerasScorer: The scorer.
+        """
+
+        with self._lock:
+            if self._scorer is None:
+                start = time.perf_counter()
+                self._scorer = load_scorer()
+                load_ms = (time.perf_counter() - start) * 1000
+
+                self._stats["loads"] += 1
+                self._stats["load_ms"].append(load_ms)
+                self._stats["rss_loaded_mb"] = resident_memory()
+                print(f"Loaded model in {load_ms:.0f} ms")
+
+            self._last_used = time.monotonic()
+            return self._scorer
+
+    @contextlib.contextmanager
+    def use(self):
+        """Holds the scorer so it isn't released while it's being used.
+
+        Yields:
+            GraphScorer or KerasScorer: The scorer.
+        """
+
+        with self._lock:
+            self._active += 1
+
+        try:
+            yield self.get_scorer()
+
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_used = time.monotonic()
+
+    def warm(self):
+        """Starts loading the scorer in the background if it isn't loaded."""
+
+        if self.warm_on_detection and not self.loaded:
+            threading.Thread(
+                target=self.get_scorer, name="model-warm", daemon=True
+            ).start()
+
+    def release(self):
+        """Releases the scorer and garbage collects its model.
+
+        Returns:
+            bool: True if the scorer was released, False if it wasn't loaded or is in use.
+        """
+
+        with self._lock:
+            if self._scorer is None or self._active > 0:
+                return False
+
+            self._scorer = None
+            gc.collect()
+
+            self._stats["releases"] += 1
+            self._stats["rss_released_mb"] = resident_memory()
+
+        print("Released idle model")
+        return True
+
+    def release_if_idle(self):
+        """Releases the scorer if it hasn't been used for the idle timeout.
+
+        Returns:
+            bool: True if the scorer was released.
+        """
+
+        with self._lock:
+            idle = time.monotonic() - self._last_used
+
+            if not self.idle_seconds or idle < self.idle_seconds:
+                return False
+
+            return self.release()
+
+    def stats(self):
+        """Returns the number of loads and releases, load latency and resident memory.
+
+        Returns:
+            dict: The manager's counters.
+        """
+
+        with self._lock:
+            load_ms = list(self._stats["load_ms"])
+            stats = {
+                "loads": self._stats["loads"],
+                "releases": self._stats["releases"],
+                "loaded": self.loaded,
+                "rss_mb": resident_memory(),
+                "rss_loaded_mb": self._stats["rss_loaded_mb"],
+                "rss_released_mb": self._stats["rss_released_mb"],
+            }
+
+        stats["last_load_ms"] = load_ms[-1] if load_ms else None
+        stats["mean_load_ms"] = sum(load_ms) / len(load_ms) if load_ms else None
+        return stats
+
+    def report(self):
+        """Prints the number of loads and releases, load latency and resident memory."""
+
+        stats = self.stats()
+        mean_load = (
+            f"{stats['mean_load_ms']:.0f} ms" if stats["mean_load_ms"] is not None else "-"
+        )
+        print(
+            f"Model manager: {stats['loads']} loads (mean {mean_load}), "
+            f"{stats['releases']} releases, {stats['rss_mb']:.0f} MB resident"
+        )
+
+    def _run(self):
+        """Checks if the scorer has been idle until the process exits."""
+
+        while True:
+            time.sleep(self.check_interval_seconds)
+            self.release_if_idle()
+
+
+def bench(cycles):
+    """Measures resident memory and load latency over load and release cycles.
+
+    The first load includes importing and initializing TensorFlow's kernels,
+    the later ones are the reload latency of the low-footprint mode.
+
+    Args:
+        cycles (int): Number of times the scorer is loaded and released.
+
+    Returns:
+        dict: Resident memory at each point and the latency of every load.
+    """
+
+    manager = ModelManager()
+    results = {
+        "rss_baseline_mb": resident_memory(),
+        "load_ms": [],
+        "rss_loaded_mb": [],
+        "rss_released_mb": [],
+    }
+
+    for _ in range(cycles):
+        manager.get_scorer()
+        results["load_ms"].append(manager.stats()["last_load_ms"])
+        results["rss_loaded_mb"].append(resident_memory())
+
+        manager.release()
+        results["rss_released_mb"].append(resident_memory())
+
+    print(f"Baseline        {results['rss_baseline_mb']:8.0f} MB")
+
+    for cycle in range(cycles):
+        print(
+            f"Cycle {cycle + 1}: load {results['load_ms'][cycle]:8.0f} ms, "
+            f"{results['rss_loaded_mb'][cycle]:6.0f} MB loaded, "
+            f"{results['rss_released_mb'][cycle]:6.0f} MB released"
+        )
+
+    return results
+
+
+def main(argv=None):
+    """Runs the model manager command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.model_manager",
+        description="Measure model memory and reload latency.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench_parser = subparsers.add_parser("bench")
+    bench_parser.add_argument("--cycles", type=int, default=3)
+
+    args = parser.parse_args(argv)
+    bench(args.cycles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from face_id import runtime
+
+runtime.apply_environment()
+
+import tensorflow as tf
+
+runtime.configure_tensorflow(tf)
+
+from tensorflow.keras.layers import (
+    Conv2D,
+    Dense,
+    Flatten,
+    GlobalAveragePooling2D,
+    Input,
+    MaxPooling2D,
+)
+from tensorflow.keras.models import Model
+
+from face_id.layers import L1Dist
+
+
+def make_embedding():
+    """Creates the embedding tower used by "siamesemodelv2.h5".
+
+    Converts a 100x100 image into a 4096 wide feature vector with a stack of
+    convolution layers, a flatten layer and a dense layer.
+
+    Returns:
+        tensorflow.keras.Model: The embedding model.
+    """
+
+    inp = Input(shape=(100, 100, 3), name="input_image")
+
+    c1 = Conv2D(64, (10, 10), activation="relu")(inp)
+    m1 = MaxPooling2D(64, (2, 2), padding="same")(c1)
+
+    c2 = Conv2D(128, (7, 7), activation="relu")(m1)
+    m2 = MaxPooling2D(64, (2, 2), padding="same")(c2)
+
+    c3 = Conv2D(128, (4, 4), activation="relu")(m2)
+    m3 = MaxPooling2D(64, (2, 2), padding="same")(c3)
+
+    c4 = Conv2D(256, (4, 4), activation="relu")(m3)
+    f1 = Flatten()(c4)
+    d1 = Dense(4096, activation="sigmoid")(f1)
+
+    return Model(inputs=[inp], outputs=[d1], name="embedding")
+
+
+def make_compact_embedding(embedding_size=128):
+    """Creates a compact embedding tower.
+
+    Uses the same convolution stack as make_embedding, but pools the last
+    feature map instead of flattening it, which removes most of the weights
+    of the dense layer and creates a much smaller feature vector.
+
+    Args:
+        embedding_size (int): Width of the feature vector, such as 128 or 256.
+
+    Returns:
+        tensorflow.keras.Model: The embedding model.
+    """
+
+    inp = Input(shape=(100, 100, 3), name="input_image")
+
+    c1 = Conv2D(64, (10, 10), activation="relu")(inp)
+    m1 = MaxPooling2D(64, (2, 2), padding="same")(c1)
+
+    c2 = Conv2D(128, (7, 7), activation="relu")(m1)
+    m2 = MaxPooling2D(64, (2, 2), padding="same")(c2)
+
+    c3 = Conv2D(128, (4, 4), activation="relu")(m2)
+    m3 = MaxPooling2D(64, (2, 2), padding="same")(c3)
+
+    c4 = Conv2D(256, (4, 4), activation="relu")(m3)
+    p1 = GlobalAveragePooling2D()(c4)
+    d1 = Dense(embedding_size, activation="sigmoid")(p1)
+
+    return Model(inputs=[inp], outputs=[d1], name="embedding")
+
+
+def make_siamese_model(embedding):
+    """Creates a siamese model around an embedding tower.
+
+    Takes 2 images, gets the distance between both of their embeddings and
+    returns a single similarity score.
+
+    Args:
+        embedding (tensorflow.keras.Model): The embedding model, named "embedding".
+
+    Returns:
+        tensorflow.keras.Model: The siamese model.
+    """
+
+    input_image = Input(name="input_img", shape=(100, 100, 3))
+    validation_image = Input(name="validation_img", shape=(100, 100, 3))
+
+    siamese_layer = L1Dist(name="distance")
+    distances = siamese_layer(
+        embedding(input_image)[0], embedding(validation_image)[0]
+    )
+
+    classifier = Dense(1, activation="sigmoid")(distances)
+
+    return Model(
+        inputs=[input_image, validation_image],
+        outputs=classifier,
+        name="SiameseNetwork",
+    )
@@ -0,0 +1,415 @@
+"""Headless stress test of the process monitor.
+
+Spawns storms of short and long lived dummy processes, some named like apps in a
+test protected apps file, while the process monitor runs in its own process:
+
+    python -m face_id.monitor_stress --processes 1000 --rate 200
+
+The dummy processes are symlinks to `sleep`, so each one shows up with its link's
+name. The report has the spawn-to-detection and spawn-to-termination latency of
+protected processes, the protected processes that were never detected, and the
+CPU and memory use of the monitor under load. No GUI or model is loaded.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import psutil
+
+from face_id.approval_cache import ApprovalCache
+from face_id.event_dispatcher import ProcessEventDispatcher
+from face_id.process_monitor import ProcessMonitor
+
+
+def make_programs(dir_path, protected_count, other_count):
+    """Creates dummy programs and a protected apps file listing some of them.
+
+    Args:
+        dir_path (str): Folder the programs and protected apps file are created in.
+        protected_count (int): Number of protected program names.
+        other_count (int): Number of unprotected program names.
+
+    Returns:
+        tuple: File path of the protected apps file, and the file path of every protected and other program.
+    """
+
+    target = shutil.which("sleep")
+
+    if target is None:
+        raise RuntimeError("The sleep command is needed to create dummy processes")
+
+    programs = {
+        "protected": [
+            os.path.join(dir_path, f"prot_app_{idx}") for idx in range(protected_count)
+        ],
+        "other": [
+            os.path.join(dir_path, f"other_app_{idx}") for idx in range(other_count)
+        ],
+    }
+
+    for program in programs["protected"] + programs["other"]:
+        os.symlink(target, program)
+
+    protected_names = [os.path.basename(program) for program in programs["protected"]]
+    protected_path = os.path.join(dir_path, "protected_data.json")
+
+    with open(protected_path, "w") as save_file:
+        json.dump(protected_names, save_file)
+
+    return protected_path, programs
+
+
+def run_monitor(protected_path, scan_interval_seconds, events, stop_event):
+    """Runs the process monitor and sends its events back to the harness.
+
+    Runs in its own process, so its CPU and memory use can be measured on
+    their own.
+
+    Args:
+        protected_path (str): File path of the protected apps file.
+        scan_interval_seconds (float): Seconds the monitor waits between scans.
+        events (multiprocessing.Queue): Queue the monitor's events are put on.
+        stop_event (multiprocessing.Event): Set when the monitor should stop.
+    """
+
+    # Every termination is printed, which would flood the harness's output.
+    sys.stdout = open(os.devnull, "w")
+
+    monitor = ProcessMonitor(
+        protected_path,
+        scan_interval_seconds,
+        ApprovalCache(),
+        ProcessEventDispatcher(),
+        observer=lambda event, pid, name, at: events.put((event, pid, at)),
+        audit_events=False,
+    )
+    events.put(("ready", os.getpid(), time.monotonic()))
+    monitor.run(lambda: not stop_event.is_set())
+    events.put(("stats", monitor.stats(), time.monotonic()))
+
+
+def sample_usage(pid, samples, done, interval):
+    """Samples the CPU and memory use of a process until done is set.
+
+    Args:
+        pid (int): Process id to sample.
+        samples (list): List the samples are added to.
+        done (threading.Event): Set when sampling should stop.
+        interval (float): Seconds between samples.
+    """
+
+    process = psutil.Process(pid)
+    process.cpu_percent(None)
+
+    while not done.wait(interval):
+        try:
+            times = process.cpu_times()
+            samples.append(
+                {
+                    "cpu_percent": process.cpu_percent(None),
+                    "cpu_seconds": times.user + times.system,
+                    "rss_mb": process.memory_info().rss / (1024 * 1024),
+                }
+            )
+
+        except psutil.NoSuchProcess:
+            return
+
+
+def reap(children, done):
+    """Collects the exit status of finished dummy processes until done is set.
+
+    Args:
+        children (dict): Popen object of every running dummy process, by process id.
+        done (threading.Event): Set when reaping should stop.
+    """
+
+    while not done.wait(0.1):
+        for pid, child in list(children.items()):
+            if child.poll() is not None:
+                children.pop(pid, None)
+
+
+def distribution(values):
+    """Summarizes a list of latencies.
+
+    Args:
+        values (list): Latencies in milliseconds.
+
+    Returns:
+        dict: Count, mean, median, tail and largest latency.
+    """
+
+    if len(values) == 0:
+        return {"count": 0}
+
+    values = np.asarray(values)
+    return {
+        "count": len(values),
+        "mean_ms": float(np.mean(values)),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(np.max(values)),
+    }
+
+
+def run_stress(
+    processes=1000,
+    protected_share=0.1,
+    short_share=0.7,
+    short_seconds=0.5,
+    long_seconds=10,
+    rate=200,
+    scan_interval_seconds=0,
+    drain_seconds=5,
+    seed=0,
+):
+    """Runs one storm of dummy processes against the process monitor.
+
+    Args:
+        processes (int): Number of dummy processes to spawn.
+        protected_share (float): Share of processes named like a protected app.
+        short_share (float): Share of processes that are short lived.
+        short_seconds (float): Lifetime of short lived processes.
+        long_seconds (float): Lifetime of long lived processes.
+        rate (float): Processes spawned per second.
+        scan_interval_seconds (float): Seconds the monitor waits between scans.
+        drain_seconds (float): Seconds to wait for detections after the last spawn.
+        seed (int): Seed of the random process mix.
+
+    Returns:
+        dict: Detection and termination latency, missed detections and monitor resource use.
+    """
+
+    rng = np.random.default_rng(seed)
+    work_dir = tempfile.mkdtemp(prefix="monitor_stress_")
+    protected_path, programs = make_programs(work_dir, 5, 20)
+
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    stop_event = context.Event()
+    monitor = context.Process(
+        target=run_monitor,
+        args=(protected_path, scan_interval_seconds, events, stop_event),
+        daemon=True,
+    )
+    monitor.start()
+    events.get(timeout=60)
+
+    done = threading.Event()
+    samples = []
+    children = {}
+    threading.Thread(
+        target=sample_usage, args=(monitor.pid, samples, done, 0.5), daemon=True
+    ).start()
+    threading.Thread(target=reap, args=(children, done), daemon=True).start()
+
+    spawned = []
+    start = time.monotonic()
+
+    for idx in range(processes):
+        delay = start + idx / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        protected = bool(rng.random() < protected_share)
+        short = bool(rng.random() < short_share)
+        program = rng.choice(programs["protected" if protected else "other"])
+
+        spawned_at = time.monotonic()
+        child = subprocess.Popen(
+            [program, str(short_seconds if short else long_seconds)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        children[child.pid] = child
+        spawned.append(
+            {
+                "pid": child.pid,
+                "protected": protected,
+                "short": short,
+                "spawned_at": spawned_at,
+            }
+        )
+
+    spawn_seconds = time.monotonic() - start
+    time.sleep(drain_seconds)
+
+    for child in list(children.values()):
+        child.kill()
+        child.wait()
+
+    stop_event.set()
+    received = []
+    stats = {}
+
+    while True:
+        try:
+            event, value, at = events.get(timeout=30)
+
+        except queue.Empty:
+            break
+
+        if event == "stats":
+            stats = value
+            break
+
+        received.append((event, value, at))
+
+    monitor.join(10)
+    done.set()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Process ids can be reused, so each event goes to the latest spawn before it.
+    by_pid = {}
+    for record in spawned:
+        by_pid.setdefault(record["pid"], []).append(record)
+
+    first_seen = {"detected": {}, "terminated": {}}
+    for event, pid, at in received:
+        candidates = [
+            record for record in by_pid.get(pid, []) if record["spawned_at"] <= at
+        ]
+
+        if len(candidates) == 0:
+            continue
+
+        record = candidates[-1]
+        key = id(record)
+        if key not in first_seen[event]:
+            first_seen[event][key] = (at - record["spawned_at"]) * 1000
+
+    protected = [record for record in spawned if record["protected"]]
+    missed = [
+        record for record in protected if id(record) not in first_seen["detected"]
+    ]
+    false_detections = [
+        record
+        for record in spawned
+        if not record["protected"] and id(record) in first_seen["detected"]
+    ]
+
+    cpu_percent = [sample["cpu_percent"] for sample in samples]
+    rss_mb = [sample["rss_mb"] for sample in samples]
+
+    report = {
+        "processes": processes,
+        "protected": len(protected),
+        "spawn_rate": processes / spawn_seconds if spawn_seconds else 0.0,
+        "detection": distribution(list(first_seen["detected"].values())),
+        "termination": distribution(list(first_seen["terminated"].values())),
+        "missed": len(missed),
+        "missed_short_lived": sum(record["short"] for record in missed),
+        "false_detections": len(false_detections),
+        "monitor": {
+            "scans": stats.get("scans", 0),
+            "mean_scan_ms": stats.get("mean_scan_ms", 0.0),
+            "max_scan_ms": stats.get("max_scan_ms", 0.0),
+            "cpu_percent_mean": float(np.mean(cpu_percent)) if samples else 0.0,
+            "cpu_percent_max": max(cpu_percent, default=0.0),
+            "cpu_seconds": samples[-1]["cpu_seconds"] if samples else 0.0,
+            "rss_mb_mean": float(np.mean(rss_mb)) if samples else 0.0,
+            "rss_mb_max": max(rss_mb, default=0.0),
+        },
+    }
+    return report
+
+
+def print_report(report):
+    """Prints the results of a stress run.
+
+    Args:
+        report (dict): Report returned by run_stress.
+    """
+
+    print(
+        f"{report['processes']} processes ({report['protected']} protected) "
+        f"spawned at {report['spawn_rate']:.0f}/s"
+    )
+
+    for name in ("detection", "termination"):
+        latency = report[name]
+
+        if latency["count"] == 0:
+            print(f"{name:12} none")
+            continue
+
+        print(
+            f"{name:12} {latency['count']:6d}  mean {latency['mean_ms']:8.1f} ms  "
+            f"p50 {latency['p50_ms']:8.1f}  p95 {latency['p95_ms']:8.1f}  "
+            f"p99 {latency['p99_ms']:8.1f}  max {latency['max_ms']:8.1f}"
+        )
+
+    print(
+        f"Missed {report['missed']} protected processes "
+        f"({report['missed_short_lived']} short lived), "
+        f"{report['false_detections']} false detections"
+    )
+
+    monitor = report["monitor"]
+    print(
+        f"Monitor: {monitor['scans']} scans (mean {monitor['mean_scan_ms']:.1f} ms, "
+        f"max {monitor['max_scan_ms']:.1f} ms), CPU {monitor['cpu_percent_mean']:.0f}% "
+        f"mean / {monitor['cpu_percent_max']:.0f}% max, {monitor['cpu_seconds']:.1f} CPU s, "
+        f"{monitor['rss_mb_mean']:.0f} MB mean / {monitor['rss_mb_max']:.0f} MB max"
+    )
+
+
+def main(argv=None):
+    """Runs the process monitor stress test command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.monitor_stress",
+        description="Stress test the process monitor with storms of dummy processes.",
+    )
+    parser.add_argument("--processes", type=int, nargs="+", default=[1000])
+    parser.add_argument("--protected-share", type=float, default=0.1)
+    parser.add_argument("--short-share", type=float, default=0.7)
+    parser.add_argument("--short-seconds", type=float, default=0.5)
+    parser.add_argument("--long-seconds", type=float, default=10)
+    parser.add_argument("--rate", type=float, default=200)
+    parser.add_argument("--interval", type=float, default=0)
+    parser.add_argument("--drain-seconds", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="json file the reports are saved to")
+
+    args = parser.parse_args(argv)
+    reports = []
+
+    for processes in args.processes:
+        report = run_stress(
+            processes,
+            args.protected_share,
+            args.short_share,
+            args.short_seconds,
+            args.long_seconds,
+            args.rate,
+            args.interval,
+            args.drain_seconds,
+            args.seed,
+        )
+        print_report(report)
+        reports.append(report)
+
+    if args.output:
+        with open(args.output, "w") as save_file:
+            json.dump(reports, save_file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from face_id import runtime
+
+runtime.apply_environment()
+
+import tensorflow as tf
+
+runtime.configure_tensorflow(tf)
+
+
+def preprocess(file_path):
+    """Loads an image and alters its size/scale.
+
+    Takes an image at a specific file path, resizes it to the 100x100 input
+    size of the siamese neural network and scales its values between 0 and 1.
+
+    Args:
+        file_path (str): file path to a specific image.
+
+    Returns:
+        tensorflow.python.framework.ops.EagerTensor: image data used in verification calculations.
+    """
+
+    byte_image = tf.io.read_file(file_path)
+    image = tf.io.decode_jpeg(byte_image)
+    image = tf.image.resize(image, (100, 100))
+    image = image / 255.0
+    return image
+
+
+def preprocess_frame(cv_image):
+    """Alters the size/scale of a webcam image.
+
+    Does the same resizing and scaling as preprocess, but on an OpenCV
+    image in memory instead of a saved jpeg file. OpenCV images are in
+    BGR order, so the channels are reversed to match decoded jpegs.
+
+    Args:
+        cv_image (ndarray): OpenCV image of the user's webcam.
+
+    Returns:
+        tensorflow.python.framework.ops.EagerTensor: image data used in verification calculations.
+    """
+
+    image = tf.convert_to_tensor(cv_image[..., ::-1])
+    image = tf.image.resize(image, (100, 100))
+    image = image / 255.0
+    return image
+
+
+def crop_frame(cv_image):
+    """Crops a full webcam frame to the 250x250 window the user's face is expected in.
+
+    Args:
+        cv_image (ndarray): OpenCV image of the full webcam frame.
+
+    Returns:
+        ndarray: The cropped OpenCV image.
+    """
+
+    return cv_image[120 : 120 + 250, 200 : 200 + 250, :]
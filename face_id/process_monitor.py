@@ -0,0 +1,385 @@
+import json
+import threading
+import time
+
+import psutil
+
+from face_id.approval_cache import ApprovalCache
+from face_id.audit_log import audit
+from face_id.event_dispatcher import ProcessEventDispatcher
+from face_id.process_tree import ProcessTree
+from face_id.settings import load_settings
+
+
+class ProcessMonitor:
+    """
+    Finds and stops protected apps that the user hasn't been verified to use.
+
+    Holds the process scan used by the monitor thread without depending on Qt, so it
+    can also run headless. Each scan looks through every running process and groups
+    protected ones with their descendants into launches, using a process tree. Launches
+    that have no approval are terminated, or held if the process holder is in hold mode,
+    and ask for verification once, while approved launches run until they exit. An
+    observer can be given to be told when each protected process is detected, held and
+    terminated.
+
+    Attributes:
+        protected_path (str): File path of the json list of protected app names.
+        scan_interval_seconds (float): Seconds to wait between scans, 0 to scan continuously.
+        approval_cache (ApprovalCache): Cache of the apps the user was verified to use.
+        event_dispatcher (ProcessEventDispatcher): Coalesces detections into one request per launch.
+        group_launches (bool): If helper processes are grouped into the launch that started them.
+        process_holder (ProcessHolder): Suspends processes instead of terminating them in hold mode.
+        governor (ResourceGovernor): Adapts the scan interval to the CPU budget, and is boosted by detections.
+        lifetime_tracker (LifetimeTracker): Watches approved and held processes so approvals end when they exit.
+        process_tree (ProcessTree): Parent and child links of the processes found by the last scan.
+        protected_processes (set): Names of the protected apps.
+    """
+
+    def __init__(
+        self,
+        protected_path="face_id/protected_data.json",
+        scan_interval_seconds=0,
+        approval_cache=None,
+        event_dispatcher=None,
+        group_launches=True,
+        process_holder=None,
+        governor=None,
+        lifetime_tracker=None,
+        on_request=None,
+        observer=None,
+        audit_events=True,
+    ):
+        """Initializes the process monitor and loads the protected apps.
+
+        Args:
+            protected_path (str): File path of the json list of protected app names.
+            scan_interval_seconds (float): Seconds to wait between scans.
+            approval_cache (ApprovalCache): Cache of approvals, a new one from the settings if None.
+            event_dispatcher (ProcessEventDispatcher): Event dispatcher, a new one from the settings if None.
+            group_launches (bool): If helper processes are grouped into the launch that started them.
+            process_holder (ProcessHolder): Process holder, processes are always terminated if None.
+            governor (ResourceGovernor): Governor that sets the scan interval, scan_interval_seconds is used if None.
+            lifetime_tracker (LifetimeTracker): Tracker of approved and held processes, nothing is tracked if None.
+            on_request (function): Called with an app's name and exe path when it needs verification.
+            observer (function): Called with "detected", "held" or "terminated", a process id, app name and time.
+            audit_events (bool): If detections and terminations are saved to the audit log.
+        """
+
+        self.protected_path = protected_path
+        self.scan_interval_seconds = scan_interval_seconds
+        self.approval_cache = approval_cache or ApprovalCache.from_settings()
+        self.event_dispatcher = event_dispatcher or ProcessEventDispatcher.from_settings()
+        self.group_launches = group_launches
+        self.process_holder = process_holder
+        self.governor = governor
+        self.lifetime_tracker = lifetime_tracker
+        self.on_request = on_request
+        self.observer = observer
+        self.audit_events = audit_events
+        self.process_tree = ProcessTree()
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "scans": 0,
+            "scan_ms": 0.0,
+            "max_scan_ms": 0.0,
+            "launches": 0,
+            "helpers": 0,
+        }
+        self.load_protected()
+
+    @classmethod
+    def from_settings(cls, **kwargs):
+        """Creates a process monitor from the "monitor" settings section.
+
+        Args:
+            **kwargs: Other arguments passed to the process monitor.
+
+        Returns:
+            ProcessMonitor: Monitor using the saved or default settings.
+        """
+
+        return cls(**load_settings("monitor"), **kwargs)
+
+    def load_protected(self):
+        """Loads the names of the protected apps from the protected apps file."""
+
+        with open(self.protected_path, "r") as open_file:
+            self.protected_processes = set(json.load(open_file))
+
+    def scan(self):
+        """Looks through every running process once and stops unapproved protected launches.
+
+        Returns:
+            set: Process ids of the protected launches that are running and their helpers.
+        """
+
+        start = time.perf_counter()
+        attrs = ["pid", "name", "exe", "ppid", "create_time"]
+
+        if self.approval_cache.per_user:
+            attrs.append("username")
+
+        processes = {}
+        protected = []
+
+        for proc in psutil.process_iter(attrs):
+            processes[proc.info["pid"]] = proc
+
+            if proc.info["name"] in self.protected_processes:
+                protected.append(proc)
+
+        launches = self.find_launches(processes, protected)
+        protected_pids = set()
+        running = set()
+
+        for members in launches.values():
+            protected_pids.update(member.info["pid"] for member in members)
+            running.update(
+                (member.info["pid"], member.info["create_time"]) for member in members
+            )
+            self.check_launch(members)
+
+        self.event_dispatcher.prune(protected_pids)
+        self.approval_cache.prune_admitted(running)
+
+        scan_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats["scans"] += 1
+            self._stats["scan_ms"] += scan_ms
+            self._stats["max_scan_ms"] = max(self._stats["max_scan_ms"], scan_ms)
+            self._stats["launches"] = len(launches)
+            self._stats["helpers"] = len(protected_pids) - len(launches)
+
+        return protected_pids
+
+    def find_launches(self, processes, protected):
+        """Groups protected processes and their descendants into launches.
+
+        Each launch starts at the highest protected process in its branch of the
+        process tree, and includes every descendant of it, so the helper processes
+        of an app are approved, held and terminated together with it. Without launch
+        grouping every protected process is its own launch.
+
+        Args:
+            processes (dict): Every running process, by process id.
+            protected (list): Running processes with a protected name.
+
+        Returns:
+            dict: Processes of every launch, root first, by the root's process id.
+        """
+
+        if not self.group_launches:
+            return {proc.info["pid"]: [proc] for proc in protected}
+
+        self.process_tree.update(proc.info for proc in processes.values())
+        protected_ids = {proc.info["pid"] for proc in protected}
+        launches = {}
+
+        for proc in protected:
+            root = self.process_tree.launch_root(proc.info["pid"], protected_ids)
+
+            if root not in launches:
+                launches[root] = [processes[root]] + [
+                    processes[pid]
+                    for pid in self.process_tree.descendants(root)
+                    if pid in processes
+                ]
+
+        return launches
+
+    def check_launch(self, members):
+        """Stops a protected launch unless it's approved or already held.
+
+        Approvals are looked up for the launch's root process, so its helpers
+        are covered by the same approval. An approved launch is admitted and
+        isn't looked up again by later scans, so it keeps running after the
+        approval expires. The launch asks for verification once under the name
+        of its root process.
+
+        Args:
+            members (list): Processes of the launch, root first.
+        """
+
+        root = members[0]
+        info = root.info
+
+        if self.process_holder is not None and self.process_holder.is_held(info["pid"]):
+            return
+
+        processes = [
+            (member.info["pid"], member.info["create_time"]) for member in members
+        ]
+
+        if self.approval_cache.is_admitted(
+            info["pid"], info["create_time"]
+        ) or self.approval_cache.is_approved(
+            info["name"], info["exe"], info["pid"], info.get("username")
+        ):
+            self.approval_cache.admit(info["name"], info["exe"], processes)
+            self.track(members)
+            return
+
+        for member in members:
+            if member.info["name"] in self.protected_processes:
+                self.notify("detected", member.info["pid"], member.info["name"])
+
+        if self.governor is not None:
+            self.governor.boost("detection")
+
+        try:
+
+            if self.event_dispatcher.should_terminate(info["pid"]) and root.is_running():
+                self.enforce(members)
+
+        except psutil.NoSuchProcess:
+            print(f"Process not found: {info['name']}")
+
+        if self.event_dispatcher.submit(info["name"]):
+            self.record(
+                "detection",
+                app=info["name"],
+                exe=info["exe"],
+                pid=info["pid"],
+                helpers=len(members) - 1,
+            )
+
+            if self.on_request is not None:
+                self.on_request(info["name"], info["exe"])
+
+    def enforce(self, members):
+        """Holds or terminates every process of a launch.
+
+        Args:
+            members (list): Processes of the launch, root first.
+
+        Raises:
+            psutil.NoSuchProcess: If the launch's root process has exited.
+        """
+
+        info = members[0].info
+        event = "held" if self.holding else "terminated"
+        pids = []
+        freezer = None
+
+        for member in members:
+            try:
+                if self.holding:
+                    freezer = self.process_holder.hold(member, info["name"])
+
+                else:
+                    member.terminate()
+
+            except psutil.NoSuchProcess:
+                if member is members[0]:
+                    raise
+
+                continue
+
+            pids.append(member.info["pid"])
+            self.notify(event, member.info["pid"], member.info["name"])
+
+        if self.holding:
+            self.track(members)
+            print(f"Held process: {info['name']}")
+            self.record(
+                "hold",
+                app=info["name"],
+                exe=info["exe"],
+                pid=info["pid"],
+                pids=pids,
+                freezer=freezer,
+            )
+
+        else:
+            print(f"Killed process: {info['name']}")
+            self.record(
+                "termination",
+                app=info["name"],
+                exe=info["exe"],
+                pid=info["pid"],
+                pids=pids,
+            )
+
+    def track(self, members):
+        """Tracks the processes of an approved or held launch until they exit.
+
+        Args:
+            members (list): Processes of the launch, root first.
+        """
+
+        if self.lifetime_tracker is None or not self.lifetime_tracker.enabled:
+            return
+
+        info = members[0].info
+
+        for member in members:
+            if not self.lifetime_tracker.is_tracked(member.info["pid"]):
+                self.lifetime_tracker.track(
+                    member.info["pid"],
+                    info["name"],
+                    info["exe"],
+                    member.info["create_time"],
+                )
+
+    @property
+    def holding(self):
+        """bool: If protected processes are held instead of terminated."""
+
+        return self.process_holder is not None and self.process_holder.enabled
+
+    def run(self, should_run):
+        """Scans processes until should_run returns False.
+
+        Args:
+            should_run (function): Returns True while the monitor should keep scanning.
+        """
+
+        while should_run():
+            self.scan()
+
+            if self.governor is not None:
+                interval = self.governor.scan_interval(self.scan_interval_seconds)
+
+            else:
+                interval = self.scan_interval_seconds
+
+            if interval:
+                time.sleep(interval)
+
+    def notify(self, event, pid, name):
+        """Tells the observer about a protected process.
+
+        Args:
+            event (str): "detected", "held" or "terminated".
+            pid (int): Process id of the app.
+            name (str): Name of the app.
+        """
+
+        if self.observer is not None:
+            self.observer(event, pid, name, time.monotonic())
+
+    def record(self, event_type, **fields):
+        """Saves a record to the audit log if auditing is enabled.
+
+        Args:
+            event_type (str): Type of event.
+            **fields: Values saved with the record.
+        """
+
+        if self.audit_events:
+            audit(event_type, **fields)
+
+    def stats(self):
+        """Returns the number of scans and their mean and longest duration.
+
+        Returns:
+            dict: The monitor's counters.
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+
+        stats["mean_scan_ms"] = stats["scan_ms"] / stats["scans"] if stats["scans"] else 0.0
+        return stats
@@ -0,0 +1,127 @@
+import threading
+
+
+class ProcessTree:
+    """
+    Parent and child links of every running process, kept between process scans.
+
+    The process monitor updates the tree from the processes it lists on every scan, so
+    building it costs no extra system calls. It's used to group the helper processes of
+    multi-process apps, like browsers and Electron apps, into the launch that started
+    them. A parent is only trusted if it was created before its child, so a reused
+    process id isn't mistaken for an ancestor.
+
+    Attributes:
+        processes (int): Number of processes in the tree.
+    """
+
+    def __init__(self):
+        """Initializes an empty process tree."""
+
+        self._parents = {}
+        self._children = {}
+        self._lock = threading.Lock()
+
+    @property
+    def processes(self):
+        """int: Number of processes in the tree."""
+
+        with self._lock:
+            return len(self._parents)
+
+    def update(self, infos):
+        """Replaces the tree with the processes of a scan.
+
+        Args:
+            infos (list): Info dict of every running process, with its "pid", "ppid" and "create_time".
+        """
+
+        parents = {}
+        children = {}
+
+        for info in infos:
+            parents[info["pid"]] = (info["ppid"], info["create_time"] or 0.0)
+
+        for pid, (ppid, create_time) in parents.items():
+            parent = parents.get(ppid)
+
+            if ppid == pid or parent is None or parent[1] > create_time:
+                continue
+
+            children.setdefault(ppid, []).append(pid)
+
+        with self._lock:
+            self._parents = parents
+            self._children = children
+
+    def ancestors(self, pid):
+        """Lists the ancestors of a process, from its parent up.
+
+        Args:
+            pid (int): Process id.
+
+        Returns:
+            list: Process ids of the ancestors, closest first.
+        """
+
+        ancestors = []
+
+        with self._lock:
+            while True:
+                ppid = self._parents.get(pid, (None, 0.0))[0]
+
+                if ppid is None or pid not in self._children.get(ppid, ()):
+                    return ancestors
+
+                if ppid in ancestors:
+                    return ancestors
+
+                ancestors.append(ppid)
+                pid = ppid
+
+    def descendants(self, pid):
+        """Lists every descendant of a process.
+
+        Args:
+            pid (int): Process id.
+
+        Returns:
+            list: Process ids of the descendants, children first.
+        """
+
+        descendants = []
+        seen = {pid}
+
+        with self._lock:
+            pending = list(self._children.get(pid, ()))
+
+            while pending:
+                child = pending.pop(0)
+
+                if child in seen:
+                    continue
+
+                seen.add(child)
+                descendants.append(child)
+                pending.extend(self._children.get(child, ()))
+
+        return descendants
+
+    def launch_root(self, pid, roots):
+        """Finds the launch a process belongs to.
+
+        Args:
+            pid (int): Process id.
+            roots (set): Process ids that can start a launch, such as every protected process.
+
+        Returns:
+            int: Process id of the highest ancestor in roots, or pid if it has none.
+        """
+
+        root = pid
+
+        for ancestor in self.ancestors(pid):
+            if ancestor in roots:
+                root = ancestor
+
+        return root
@@ -0,0 +1,241 @@
+import json
+import os
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+
+
+class ProtectedAppsModel(QAbstractListModel):
+    """
+    List model of the protected app names, saved to the protected apps file.
+
+    The names are kept in a list for their order and a set for duplicate checks, so
+    adding an app doesn't scan the list. Adds and removals insert and remove only the
+    changed rows, so views update without rebuilding every row, and bulk imports add
+    all of their new names in one insert and one save.
+
+    Attributes:
+        path (str): File path of the json list of protected app names.
+    """
+
+    def __init__(self, path):
+        """Initializes the model and loads the protected apps file.
+
+        Args:
+            path (str): File path of the json list of protected app names.
+        """
+
+        super().__init__()
+        self.path = path
+        self._names = []
+        self._lookup = set()
+        self.load()
+
+    def rowCount(self, parent=QModelIndex()):
+        """Gets the number of protected apps.
+
+        Naming conventions are different for this method so it can be called by Qt.
+
+        Args:
+            parent (QModelIndex): Parent index, always invalid for a list.
+
+        Returns:
+            int: Number of rows.
+        """
+
+        if parent.isValid():
+            return 0
+
+        return len(self._names)
+
+    def data(self, index, role=Qt.DisplayRole):
+        """Gets the name of the protected app in a row.
+
+        Args:
+            index (QModelIndex): Index of the row.
+            role (int): Data role, only the display role is supported.
+
+        Returns:
+            str: Name of the app, or None for other roles.
+        """
+
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        return self._names[index.row()]
+
+    def load(self):
+        """Loads the protected app names from the protected apps file."""
+
+        names = []
+
+        if os.path.exists(self.path) and os.stat(self.path).st_size > 0:
+            with open(self.path, "r") as open_file:
+                names = json.load(open_file)
+
+        self.beginResetModel()
+        self._names = []
+        self._lookup = set()
+
+        for name in names:
+            if name and name not in self._lookup:
+                self._names.append(name)
+                self._lookup.add(name)
+
+        self.endResetModel()
+
+    def save(self):
+        """Saves the protected app names to the protected apps file.
+
+        The file is written to a temporary path first and then moved into
+        place, so the monitor never reads a half written list.
+        """
+
+        temp_path = self.path + ".tmp"
+
+        with open(temp_path, "w") as save_file:
+            json.dump(self._names, save_file)
+
+        os.replace(temp_path, self.path)
+
+    def names(self):
+        """Lists the protected app names.
+
+        Returns:
+            list: Names of the protected apps in order.
+        """
+
+        return list(self._names)
+
+    def contains(self, name):
+        """Checks if an app is protected.
+
+        Args:
+            name (str): Name of an app.
+
+        Returns:
+            bool: True if the app is protected.
+        """
+
+        return name in self._lookup
+
+    def add(self, name):
+        """Adds an app and saves the list.
+
+        Args:
+            name (str): Name of the app.
+
+        Returns:
+            bool: True if the app was added, False if it's empty or already protected.
+        """
+
+        return self.add_many([name]) == 1
+
+    def add_many(self, names):
+        """Adds every new app in a list with one insert and one save.
+
+        Args:
+            names (list): Names of the apps.
+
+        Returns:
+            int: Number of apps that were added.
+        """
+
+        new_names = []
+        seen = set()
+
+        for name in names:
+            name = name.strip()
+
+            if name and name not in self._lookup and name not in seen:
+                new_names.append(name)
+                seen.add(name)
+
+        if len(new_names) == 0:
+            return 0
+
+        first = len(self._names)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_names) - 1)
+        self._names.extend(new_names)
+        self._lookup.update(new_names)
+        self.endInsertRows()
+
+        self.save()
+        return len(new_names)
+
+    def remove_rows(self, rows):
+        """Removes the apps in some rows and saves the list.
+
+        Neighbouring rows are removed together, from the bottom up, so the
+        remaining row numbers stay valid.
+
+        Args:
+            rows (list): Row numbers of the apps.
+
+        Returns:
+            int: Number of apps that were removed.
+        """
+
+        rows = sorted(set(rows), reverse=True)
+
+        if len(rows) == 0:
+            return 0
+
+        ranges = []
+        for row in rows:
+            if ranges and ranges[-1][0] == row + 1:
+                ranges[-1][0] = row
+
+            else:
+                ranges.append([row, row])
+
+        for first, last in ranges:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            self._lookup.difference_update(self._names[first : last + 1])
+            del self._names[first : last + 1]
+            self.endRemoveRows()
+
+        self.save()
+        return len(rows)
+
+    def import_file(self, file_path):
+        """Adds the apps listed in a json list or a text file with one name per line.
+
+        Args:
+            file_path (str): File path of the app list.
+
+        Returns:
+            int: Number of apps that were added.
+
+        Raises:
+            ValueError: If a json file doesn't hold a list of names.
+        """
+
+        with open(file_path, "r") as open_file:
+            content = open_file.read()
+
+        if file_path.lower().endswith(".json"):
+            names = json.loads(content)
+
+            if not isinstance(names, list) or not all(
+                isinstance(name, str) for name in names
+            ):
+                raise ValueError("The app list must be a json list of names")
+
+        else:
+            names = content.splitlines()
+
+        return self.add_many(names)
+
+    def export_file(self, file_path):
+        """Saves the protected app names to a json list, or a text file with one name per line.
+
+        Args:
+            file_path (str): File path the app list is saved to.
+        """
+
+        with open(file_path, "w") as save_file:
+            if file_path.lower().endswith(".json"):
+                json.dump(self._names, save_file, indent=4)
+
+            else:
+                save_file.write("\n".join(self._names) + "\n")
@@ -0,0 +1,303 @@
+"""Runtime tuning for TensorFlow on the CPU.
+
+The settings in the "runtime" section control oneDNN, the intra-op and inter-op
+thread pools and XLA JIT compilation. They have to be applied before TensorFlow
+is initialized, so every module that imports TensorFlow calls apply_environment()
+before the import and configure_tensorflow() right after it.
+
+The autotune command benchmarks candidate settings against the real model and
+gallery on the local CPU and saves the fastest one:
+
+    python -m face_id.runtime autotune
+"""
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from face_id.settings import load_settings, save_settings
+
+PROFILE_ENV = "FACE_ID_RUNTIME_PROFILE"
+
+_environment_applied = False
+_tensorflow_configured = False
+
+
+def get_profile():
+    """Gets the runtime profile that should be used by this process.
+
+    The profile is read from the "runtime" settings section, unless a profile
+    was passed through the FACE_ID_RUNTIME_PROFILE environment variable, which
+    is used by the autotune command to try out candidate profiles. If the intra-op
+    thread count isn't set, the resource governor picks it from the power state.
+
+    Returns:
+        dict: Runtime profile with onednn, intra_op_threads, inter_op_threads and xla_jit values.
+    """
+
+    profile = load_settings("runtime")
+
+    if not profile["intra_op_threads"]:
+        from face_id.governor import get_governor
+
+        profile["intra_op_threads"] = get_governor().inference_threads()
+
+    if os.environ.get(PROFILE_ENV):
+        profile.update(json.loads(os.environ[PROFILE_ENV]))
+
+    return profile
+
+
+def apply_environment():
+    """Sets the environment variables TensorFlow reads when it starts.
+
+    Must be called before TensorFlow is imported. Calling it more than
+    once has no extra effect.
+    """
+
+    global _environment_applied
+
+    if _environment_applied:
+        return
+
+    profile = get_profile()
+
+    os.environ["TF_ENABLE_ONEDNN_OPTS"] = "1" if profile["onednn"] else "0"
+
+    if profile["intra_op_threads"]:
+        os.environ["OMP_NUM_THREADS"] = str(profile["intra_op_threads"])
+
+    if profile["xla_jit"]:
+        os.environ["TF_XLA_FLAGS"] = "--tf_xla_auto_jit=2 --tf_xla_cpu_global_jit"
+
+    _environment_applied = True
+
+
+def configure_tensorflow(tf):
+    """Sets the thread pool sizes and XLA JIT option of TensorFlow.
+
+    Must be called right after TensorFlow is imported and before any model
+    is loaded, since the thread pools can't be changed once they are created.
+
+    Args:
+        tf (module): The imported tensorflow module.
+    """
+
+    global _tensorflow_configured
+
+    if _tensorflow_configured:
+        return
+
+    profile = get_profile()
+
+    try:
+        if profile["intra_op_threads"]:
+            tf.config.threading.set_intra_op_parallelism_threads(
+                profile["intra_op_threads"]
+            )
+
+        if profile["inter_op_threads"]:
+            tf.config.threading.set_inter_op_parallelism_threads(
+                profile["inter_op_threads"]
+            )
+
+        tf.config.optimizer.set_jit(bool(profile["xla_jit"]))
+
+    except RuntimeError:
+        print("TensorFlow already initialized, runtime profile not applied")
+
+    _tensorflow_configured = True
+
+
+def candidate_profiles():
+    """Creates the runtime profiles tried by the autotune command.
+
+    Returns:
+        list: Runtime profiles built from every combination of the candidate values.
+    """
+
+    cpu_count = os.cpu_count() or 1
+    intra_threads = sorted({1, 2, max(1, cpu_count // 2), cpu_count})
+    inter_threads = sorted({1, 2})
+
+    return [
+        {
+            "onednn": onednn,
+            "intra_op_threads": intra,
+            "inter_op_threads": inter,
+            "xla_jit": xla_jit,
+        }
+        for onednn, intra, inter, xla_jit in itertools.product(
+            [False, True], intra_threads, inter_threads, [False, True]
+        )
+    ]
+
+
+def benchmark(model_path, gallery_path, gallery_size, repeats):
+    """Times how long the model takes to score a probe against a gallery.
+
+    Uses the runtime profile of the current process. The first image in the
+    gallery is used as the probe image.
+
+    Args:
+        model_path (str): File path of the siamese model.
+        gallery_path (str): Folder containing the gallery images.
+        gallery_size (int): Largest number of gallery images to score against.
+        repeats (int): Number of timed runs.
+
+    Returns:
+        dict: Median and minimum run time in milliseconds and the load time in seconds.
+    """
+
+    apply_environment()
+
+    import numpy as np
+    import tensorflow as tf
+
+    configure_tensorflow(tf)
+
+    from face_id.layers import L1Dist
+    from face_id.preprocessing import preprocess
+
+    start = time.perf_counter()
+    model = tf.keras.models.load_model(model_path, custom_objects={"L1Dist": L1Dist})
+    load_seconds = time.perf_counter() - start
+
+    file_names = sorted(os.listdir(gallery_path))[:gallery_size]
+    gallery = np.stack(
+        [preprocess(os.path.join(gallery_path, name)) for name in file_names]
+    )
+    probes = np.repeat(gallery[:1], len(gallery), axis=0)
+
+    model.predict([probes, gallery], verbose=0)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict([probes, gallery], verbose=0)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "load_seconds": load_seconds,
+    }
+
+
+def autotune(model_path, gallery_path, gallery_size, repeats, save=True):
+    """Benchmarks every candidate profile and saves the fastest one.
+
+    Each candidate is run in a new python process, because the settings
+    can only be applied before TensorFlow is initialized.
+
+    Args:
+        model_path (str): File path of the siamese model.
+        gallery_path (str): Folder containing the gallery images.
+        gallery_size (int): Largest number of gallery images to score against.
+        repeats (int): Number of timed runs for each candidate.
+        save (bool): If the fastest profile is saved to the "runtime" settings.
+
+    Returns:
+        dict: The fastest runtime profile, or None if every candidate failed.
+    """
+
+    results = []
+
+    for profile in candidate_profiles():
+        env = dict(os.environ)
+        env[PROFILE_ENV] = json.dumps(profile)
+        env["TF_CPP_MIN_LOG_LEVEL"] = "2"
+
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "face_id.runtime",
+                "bench",
+                "--model",
+                model_path,
+                "--gallery",
+                gallery_path,
+                "--gallery-size",
+                str(gallery_size),
+                "--repeats",
+                str(repeats),
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+
+        if process.returncode != 0:
+            print(f"Profile failed: {profile}")
+            continue
+
+        timing = json.loads(process.stdout.strip().splitlines()[-1])
+        results.append((timing["median_ms"], profile))
+        print(f"{timing['median_ms']:9.2f} ms  {profile}")
+
+    if len(results) == 0:
+        return None
+
+    best_ms, best_profile = min(results, key=lambda result: result[0])
+    print(f"Fastest profile ({best_ms:.2f} ms): {best_profile}")
+
+    if save:
+        save_settings("runtime", best_profile)
+        print("Saved profile to the runtime settings")
+
+    return best_profile
+
+
+def main(argv=None):
+    """Runs the runtime tuning command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    from face_id.gallery import enrolled_folder
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.runtime",
+        description="Benchmark and tune the TensorFlow CPU runtime.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command in ("autotune", "bench"):
+        subparser = subparsers.add_parser(command)
+        subparser.add_argument("--model", default="face_id/siamesemodelv2.h5")
+        subparser.add_argument(
+            "--gallery",
+            default=enrolled_folder(),
+        )
+        subparser.add_argument("--gallery-size", type=int, default=50)
+        subparser.add_argument("--repeats", type=int, default=10)
+
+    subparsers.choices["autotune"].add_argument(
+        "--dry-run", action="store_true", help="don't save the fastest profile"
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        timing = benchmark(args.model, args.gallery, args.gallery_size, args.repeats)
+        print(json.dumps(timing))
+
+    else:
+        autotune(
+            args.model,
+            args.gallery,
+            args.gallery_size,
+            args.repeats,
+            save=not args.dry_run,
+        )
+
+
+if __name__ == "__main__":
+    main()
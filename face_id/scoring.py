@@ -0,0 +1,519 @@
+"""Scoring of a probe image against the gallery of face id images.
+
+The Keras siamese model is split into its embedding tower and its L1Dist plus
+classifier head, and both are fused into one tf.function with fixed input
+signatures for a single probe image and a gallery padded to a bucket size.
+The functions are exported as a SavedModel so the app can call them directly:
+
+    python -m face_id.scoring export [--xla]
+    python -m face_id.scoring bench
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from face_id import runtime
+
+runtime.apply_environment()
+
+import numpy as np
+import tensorflow as tf
+
+runtime.configure_tensorflow(tf)
+
+from face_id.gallery import enrolled_folder
+from face_id.layers import L1Dist
+from face_id.settings import load_settings
+
+IMAGE_SHAPE = (100, 100, 3)
+
+
+def load_siamese_model(model_path):
+    """Loads a saved siamese model.
+
+    Args:
+        model_path (str): File path of the siamese model.
+
+    Returns:
+        tensorflow.keras.Model: The siamese model.
+    """
+
+    return tf.keras.models.load_model(
+        model_path, custom_objects={"L1Dist": L1Dist}, compile=False
+    )
+
+
+def split_siamese_model(model):
+    """Splits a siamese model into its embedding tower and classifier head.
+
+    Args:
+        model (tensorflow.keras.Model): The siamese model.
+
+    Returns:
+        tuple: The embedding model and the dense classifier layer.
+    """
+
+    embedding = model.get_layer("embedding")
+    classifier = model.layers[-1]
+    return embedding, classifier
+
+
+def embed_images(embedding, images):
+    """Runs the embedding tower on a batch of images.
+
+    The embedding model is saved with a list of outputs, so its single
+    output is taken out of the list.
+
+    Args:
+        embedding (tensorflow.keras.Model): Embedding tower of a siamese model.
+        images (Tensor): Batch of preprocessed images.
+
+    Returns:
+        Tensor: Embedding of every image.
+    """
+
+    embeddings = embedding(images, training=False)
+
+    if isinstance(embeddings, (list, tuple)):
+        embeddings = embeddings[0]
+
+    return embeddings
+
+
+def bucket_size(count, buckets):
+    """Finds the smallest gallery bucket that fits a number of images.
+
+    Args:
+        count (int): Number of gallery images.
+        buckets (list): Gallery sizes the scoring graph was exported for.
+
+    Returns:
+        int: The smallest bucket that fits the images, or the largest bucket.
+    """
+
+    for size in sorted(buckets):
+        if count <= size:
+            return size
+
+    return max(buckets)
+
+
+class ScoringModule(tf.Module):
+    """
+    Fused scoring graph built from the embedding tower and classifier head of a siamese model.
+
+    The graph embeds the probe image once and the gallery images in one batch, finds the
+    L1 distance between the probe embedding and every gallery embedding and runs the
+    classifier on the distances, all inside one tf.function.
+
+    Attributes:
+        embedding (tensorflow.keras.Model): Embedding tower of the siamese model.
+        classifier (tensorflow.keras.layers.Dense): Classifier head of the siamese model.
+        buckets (tf.Variable): Gallery sizes that have a fixed scoring signature.
+    """
+
+    def __init__(self, model, buckets, jit_compile=False):
+        """Initializes the scoring module and traces its functions.
+
+        Args:
+            model (tensorflow.keras.Model): The siamese model.
+            buckets (list): Gallery sizes to create a fixed scoring signature for.
+            jit_compile (bool): If the functions are compiled with XLA.
+        """
+
+        super().__init__()
+
+        self.embedding, self.classifier = split_siamese_model(model)
+        self.buckets = tf.Variable(sorted(buckets), trainable=False)
+        embedding_size = self.embedding.output_shape[-1]
+
+        self.embed = tf.function(
+            self._embed,
+            input_signature=[tf.TensorSpec((None,) + IMAGE_SHAPE, tf.float32)],
+            jit_compile=jit_compile,
+        )
+        self.score_embeddings = tf.function(
+            self._score_embeddings,
+            input_signature=[
+                tf.TensorSpec((1, embedding_size), tf.float32),
+                tf.TensorSpec((None, embedding_size), tf.float32),
+            ],
+            jit_compile=jit_compile,
+        )
+
+        for size in sorted(buckets):
+            function = tf.function(
+                self._score,
+                input_signature=[
+                    tf.TensorSpec((1,) + IMAGE_SHAPE, tf.float32),
+                    tf.TensorSpec((size,) + IMAGE_SHAPE, tf.float32),
+                ],
+                jit_compile=jit_compile,
+            )
+            setattr(self, f"score_{size}", function)
+
+    def signatures(self):
+        """Creates the serving signatures of the SavedModel.
+
+        Returns:
+            dict: Concrete functions keyed by their signature name.
+        """
+
+        signatures = {
+            "embed": self.embed.get_concrete_function(),
+            "score_embeddings": self.score_embeddings.get_concrete_function(),
+        }
+
+        for size in self.buckets.numpy():
+            function = getattr(self, f"score_{size}")
+            signatures[f"score_{size}"] = function.get_concrete_function()
+
+        return signatures
+
+    def _embed(self, images):
+        """Creates the embeddings of a batch of images."""
+
+        return {"embeddings": embed_images(self.embedding, images)}
+
+    def _score_embeddings(self, probe_embedding, gallery_embeddings):
+        """Scores a probe embedding against a batch of gallery embeddings."""
+
+        distances = tf.math.abs(probe_embedding - gallery_embeddings)
+        scores = self.classifier(distances)
+        return {"scores": tf.reshape(scores, [-1])}
+
+    def _score(self, probe, gallery):
+        """Scores a probe image against a batch of gallery images."""
+
+        probe_embedding = embed_images(self.embedding, probe)
+        gallery_embeddings = embed_images(self.embedding, gallery)
+        return self._score_embeddings(probe_embedding, gallery_embeddings)
+
+
+class KerasScorer:
+    """
+    Scores a probe image against the gallery with the Keras siamese model.
+
+    Attributes:
+        model (tensorflow.keras.Model): The siamese model.
+    """
+
+    def __init__(self, model_path):
+        """Initializes the scorer by loading the siamese model.
+
+        Args:
+            model_path (str): File path of the siamese model.
+        """
+
+        self.model = load_siamese_model(model_path)
+        self._embedding, self._classifier = split_siamese_model(self.model)
+
+    def score(self, probe, gallery):
+        """Scores a probe image against every gallery image.
+
+        Args:
+            probe (ndarray): Preprocessed probe image.
+            gallery (ndarray): Batch of preprocessed gallery images.
+
+        Returns:
+            ndarray: Score between 0 and 1 for every gallery image.
+        """
+
+        if len(gallery) == 0:
+            return np.zeros((0,), np.float32)
+
+        probes = np.repeat(np.expand_dims(probe, axis=0), len(gallery), axis=0)
+        return np.reshape(self.model.predict([probes, gallery], verbose=0), [-1])
+
+    def embed(self, images):
+        """Creates the embeddings of a batch of preprocessed images.
+
+        Args:
+            images (ndarray): Batch of preprocessed images.
+
+        Returns:
+            ndarray: Embedding of every image.
+        """
+
+        images = tf.constant(np.asarray(images, np.float32))
+        return embed_images(self._embedding, images).numpy()
+
+    def score_embeddings(self, probe_embedding, gallery_embeddings):
+        """Scores a probe embedding against a batch of gallery embeddings.
+
+        Args:
+            probe_embedding (ndarray): Embedding of the probe image.
+            gallery_embeddings (ndarray): Embeddings of the gallery images.
+
+        Returns:
+            ndarray: Score between 0 and 1 for every gallery embedding.
+        """
+
+        distances = np.abs(np.reshape(probe_embedding, [1, -1]) - gallery_embeddings)
+        return np.reshape(self._classifier(distances).numpy(), [-1])
+
+
+class GraphScorer:
+    """
+    Scores a probe image against the gallery with an exported scoring graph.
+
+    Galleries are padded to the smallest exported bucket size that fits them, and
+    galleries larger than the biggest bucket are scored in chunks.
+
+    Attributes:
+        graph (AutoTrackable): The loaded SavedModel.
+        buckets (list): Gallery sizes that have a fixed scoring signature.
+    """
+
+    def __init__(self, graph_path):
+        """Initializes the scorer by loading the scoring graph.
+
+        Args:
+            graph_path (str): Folder of the exported SavedModel.
+        """
+
+        self.graph = tf.saved_model.load(graph_path)
+        self.buckets = [int(size) for size in self.graph.buckets.numpy()]
+
+    def score(self, probe, gallery):
+        """Scores a probe image against every gallery image.
+
+        Args:
+            probe (ndarray): Preprocessed probe image.
+            gallery (ndarray): Batch of preprocessed gallery images.
+
+        Returns:
+            ndarray: Score between 0 and 1 for every gallery image.
+        """
+
+        gallery = np.asarray(gallery, np.float32)
+
+        if len(gallery) == 0:
+            return np.zeros((0,), np.float32)
+
+        probe = tf.constant(np.expand_dims(probe, axis=0), tf.float32)
+        largest = max(self.buckets)
+
+        scores = []
+        for start in range(0, len(gallery), largest):
+            chunk = gallery[start : start + largest]
+            size = bucket_size(len(chunk), self.buckets)
+            padded = np.zeros((size,) + IMAGE_SHAPE, np.float32)
+            padded[: len(chunk)] = chunk
+
+            function = getattr(self.graph, f"score_{size}")
+            result = function(probe, tf.constant(padded))["scores"]
+            scores.append(result.numpy()[: len(chunk)])
+
+        return np.concatenate(scores)
+
+    def embed(self, images):
+        """Creates the embeddings of a batch of preprocessed images.
+
+        Args:
+            images (ndarray): Batch of preprocessed images.
+
+        Returns:
+            ndarray: Embedding of every image.
+        """
+
+        images = tf.constant(np.asarray(images, np.float32))
+        return self.graph.embed(images)["embeddings"].numpy()
+
+    def score_embeddings(self, probe_embedding, gallery_embeddings):
+        """Scores a probe embedding against a batch of gallery embeddings.
+
+        Args:
+            probe_embedding (ndarray): Embedding of the probe image.
+            gallery_embeddings (ndarray): Embeddings of the gallery images.
+
+        Returns:
+            ndarray: Score between 0 and 1 for every gallery embedding.
+        """
+
+        result = self.graph.score_embeddings(
+            tf.constant(np.reshape(probe_embedding, [1, -1]), tf.float32),
+            tf.constant(gallery_embeddings, tf.float32),
+        )
+        return result["scores"].numpy()
+
+
+def export_scoring_graph(model_path, graph_path, buckets, jit_compile=False):
+    """Exports the fused scoring graph of a siamese model as a SavedModel.
+
+    The path of the model the graph was built from is saved next to it, so
+    the graph isn't used after the app is switched to a different model.
+
+    Args:
+        model_path (str): File path of the siamese model.
+        graph_path (str): Folder the SavedModel is saved to.
+        buckets (list): Gallery sizes to create a fixed scoring signature for.
+        jit_compile (bool): If the functions are compiled with XLA.
+    """
+
+    module = ScoringModule(load_siamese_model(model_path), buckets, jit_compile)
+    tf.saved_model.save(module, graph_path, signatures=module.signatures())
+
+    with open(os.path.join(graph_path, "model_source.json"), "w") as source_file:
+        json.dump({"model_path": os.path.abspath(model_path)}, source_file)
+
+
+def graph_is_current(model_path, graph_path):
+    """Checks if an exported scoring graph exists and was built from a model.
+
+    Args:
+        model_path (str): File path of the siamese model.
+        graph_path (str): Folder of the exported SavedModel.
+
+    Returns:
+        bool: True if the scoring graph was built from the model and is newer than it.
+    """
+
+    saved_model = os.path.join(graph_path, "saved_model.pb")
+    source_path = os.path.join(graph_path, "model_source.json")
+
+    if not os.path.exists(saved_model) or not os.path.exists(source_path):
+        return False
+
+    with open(source_path, "r") as source_file:
+        source = json.load(source_file)
+
+    if source["model_path"] != os.path.abspath(model_path):
+        return False
+
+    return os.path.getmtime(saved_model) >= os.path.getmtime(model_path)
+
+
+def load_scorer(settings=None):
+    """Loads the scorer used for verification.
+
+    The exported scoring graph is used if it's enabled in the "scoring" settings
+    and is newer than the model, otherwise the Keras model is used.
+
+    Args:
+        settings (dict): Scoring settings, the saved "scoring" settings if None.
+
+    Returns:
+        GraphScorer or KerasScorer: The scorer.
+    """
+
+    if settings is None:
+        settings = load_settings("scoring")
+
+    if settings["use_graph"] and graph_is_current(
+        settings["model_path"], settings["graph_path"]
+    ):
+        return GraphScorer(settings["graph_path"])
+
+    return KerasScorer(settings["model_path"])
+
+
+def benchmark(model_path, graph_path, gallery_path, repeats):
+    """Compares the latency of the Keras model and the scoring graph.
+
+    Times the per-image Model.predict loop the app used before the scoring
+    graph, a batched Model.predict call and the exported scoring graph.
+
+    Args:
+        model_path (str): File path of the siamese model.
+        graph_path (str): Folder of the exported SavedModel.
+        gallery_path (str): Folder containing the gallery images.
+        repeats (int): Number of timed runs for each path.
+
+    Returns:
+        dict: Median latency in milliseconds for each path.
+    """
+
+    from face_id.preprocessing import preprocess
+
+    gallery = np.stack(
+        [
+            preprocess(os.path.join(gallery_path, name))
+            for name in sorted(os.listdir(gallery_path))
+        ]
+    )
+    probe = gallery[0]
+
+    keras_scorer = KerasScorer(model_path)
+    graph_scorer = GraphScorer(graph_path)
+
+    def keras_per_image():
+        for image in gallery:
+            keras_scorer.model.predict(
+                list(np.expand_dims([probe, image], axis=1)), verbose=0
+            )
+
+    paths = {
+        "keras_per_image": keras_per_image,
+        "keras_batched": lambda: keras_scorer.score(probe, gallery),
+        "graph": lambda: graph_scorer.score(probe, gallery),
+    }
+
+    results = {}
+    for name, function in paths.items():
+        function()
+        timings = []
+
+        for _ in range(repeats):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        results[name] = statistics.median(timings)
+        print(f"{name:16} {results[name]:9.2f} ms")
+
+    difference = np.max(
+        np.abs(keras_scorer.score(probe, gallery) - graph_scorer.score(probe, gallery))
+    )
+    print(f"Largest score difference: {difference:.6f}")
+
+    return results
+
+
+def main(argv=None):
+    """Runs the scoring graph command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    settings = load_settings("scoring")
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.scoring",
+        description="Export and benchmark the fused scoring graph.",
+    )
+    parser.add_argument("--model", default=settings["model_path"])
+    parser.add_argument("--graph", default=settings["graph_path"])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument(
+        "--buckets", type=int, nargs="+", default=settings["buckets"]
+    )
+    export_parser.add_argument(
+        "--xla", action="store_true", default=settings["jit_compile"]
+    )
+
+    bench_parser = subparsers.add_parser("bench")
+    bench_parser.add_argument(
+        "--gallery",
+        default=enrolled_folder(),
+    )
+    bench_parser.add_argument("--repeats", type=int, default=10)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_scoring_graph(args.model, args.graph, args.buckets, args.xla)
+        print(f"Exported scoring graph to {args.graph}")
+
+    else:
+        benchmark(args.model, args.graph, args.gallery, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import copy
+import json
+import os
+
+SETTINGS_PATH = "face_id/settings.json"
+
+DEFAULT_SETTINGS = {
+    "approval_cache": {
+        "ttl_seconds": 900,
+        "idle_seconds": 300,
+        "max_entries": 64,
+        "key_by": "name",
+        "per_user": False,
+        "per_pid": False,
+    },
+    "runtime": {
+        "onednn": False,
+        "intra_op_threads": 0,
+        "inter_op_threads": 0,
+        "xla_jit": False,
+    },
+    "scoring": {
+        "model_path": "face_id/siamesemodelv2.h5",
+        "graph_path": "face_id/scoring_graph",
+        "use_graph": True,
+        "buckets": [16, 32, 64],
+        "jit_compile": False,
+        "detection_threshold": 0.5,
+        "verification_threshold": 0.5,
+    },
+    "adaptive_gallery": {
+        "enabled": False,
+        "min_score": 0.9,
+        "min_verification": 0.9,
+        "max_templates": 60,
+        "min_interval_seconds": 60,
+        "keep_versions": 5,
+    },
+    "condensation": {
+        "enabled": False,
+        "prototypes": 10,
+        "method": "kmedoids",
+    },
+    "event_dispatcher": {
+        "debounce_seconds": 5,
+        "termination_timeout_seconds": 10,
+    },
+    "audit_log": {
+        "path": "face_id/audit/audit.jsonl",
+        "batch_size": 64,
+        "flush_interval_seconds": 1.0,
+        "fsync": "interval",
+        "fsync_interval_seconds": 5.0,
+        "max_bytes": 5242880,
+        "max_files": 10,
+        "queue_size": 10000,
+    },
+    "verification_queue": {
+        "timeout_seconds": 120,
+        "approve_all": True,
+    },
+    "model_manager": {
+        "idle_seconds": 0,
+        "check_interval_seconds": 30,
+        "warm_on_detection": True,
+    },
+    "cascade": {
+        "enabled": False,
+        "model_path": "face_id/siamesemodel_compact.h5",
+        "band": 0.15,
+    },
+    "enrollment": {
+        "workers": 4,
+    },
+    "multi_face": {
+        "enabled": False,
+        "policy": "any",
+        "scale_factor": 1.1,
+        "min_neighbors": 5,
+        "min_size": 60,
+        "margin": 0.2,
+    },
+    "monitor": {
+        "protected_path": "face_id/protected_data.json",
+        "scan_interval_seconds": 0,
+        "group_launches": True,
+    },
+    "enforcement": {
+        "mode": "terminate",
+        "freezer": "auto",
+        "cgroup_path": "/sys/fs/cgroup/face_id",
+        "hold_timeout_seconds": 120,
+    },
+    "shadow": {
+        "enabled": False,
+        "model_path": "face_id/siamesemodel_candidate.h5",
+        "report_path": "face_id/audit/shadow.jsonl",
+        "queue_size": 16,
+    },
+    "watchdog": {
+        "enabled": False,
+        "interval_ms": 10,
+        "stall_ms": 100,
+        "dump_stacks_ms": 1000,
+        "dump_path": "face_id/audit/stalls.log",
+    },
+    "governor": {
+        "enabled": False,
+        "ac_cpu_budget_percent": 20,
+        "battery_cpu_budget_percent": 5,
+        "min_fps": 5,
+        "max_fps": 30,
+        "min_scan_interval_seconds": 0.05,
+        "max_scan_interval_seconds": 1.0,
+        "battery_inference_threads": 2,
+        "boost_seconds": 15,
+        "check_interval_seconds": 2,
+        "power_supply_path": "/sys/class/power_supply",
+    },
+    "speculative": {
+        "enabled": False,
+        "margin": 0.1,
+        "max_age_seconds": 3,
+        "auto_accept": False,
+    },
+    "lifetime": {
+        "enabled": False,
+        "on_exit": "revoke",
+        "age_seconds": 30,
+        "fallback_interval_seconds": 1.0,
+    },
+}
+
+
+def load_settings(section):
+    """Loads the settings for one section of the app.
+
+    Starts from the default values of a section and replaces any of them
+    that are set in the "face_id/settings.json" file. The settings file is
+    optional, so the defaults are used if it doesn't exist.
+
+    Args:
+        section (str): Name of the settings section, such as "approval_cache".
+
+    Returns:
+        dict: Settings for the section.
+    """
+
+    settings = copy.deepcopy(DEFAULT_SETTINGS.get(section, {}))
+
+    if os.path.exists(SETTINGS_PATH) and os.stat(SETTINGS_PATH).st_size > 0:
+        with open(SETTINGS_PATH, "r") as open_file:
+            saved_settings = json.load(open_file)
+
+        settings.update(saved_settings.get(section, {}))
+
+    return settings
+
+
+def save_settings(section, values):
+    """Saves the settings of one section to the settings file.
+
+    Only the given section is replaced, other sections in the file are kept.
+    The file is written to a temporary path first and then moved into place
+    so a crash can't leave a half written settings file.
+
+    Args:
+        section (str): Name of the settings section.
+        values (dict): Settings to save for the section.
+    """
+
+    saved_settings = {}
+
+    if os.path.exists(SETTINGS_PATH) and os.stat(SETTINGS_PATH).st_size > 0:
+        with open(SETTINGS_PATH, "r") as open_file:
+            saved_settings = json.load(open_file)
+
+    saved_settings[section] = values
+
+    temp_path = SETTINGS_PATH + ".tmp"
+    with open(temp_path, "w") as save_file:
+        json.dump(saved_settings, save_file, indent=4)
+
+    os.replace(temp_path, SETTINGS_PATH)
@@ -0,0 +1,420 @@
+"""Shadow evaluation of a candidate siamese model on real verifications.
+
+When enabled, every verification is also scored by the candidate model on a
+background thread, after the production decision has been made, so the user
+never waits for it. Each comparison is saved as a json line with the score
+agreement, whether the decision flipped and the latency of both models:
+
+    python -m face_id.shadow summary
+    python -m face_id.shadow promote
+
+Promoting sets the candidate as the "scoring" model and turns shadow mode off.
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from face_id.condensation import weighted_verification
+from face_id.scoring import KerasScorer
+from face_id.settings import load_settings, save_settings
+
+
+class ShadowEvaluator:
+    """
+    Scores verifications with a candidate model off the critical path.
+
+    submit() only puts the probe on a queue, the worker thread loads the candidate
+    model when it's first needed, scores the probe against the gallery and compares
+    the result with the production decision. The production decision is never
+    changed. If the queue is full, probes are dropped and counted instead of slowing
+    down verification.
+
+    Attributes:
+        enabled (bool): If verifications are scored by the candidate model.
+        model_path (str): File path of the candidate siamese model.
+        report_path (str): File path of the json lines report.
+        queue_size (int): Largest number of probes waiting to be scored.
+    """
+
+    def __init__(
+        self,
+        enabled=False,
+        model_path="face_id/siamesemodel_candidate.h5",
+        report_path="face_id/audit/shadow.jsonl",
+        queue_size=16,
+    ):
+        """Initializes the shadow evaluator.
+
+        Args:
+            enabled (bool): If verifications are scored by the candidate model.
+            model_path (str): File path of the candidate siamese model.
+            report_path (str): File path of the json lines report.
+            queue_size (int): Largest number of probes waiting to be scored.
+        """
+
+        self.enabled = enabled
+        self.model_path = model_path
+        self.report_path = report_path
+        self.queue_size = queue_size
+
+        self._scorer = None
+        self._gallery = None
+        self._gallery_embeddings = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = empty_stats()
+
+    @classmethod
+    def from_settings(cls):
+        """Creates a shadow evaluator from the "shadow" settings section.
+
+        Returns:
+            ShadowEvaluator: Evaluator using the saved or default settings.
+        """
+
+        return cls(**load_settings("shadow"))
+
+    def submit(
+        self,
+        input_image,
+        gallery,
+        results,
+        verified,
+        production_ms,
+        detection_threshold,
+        verification_threshold,
+        app_name="",
+        stage="full",
+    ):
+        """Queues a verification to be scored by the candidate model.
+
+        Args:
+            input_image (ndarray): Preprocessed webcam image.
+            gallery (ndarray): Batch of preprocessed face id images.
+            results (ndarray): Production scores of the webcam image against every face id image,
+                None if it was scored against prototypes or decided by the cascade's cheap model.
+            verified (bool): Production decision.
+            production_ms (float): Latency of the production verification.
+            detection_threshold (float): Score a template needs to be counted as a detection.
+            verification_threshold (float): Share of detections needed to be verified.
+            app_name (str): Name of the app being verified for.
+            stage (str): "full", "cheap" or "speculative", the stage that made the production decision.
+
+        Returns:
+            bool: True if the probe was queued, False if shadow mode is off or the queue is full.
+        """
+
+        if not self.enabled or len(gallery) == 0:
+            return False
+
+        probe = {
+            "input_image": input_image,
+            "gallery": gallery,
+            "results": None if results is None else np.reshape(results, [-1]),
+            "verified": bool(verified),
+            "production_ms": production_ms,
+            "detection_threshold": detection_threshold,
+            "verification_threshold": verification_threshold,
+            "app": app_name,
+            "stage": stage,
+        }
+
+        try:
+            self._queue.put_nowait(probe)
+
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+
+            return False
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="shadow-evaluator", daemon=True
+                )
+                self._thread.start()
+
+        return True
+
+    def evaluate(self, probe):
+        """Scores a probe with the candidate model and compares it with production.
+
+        Args:
+            probe (dict): Probe queued by submit().
+
+        Returns:
+            dict: Report record of the comparison.
+        """
+
+        start = time.perf_counter()
+
+        if self._scorer is None:
+            self._scorer = KerasScorer(self.model_path)
+
+        if probe["gallery"] is not self._gallery:
+            self._gallery_embeddings = self._scorer.embed(probe["gallery"])
+            self._gallery = probe["gallery"]
+
+        probe_embedding = self._scorer.embed(np.expand_dims(probe["input_image"], axis=0))
+        results = self._scorer.score_embeddings(probe_embedding, self._gallery_embeddings)
+
+        weights = np.ones(len(results), np.float32)
+        verified = bool(
+            weighted_verification(results, weights, probe["detection_threshold"])
+            > probe["verification_threshold"]
+        )
+        candidate_ms = (time.perf_counter() - start) * 1000
+
+        record = {
+            "time": time.time(),
+            "app": probe["app"],
+            "stage": probe["stage"],
+            "production_verified": probe["verified"],
+            "candidate_verified": verified,
+            "flipped": verified != probe["verified"],
+            "production_ms": probe["production_ms"],
+            "candidate_ms": candidate_ms,
+            "candidate_mean_score": float(np.mean(results)),
+            "production_mean_score": None,
+            "score_diff": None,
+        }
+
+        if probe["results"] is not None and len(probe["results"]) == len(results):
+            record["production_mean_score"] = float(np.mean(probe["results"]))
+            record["score_diff"] = float(np.mean(np.abs(probe["results"] - results)))
+
+        return record
+
+    def record(self, record):
+        """Counts a comparison and appends it to the report.
+
+        Args:
+            record (dict): Report record returned by evaluate().
+        """
+
+        with self._lock:
+            count(self._stats, record)
+
+        os.makedirs(os.path.dirname(self.report_path) or ".", exist_ok=True)
+
+        with open(self.report_path, "a") as report_file:
+            report_file.write(json.dumps(record) + "\n")
+
+    def stats(self):
+        """Returns the agreement, decision flips and latency of both models.
+
+        Returns:
+            dict: The evaluator's counters.
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats["flips"] = dict(self._stats["flips"])
+
+        return summarize(stats)
+
+    def report(self):
+        """Prints the agreement, decision flips and latency of both models."""
+
+        if not self.enabled:
+            return
+
+        print_summary(self.stats())
+
+    def _run(self):
+        """Scores queued probes until the process exits."""
+
+        while True:
+            probe = self._queue.get()
+
+            try:
+                self.record(self.evaluate(probe))
+
+            except Exception as error:
+                with self._lock:
+                    self._stats["errors"] += 1
+
+                print(f"Shadow evaluation failed: {error}")
+
+
+def empty_stats():
+    """Creates the counters of a shadow evaluation.
+
+    Returns:
+        dict: Counters of probes, agreements, flips, score differences and latency.
+    """
+
+    return {
+        "probes": 0,
+        "agreed": 0,
+        "flips": {"accept_to_reject": 0, "reject_to_accept": 0},
+        "score_diff": 0.0,
+        "scored_templates": 0,
+        "production_ms": 0.0,
+        "candidate_ms": 0.0,
+        "dropped": 0,
+        "errors": 0,
+    }
+
+
+def count(stats, record):
+    """Adds one comparison to the counters of a shadow evaluation.
+
+    Args:
+        stats (dict): Counters returned by empty_stats.
+        record (dict): Report record of the comparison.
+    """
+
+    stats["probes"] += 1
+    stats["production_ms"] += record["production_ms"]
+    stats["candidate_ms"] += record["candidate_ms"]
+
+    if not record["flipped"]:
+        stats["agreed"] += 1
+
+    elif record["production_verified"]:
+        stats["flips"]["accept_to_reject"] += 1
+
+    else:
+        stats["flips"]["reject_to_accept"] += 1
+
+    if record["score_diff"] is not None:
+        stats["score_diff"] += record["score_diff"]
+        stats["scored_templates"] += 1
+
+
+def summarize(stats):
+    """Adds rates and means to the counters of a shadow evaluation.
+
+    Args:
+        stats (dict): Counters of probes, agreements, flips, score differences and latency.
+
+    Returns:
+        dict: The counters with the agreement rate, mean score difference and mean latencies.
+    """
+
+    probes = stats["probes"]
+    stats["agreement"] = stats["agreed"] / probes if probes else 0.0
+    stats["mean_score_diff"] = (
+        stats["score_diff"] / stats["scored_templates"]
+        if stats["scored_templates"]
+        else None
+    )
+    stats["mean_production_ms"] = stats["production_ms"] / probes if probes else 0.0
+    stats["mean_candidate_ms"] = stats["candidate_ms"] / probes if probes else 0.0
+    return stats
+
+
+def load_report(report_path):
+    """Adds up the comparisons saved in a shadow report.
+
+    Args:
+        report_path (str): File path of the json lines report.
+
+    Returns:
+        dict: Summary of the saved comparisons.
+    """
+
+    stats = empty_stats()
+
+    if not os.path.exists(report_path):
+        return summarize(stats)
+
+    with open(report_path, "r") as report_file:
+        for line in report_file:
+            if line.strip():
+                count(stats, json.loads(line))
+
+    return summarize(stats)
+
+
+def print_summary(stats):
+    """Prints the summary of a shadow evaluation.
+
+    Args:
+        stats (dict): Summary returned by ShadowEvaluator.stats or load_report.
+    """
+
+    mean_diff = (
+        f"{stats['mean_score_diff']:.3f}" if stats["mean_score_diff"] is not None else "-"
+    )
+    print(
+        f"Shadow: {stats['probes']} probes, {stats['agreement']:.1%} agreement, "
+        f"{stats['flips']['accept_to_reject']} accept to reject and "
+        f"{stats['flips']['reject_to_accept']} reject to accept flips, "
+        f"mean score difference {mean_diff}, "
+        f"{stats['mean_production_ms']:.1f} ms production / "
+        f"{stats['mean_candidate_ms']:.1f} ms candidate"
+    )
+
+    if stats["dropped"] or stats["errors"]:
+        print(f"Shadow: {stats['dropped']} dropped, {stats['errors']} failed")
+
+
+def promote():
+    """Makes the candidate model the production model.
+
+    The candidate's path is saved as the "scoring" model path and shadow mode
+    is turned off. The scoring graph is exported from the old model, so it's
+    out of date and the Keras model is used until it's exported again.
+
+    Returns:
+        str: File path of the promoted model.
+    """
+
+    shadow = load_settings("shadow")
+
+    if not os.path.exists(shadow["model_path"]):
+        raise FileNotFoundError(shadow["model_path"])
+
+    scoring = load_settings("scoring")
+    scoring["model_path"] = shadow["model_path"]
+    save_settings("scoring", scoring)
+
+    shadow["enabled"] = False
+    save_settings("shadow", shadow)
+
+    return scoring["model_path"]
+
+
+def main(argv=None):
+    """Runs the shadow evaluation command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.shadow",
+        description="Summarize the shadow evaluation of a candidate model or promote it.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = subparsers.add_parser("summary")
+    summary_parser.add_argument("--report", default=load_settings("shadow")["report_path"])
+
+    subparsers.add_parser("promote")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "summary":
+        print_summary(load_report(args.report))
+
+    elif args.command == "promote":
+        model_path = promote()
+        print(
+            f"Promoted {model_path}, run python -m face_id.scoring export "
+            "to rebuild the scoring graph"
+        )
+
+
+if __name__ == "__main__":
+    main()
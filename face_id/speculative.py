@@ -0,0 +1,328 @@
+import threading
+import time
+
+import numpy as np
+
+from face_id.audit_log import audit
+from face_id.condensation import weighted_verification
+from face_id.preprocessing import preprocess_frame
+from face_id.settings import load_settings
+
+
+class SpeculativeVerifier:
+    """
+    Starts verifying webcam frames in the background as soon as a protected app is detected.
+
+    When a verify window opens for a detection, a worker thread loads the model, runs
+    one warm-up inference and then scores the newest webcam frame over and over while
+    the window is shown, older frames are skipped. Once a frame is verified with a
+    margin above the verification threshold, the decision is kept for a short time, so
+    pressing verify can use it right away, or it's accepted without pressing verify if
+    auto accept is on. Only confident verifications are decided early, anything else is
+    left to the normal verification. The time from detection to the first decision is
+    recorded for every session.
+
+    Attributes:
+        enabled (bool): If frames are verified in the background.
+        margin (float): Share of detections above the verification threshold needed to decide early.
+        max_age_seconds (float): Seconds an early decision can be used for.
+        auto_accept (bool): If an early decision verifies the user without pressing verify.
+    """
+
+    def __init__(
+        self, enabled=False, margin=0.1, max_age_seconds=3, auto_accept=False
+    ):
+        """Initializes the speculative verifier.
+
+        Args:
+            enabled (bool): If frames are verified in the background.
+            margin (float): Share of detections above the verification threshold needed to decide early.
+            max_age_seconds (float): Seconds an early decision can be used for.
+            auto_accept (bool): If an early decision verifies the user without pressing verify.
+        """
+
+        self.enabled = enabled
+        self.margin = margin
+        self.max_age_seconds = max_age_seconds
+        self.auto_accept = auto_accept
+
+        self._verifier = None
+        self._session = 0
+        self._detected_at = None
+        self._frame = None
+        self._decision = None
+        self._condition = threading.Condition()
+        self._stats = {
+            "sessions": 0,
+            "frames": 0,
+            "early_decisions": 0,
+            "used": 0,
+            "ready_ms": [],
+            "decision_ms": {"speculative": [], "verify": []},
+        }
+
+    @classmethod
+    def from_settings(cls):
+        """Creates a speculative verifier from the "speculative" settings section.
+
+        Returns:
+            SpeculativeVerifier: Verifier using the saved or default settings.
+        """
+
+        return cls(**load_settings("speculative"))
+
+    def start(self, verifier, detected_at=None):
+        """Starts verifying frames in the background for a new verify window.
+
+        Multiple face verification needs the full frame and the user to be in
+        view, so nothing is started when it's enabled.
+
+        Args:
+            verifier (FaceVerifier): Verifier of the verify window, used to score frames.
+            detected_at (float): Monotonic time the protected app was detected, now if None.
+        """
+
+        if not self.enabled or verifier.multi_face["enabled"]:
+            return
+
+        with self._condition:
+            self._session += 1
+            self._verifier = verifier
+            self._detected_at = (
+                detected_at if detected_at is not None else time.monotonic()
+            )
+            self._frame = None
+            self._decision = None
+            self._stats["sessions"] += 1
+            session = self._session
+            self._condition.notify_all()
+
+        threading.Thread(
+            target=self._run, args=(session,), name="speculative-verify", daemon=True
+        ).start()
+
+    def stop(self):
+        """Stops verifying frames for the current verify window."""
+
+        with self._condition:
+            self._session += 1
+            self._verifier = None
+            self._frame = None
+            self._decision = None
+            self._condition.notify_all()
+
+    def submit(self, cv_image):
+        """Gives the background verification the newest webcam image.
+
+        Args:
+            cv_image (ndarray): Cropped OpenCV image of the user's webcam.
+        """
+
+        with self._condition:
+            if self._verifier is None:
+                return
+
+            self._frame = cv_image
+            self._condition.notify_all()
+
+    def ready(self):
+        """Checks if there is an early decision that isn't too old.
+
+        Returns:
+            bool: True if pressing verify would use an early decision.
+        """
+
+        with self._condition:
+            return self._decision is not None and (
+                time.monotonic() - self._decision["at"] <= self.max_age_seconds
+            )
+
+    def take(self):
+        """Takes the early decision if there is one that isn't too old.
+
+        Returns:
+            dict: The early decision, or None if the normal verification has to be used.
+        """
+
+        with self._condition:
+            decision = self._decision
+            self._decision = None
+            self._condition.notify_all()
+
+        if decision is None or time.monotonic() - decision["at"] > self.max_age_seconds:
+            return None
+
+        with self._condition:
+            self._stats["used"] += 1
+
+        return decision
+
+    def finish(self, verified, stage):
+        """Records the time from detection to the first decision of a session.
+
+        Args:
+            verified (bool): The decision.
+            stage (str): "speculative" if it was decided early, or "verify" if it wasn't.
+        """
+
+        with self._condition:
+            if self._detected_at is None:
+                return
+
+            decision_ms = (time.monotonic() - self._detected_at) * 1000
+            self._detected_at = None
+            self._stats["decision_ms"][stage].append(decision_ms)
+
+        audit(
+            "time_to_decision",
+            verified=verified,
+            stage=stage,
+            decision_ms=decision_ms,
+        )
+
+    def stats(self):
+        """Returns the number of sessions and early decisions, and the time to decision.
+
+        Returns:
+            dict: The verifier's counters and mean and median times from detection.
+        """
+
+        with self._condition:
+            stats = {
+                "sessions": self._stats["sessions"],
+                "frames": self._stats["frames"],
+                "early_decisions": self._stats["early_decisions"],
+                "used": self._stats["used"],
+            }
+            ready_ms = list(self._stats["ready_ms"])
+            decision_ms = {
+                stage: list(values)
+                for stage, values in self._stats["decision_ms"].items()
+            }
+
+        every_decision = decision_ms["speculative"] + decision_ms["verify"]
+        stats["median_ready_ms"] = float(np.median(ready_ms)) if ready_ms else None
+        stats["median_decision_ms"] = (
+            float(np.median(every_decision)) if every_decision else None
+        )
+
+        for stage, values in decision_ms.items():
+            stats[f"{stage}_decisions"] = len(values)
+            stats[f"mean_{stage}_decision_ms"] = (
+                float(np.mean(values)) if values else None
+            )
+
+        return stats
+
+    def report(self):
+        """Prints the number of early decisions and the time from detection to decision."""
+
+        if not self.enabled:
+            return
+
+        stats = self.stats()
+        median_ready = (
+            f"{stats['median_ready_ms']:.0f} ms"
+            if stats["median_ready_ms"] is not None
+            else "-"
+        )
+        median_decision = (
+            f"{stats['median_decision_ms']:.0f} ms"
+            if stats["median_decision_ms"] is not None
+            else "-"
+        )
+        print(
+            f"Speculative verification: {stats['sessions']} sessions, "
+            f"{stats['frames']} frames, "
+            f"{stats['early_decisions']} early decisions ({stats['used']} used), "
+            f"median {median_ready} from detection to an early decision, "
+            f"median {median_decision} from detection to a decision"
+        )
+
+    def _run(self, session):
+        """Warms up the model and verifies the newest frame until the session ends.
+
+        Args:
+            session (int): Session the thread was started for.
+        """
+
+        with self._condition:
+            verifier = self._verifier
+
+        if verifier is None:
+            return
+
+        gallery = verifier.load_gallery()
+
+        if len(gallery) == 0:
+            return
+
+        # The warm-up runs the model directly, since scoring a slice of the
+        # face id images through the verifier would condense and save
+        # prototypes of only that slice.
+        blank = np.zeros(gallery.shape[1:], np.float32)
+
+        with verifier.model_manager.use() as scorer:
+            if verifier.condensation["enabled"]:
+                scorer.embed(np.expand_dims(blank, axis=0))
+
+            else:
+                scorer.score(blank, gallery[:1])
+
+        while True:
+            with self._condition:
+                while self._session == session and (
+                    self._frame is None or self._decision is not None
+                ):
+                    self._condition.wait(self.max_age_seconds)
+
+                    if self._decision is not None and (
+                        time.monotonic() - self._decision["at"] > self.max_age_seconds
+                    ):
+                        self._decision = None
+
+                if self._session != session:
+                    return
+
+                cv_image = self._frame
+                self._frame = None
+                self._stats["frames"] += 1
+
+            results, weights = verifier.score(preprocess_frame(cv_image), gallery)
+            results = np.reshape(results, [-1])
+            verification = weighted_verification(
+                results,
+                weights if weights is not None else np.ones(len(results), np.float32),
+                verifier.detection_threshold,
+            )
+
+            if verification <= verifier.verification_threshold + self.margin:
+                continue
+
+            with self._condition:
+                if self._session != session:
+                    return
+
+                self._decision = {
+                    "at": time.monotonic(),
+                    "verification": verification,
+                    "results": results,
+                    "weights": weights,
+                    "image": cv_image,
+                }
+                self._stats["early_decisions"] += 1
+                ready_ms = None
+
+                if self._detected_at is not None:
+                    ready_ms = (time.monotonic() - self._detected_at) * 1000
+                    self._stats["ready_ms"].append(ready_ms)
+
+            audit(
+                "speculative_decision",
+                app=verifier.app_name,
+                verification=verification,
+                ready_ms=ready_ms,
+            )
+
+            if self.auto_accept:
+                verifier.speculative_signal.emit()
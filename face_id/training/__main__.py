@@ -0,0 +1,105 @@
+import argparse
+import os
+
+from face_id.settings import load_settings
+from face_id.training.data import (
+    make_input_pipeline,
+    make_pair_dataset,
+    make_shard_pair_dataset,
+    split_dataset,
+)
+from face_id.training.trainer import Trainer, enable_mixed_precision
+
+
+def main(argv=None):
+    """Runs the training command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.training",
+        description="Train the siamese model.",
+    )
+    parser.add_argument("--data", default="data")
+    parser.add_argument(
+        "--shards",
+        default="",
+        help="folder saved by face_id.training.dataset_builder, used instead of --data",
+    )
+    parser.add_argument("--pairs-per-class", type=int, default=300)
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--learning-rate", type=float, default=1e-4)
+    parser.add_argument(
+        "--embedding-size",
+        type=int,
+        default=0,
+        help="width of a compact embedding, 0 for the full 4096 wide one",
+    )
+    parser.add_argument("--checkpoint-dir", default="./training_checkpoints")
+    parser.add_argument("--checkpoint-every", type=int, default=10)
+    parser.add_argument(
+        "--cache", default="", help="file to cache decoded images to, memory if empty"
+    )
+    parser.add_argument("--mixed-precision", action="store_true")
+    parser.add_argument(
+        "--output",
+        default=load_settings("shadow")["model_path"],
+        help="file the model is saved to, the shadow candidate by default",
+    )
+    parser.add_argument(
+        "--overwrite-production",
+        action="store_true",
+        help="save over the model the app loads instead of the candidate",
+    )
+    parser.add_argument("--report", default="training_report.json")
+
+    args = parser.parse_args(argv)
+    production_path = load_settings("scoring")["model_path"]
+
+    if os.path.abspath(args.output) == os.path.abspath(production_path):
+        if not args.overwrite_production:
+            parser.error(
+                f"{args.output} is the model the app loads, "
+                "add --overwrite-production to replace it"
+            )
+
+    elif args.overwrite_production:
+        args.output = production_path
+
+    if args.mixed_precision:
+        enable_mixed_precision()
+
+    pairs_per_class = args.pairs_per_class if args.pairs_per_class > 0 else None
+
+    if args.shards:
+        data = make_shard_pair_dataset(args.shards, pairs_per_class)
+
+    else:
+        data = make_pair_dataset(args.data, pairs_per_class)
+
+    train_data, test_data = split_dataset(data, cache_path=args.cache)
+
+    trainer = Trainer(args.checkpoint_dir, args.embedding_size, args.learning_rate)
+    trainer.train(
+        make_input_pipeline(train_data, args.batch_size),
+        args.epochs,
+        args.checkpoint_every,
+    )
+    trainer.throughput_report(args.report)
+
+    print(trainer.evaluate(make_input_pipeline(test_data, args.batch_size, False)))
+
+    trainer.model.save(args.output)
+    print(f"Saved model to {args.output}")
+
+    if args.output != production_path:
+        print(
+            "Compare it in shadow mode, then run python -m face_id.shadow promote to use it"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import glob
+import os
+import random
+
+from face_id import runtime
+
+runtime.apply_environment()
+
+import tensorflow as tf
+
+runtime.configure_tensorflow(tf)
+
+from face_id.preprocessing import preprocess
+from face_id.training.dataset_builder import iterate_images, load_manifest
+
+
+def list_images(data_path, folder, limit=None):
+    """Lists the jpeg images in one of the training data folders.
+
+    Args:
+        data_path (str): Folder with "anchor", "positive" and "negative" image folders.
+        folder (str): Name of the image folder.
+        limit (int): Largest number of images to list, every image if None.
+
+    Returns:
+        list: Sorted file paths of the images.
+    """
+
+    paths = sorted(glob.glob(os.path.join(data_path, folder, "*.jpg")))
+    return paths[:limit] if limit else paths
+
+
+def preprocess_twin(input_image, validation_image, label):
+    """Preprocesses both images of a labeled pair.
+
+    Args:
+        input_image (Tensor): File path of the input image.
+        validation_image (Tensor): File path of the validation image.
+        label (Tensor): 1 for a matching pair and 0 for a different person.
+
+    Returns:
+        tuple: The preprocessed images and the label.
+    """
+
+    return (preprocess(input_image), preprocess(validation_image), label)
+
+
+def make_pair_dataset(data_path, pairs_per_class=300, seed=42):
+    """Creates a labeled dataset of anchor/positive and anchor/negative image pairs.
+
+    The file paths of the pairs are shuffled in a fixed order before any image
+    is decoded, so positive and negative pairs are mixed without a shuffle
+    buffer. Images are decoded with parallel calls to preprocess_twin.
+
+    Args:
+        data_path (str): Folder with "anchor", "positive" and "negative" image folders.
+        pairs_per_class (int): Largest number of positive and negative pairs, every pair if None.
+        seed (int): Seed of the pair order.
+
+    Returns:
+        tf.data.Dataset: Dataset of (input image, validation image, label) tuples.
+    """
+
+    anchors = list_images(data_path, "anchor", pairs_per_class)
+    positives = list_images(data_path, "positive", pairs_per_class)
+    negatives = list_images(data_path, "negative", pairs_per_class)
+
+    positive_count = min(len(anchors), len(positives))
+    negative_count = min(len(anchors), len(negatives))
+
+    inputs = anchors[:positive_count] + anchors[:negative_count]
+    validations = positives[:positive_count] + negatives[:negative_count]
+    labels = [1.0] * positive_count + [0.0] * negative_count
+
+    order = list(range(len(labels)))
+    random.Random(seed).shuffle(order)
+    inputs = [inputs[idx] for idx in order]
+    validations = [validations[idx] for idx in order]
+    labels = [labels[idx] for idx in order]
+
+    data = tf.data.Dataset.from_tensor_slices((inputs, validations, labels))
+    return data.map(preprocess_twin, num_parallel_calls=tf.data.AUTOTUNE)
+
+
+def make_shard_pair_dataset(shard_path, pairs_per_class=300, seed=42):
+    """Creates a labeled dataset of image pairs from a sharded dataset.
+
+    Streams the pre-resized images saved by the dataset builder instead of
+    decoding jpegs, and only scales them to values between 0 and 1. Positive
+    and negative pairs are interleaved in a fixed random order.
+
+    Args:
+        shard_path (str): Folder of a dataset saved by face_id.training.dataset_builder.
+        pairs_per_class (int): Largest number of positive and negative pairs, every pair if None.
+        seed (int): Seed of the interleaving order.
+
+    Returns:
+        tf.data.Dataset: Dataset of (input image, validation image, label) tuples.
+    """
+
+    def pairs(validation_class, label):
+        def generator():
+            anchors = iterate_images(shard_path, "anchor", pairs_per_class)
+            validations = iterate_images(shard_path, validation_class, pairs_per_class)
+
+            for anchor, validation in zip(anchors, validations):
+                yield anchor, validation, label
+
+        return tf.data.Dataset.from_generator(
+            generator,
+            output_signature=(
+                tf.TensorSpec((100, 100, 3), tf.uint8),
+                tf.TensorSpec((100, 100, 3), tf.uint8),
+                tf.TensorSpec((), tf.float32),
+            ),
+        )
+
+    data = tf.data.Dataset.sample_from_datasets(
+        [pairs("positive", 1.0), pairs("negative", 0.0)],
+        seed=seed,
+        stop_on_empty_dataset=False,
+    )
+    data = data.map(
+        lambda input_image, validation_image, label: (
+            tf.cast(input_image, tf.float32) / 255.0,
+            tf.cast(validation_image, tf.float32) / 255.0,
+            label,
+        ),
+        num_parallel_calls=tf.data.AUTOTUNE,
+    )
+
+    manifest = load_manifest(shard_path)
+    anchor_count = len(manifest["anchor"]["hashes"])
+    count = sum(
+        min(anchor_count, len(manifest[name]["hashes"]), pairs_per_class or anchor_count)
+        for name in ("positive", "negative")
+    )
+    return data.apply(tf.data.experimental.assert_cardinality(count))
+
+
+def split_dataset(data, train_share=0.7, seed=42, cache_path=""):
+    """Caches a dataset, then splits it into training and testing data.
+
+    Each pair goes to the training or testing data by a hash of its position
+    and the seed, so the split is the same on every epoch and the two never
+    overlap, without holding the dataset in a shuffle buffer. The datasets are
+    already in a mixed order, and training data is reshuffled with a bounded
+    buffer by make_input_pipeline.
+
+    Args:
+        data (tf.data.Dataset): Dataset to split.
+        train_share (float): Share of the data used for training.
+        seed (int): Seed of the split.
+        cache_path (str): File the decoded images are cached to, memory is used if empty.
+
+    Returns:
+        tuple: The training and testing datasets.
+    """
+
+    buckets = 1000
+    train_buckets = round(buckets * train_share)
+    data = data.cache(cache_path).enumerate()
+
+    def is_train(index, pair):
+        bucket = tf.strings.to_hash_bucket_fast(
+            tf.strings.as_string(index) + f"-{seed}", buckets
+        )
+        return bucket < train_buckets
+
+    def drop_index(index, pair):
+        return pair
+
+    train_data = data.filter(is_train).map(drop_index)
+    test_data = data.filter(
+        lambda index, pair: tf.logical_not(is_train(index, pair))
+    ).map(drop_index)
+    return train_data, test_data
+
+
+def make_input_pipeline(data, batch_size=16, shuffle=True):
+    """Batches and prefetches a dataset for training or evaluation.
+
+    Args:
+        data (tf.data.Dataset): Dataset of image pairs and labels.
+        batch_size (int): Number of pairs in each batch.
+        shuffle (bool): If the pairs are reshuffled every epoch.
+
+    Returns:
+        tf.data.Dataset: The batched dataset.
+    """
+
+    if shuffle:
+        data = data.shuffle(1024)
+
+    return data.batch(batch_size).prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,240 @@
+"""Offline builder for sharded, preprocessed training images.
+
+Decodes and resizes the anchor, positive and negative images once with a process
+pool and saves them as uint8 .npy shards, so training and evaluation can stream
+pre-resized images instead of decoding every jpeg on every epoch:
+
+    python -m face_id.training.dataset_builder --data data --output data/shards
+
+Images are deduplicated by a hash of their file contents, and running the
+builder again only appends the images that aren't in the shards yet.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+CLASSES = ("anchor", "positive", "negative")
+IMAGE_SIZE = (100, 100)
+MANIFEST_NAME = "manifest.json"
+
+
+def load_image(file_path):
+    """Hashes, decodes and resizes one image.
+
+    Runs in a worker process. The image is converted to RGB so it matches
+    images decoded by TensorFlow, and kept as uint8 to save disk space.
+
+    Args:
+        file_path (str): File path of a jpeg image.
+
+    Returns:
+        tuple: The sha256 hash of the file and the resized image, or None if it can't be decoded.
+    """
+
+    with open(file_path, "rb") as image_file:
+        contents = image_file.read()
+
+    content_hash = hashlib.sha256(contents).hexdigest()
+    image = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+
+    if image is None:
+        return content_hash, None
+
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    image = cv2.resize(image, IMAGE_SIZE, interpolation=cv2.INTER_LINEAR)
+    return content_hash, image
+
+
+def load_manifest(output_path):
+    """Loads the manifest of a sharded dataset.
+
+    Args:
+        output_path (str): Folder of the sharded dataset.
+
+    Returns:
+        dict: Shard file names and image hashes of every class.
+    """
+
+    manifest_path = os.path.join(output_path, MANIFEST_NAME)
+
+    if not os.path.exists(manifest_path):
+        return {name: {"shards": [], "hashes": []} for name in CLASSES}
+
+    with open(manifest_path, "r") as manifest_file:
+        return json.load(manifest_file)
+
+
+def save_manifest(output_path, manifest):
+    """Saves the manifest of a sharded dataset without leaving a partial file.
+
+    Args:
+        output_path (str): Folder of the sharded dataset.
+        manifest (dict): Shard file names and image hashes of every class.
+    """
+
+    manifest_path = os.path.join(output_path, MANIFEST_NAME)
+    temp_path = manifest_path + ".tmp"
+
+    with open(temp_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+        manifest_file.flush()
+        os.fsync(manifest_file.fileno())
+
+    os.replace(temp_path, manifest_path)
+
+
+def save_shard(output_path, file_name, images):
+    """Saves a shard of images without leaving a partial file.
+
+    Args:
+        output_path (str): Folder of the sharded dataset.
+        file_name (str): File name of the shard.
+        images (list): Resized uint8 images.
+    """
+
+    shard_path = os.path.join(output_path, file_name)
+    temp_path = shard_path + ".tmp"
+
+    with open(temp_path, "wb") as shard_file:
+        np.save(shard_file, np.stack(images))
+        shard_file.flush()
+        os.fsync(shard_file.fileno())
+
+    os.replace(temp_path, shard_path)
+
+
+def build_dataset(data_path, output_path, shard_size=1024, workers=None):
+    """Preprocesses new images into shards and updates the manifest.
+
+    Images whose contents are already in the dataset, or appear more than
+    once, are skipped. Images are decoded one shard's worth of files at a time
+    and each shard is saved as soon as it's full, so at most about two shards
+    of images are held in memory. New shards are only added to the manifest
+    once every shard of the run has been saved.
+
+    Args:
+        data_path (str): Folder with "anchor", "positive" and "negative" image folders.
+        output_path (str): Folder the shards and manifest are saved to.
+        shard_size (int): Largest number of images in one shard.
+        workers (int): Number of worker processes, the number of CPUs if None.
+
+    Returns:
+        dict: Number of images added, duplicates skipped and images that failed to decode per class.
+    """
+
+    os.makedirs(output_path, exist_ok=True)
+    manifest = load_manifest(output_path)
+    summary = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for name in CLASSES:
+            known_hashes = set(manifest[name]["hashes"])
+            file_paths = sorted(glob.glob(os.path.join(data_path, name, "*.jpg")))
+
+            new_hashes = []
+            new_shards = []
+            pending = []
+            added = 0
+            duplicates = 0
+            failed = 0
+
+            for start in range(0, len(file_paths), shard_size):
+                for content_hash, image in executor.map(
+                    load_image, file_paths[start : start + shard_size], chunksize=32
+                ):
+                    if content_hash in known_hashes:
+                        duplicates += 1
+
+                    elif image is None:
+                        failed += 1
+
+                    else:
+                        known_hashes.add(content_hash)
+                        new_hashes.append(content_hash)
+                        pending.append(image)
+
+                last = start + shard_size >= len(file_paths)
+
+                while len(pending) >= shard_size or (last and len(pending) > 0):
+                    shard_index = len(manifest[name]["shards"]) + len(new_shards)
+                    file_name = f"{name}-{shard_index:05d}.npy"
+                    save_shard(output_path, file_name, pending[:shard_size])
+                    new_shards.append(file_name)
+                    added += len(pending[:shard_size])
+                    pending = pending[shard_size:]
+
+            manifest[name]["shards"].extend(new_shards)
+            manifest[name]["hashes"].extend(new_hashes)
+            summary[name] = {
+                "added": added,
+                "duplicates": duplicates,
+                "failed": failed,
+                "total": len(manifest[name]["hashes"]),
+            }
+            print(
+                f"{name}: added {added}, skipped {duplicates} duplicates, "
+                f"{failed} failed, {len(manifest[name]['hashes'])} total"
+            )
+
+    save_manifest(output_path, manifest)
+    return summary
+
+
+def iterate_images(output_path, name, limit=None):
+    """Reads the images of one class from its shards.
+
+    Shards are memory mapped, so images are read from disk as they're used.
+
+    Args:
+        output_path (str): Folder of the sharded dataset.
+        name (str): Name of the class, such as "anchor".
+        limit (int): Largest number of images to read, every image if None.
+
+    Yields:
+        ndarray: A resized uint8 image.
+    """
+
+    manifest = load_manifest(output_path)
+    count = 0
+
+    for file_name in manifest[name]["shards"]:
+        shard = np.load(os.path.join(output_path, file_name), mmap_mode="r")
+
+        for image in shard:
+            if limit is not None and count >= limit:
+                return
+
+            yield np.asarray(image)
+            count += 1
+
+
+def main(argv=None):
+    """Runs the dataset builder command line tool.
+
+    Args:
+        argv (list): Command line arguments, sys.argv is used if None.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m face_id.training.dataset_builder",
+        description="Preprocess training images into sharded .npy files.",
+    )
+    parser.add_argument("--data", default="data")
+    parser.add_argument("--output", default=os.path.join("data", "shards"))
+    parser.add_argument("--shard-size", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=None)
+
+    args = parser.parse_args(argv)
+    build_dataset(args.data, args.output, args.shard_size, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import json
+import time
+
+from face_id import runtime
+
+runtime.apply_environment()
+
+import numpy as np
+import tensorflow as tf
+
+runtime.configure_tensorflow(tf)
+
+from tensorflow.keras.metrics import Precision, Recall
+
+from face_id.models import make_compact_embedding, make_embedding, make_siamese_model
+
+
+def enable_mixed_precision():
+    """Makes new layers compute in bfloat16 while keeping their weights in float32.
+
+    bfloat16 is used instead of float16 because it's the mixed precision type
+    supported on the CPU. Must be called before the model is created.
+    """
+
+    tf.keras.mixed_precision.set_global_policy("mixed_bfloat16")
+
+
+class Trainer:
+    """
+    Trains a siamese model and saves resumable checkpoints.
+
+    Recall and precision are updated from the predictions made in each training step,
+    so no extra prediction pass is needed per batch. The time and number of pairs of
+    each epoch are recorded for a throughput report.
+
+    Attributes:
+        model (tensorflow.keras.Model): The siamese model being trained.
+        optimizer (tf.keras.optimizers.Adam): Optimizer used to update the weights.
+        checkpoint_manager (tf.train.CheckpointManager): Saves and restores checkpoints.
+        epoch (tf.Variable): Number of epochs finished, saved with the checkpoints.
+        history (list): Loss, metric and throughput values of every epoch.
+    """
+
+    def __init__(
+        self,
+        checkpoint_dir="./training_checkpoints",
+        embedding_size=0,
+        learning_rate=1e-4,
+        max_checkpoints=3,
+    ):
+        """Initializes the trainer and restores the latest checkpoint if there is one.
+
+        Args:
+            checkpoint_dir (str): Folder the checkpoints are saved to.
+            embedding_size (int): Width of a compact embedding, or 0 for the full 4096 wide one.
+            learning_rate (float): Learning rate of the Adam optimizer.
+            max_checkpoints (int): Number of checkpoints that are kept.
+        """
+
+        if embedding_size:
+            embedding = make_compact_embedding(embedding_size)
+
+        else:
+            embedding = make_embedding()
+
+        self.model = make_siamese_model(embedding)
+        self.loss = tf.losses.BinaryCrossentropy()
+        self.optimizer = tf.keras.optimizers.Adam(learning_rate)
+        self.epoch = tf.Variable(0, trainable=False, dtype=tf.int64)
+        self.history = []
+
+        checkpoint = tf.train.Checkpoint(
+            opt=self.optimizer, siamese_model=self.model, epoch=self.epoch
+        )
+        self.checkpoint_manager = tf.train.CheckpointManager(
+            checkpoint, checkpoint_dir, max_to_keep=max_checkpoints
+        )
+
+        if self.checkpoint_manager.latest_checkpoint:
+            checkpoint.restore(self.checkpoint_manager.latest_checkpoint)
+            print(
+                f"Resumed from {self.checkpoint_manager.latest_checkpoint} "
+                f"after epoch {int(self.epoch.numpy())}"
+            )
+
+    @tf.function
+    def train_step(self, input_images, validation_images, labels):
+        """Runs one training step on a batch of image pairs.
+
+        Args:
+            input_images (Tensor): Batch of input images.
+            validation_images (Tensor): Batch of validation images.
+            labels (Tensor): Batch of pair labels.
+
+        Returns:
+            tuple: Loss of the batch and the predictions made for it.
+        """
+
+        with tf.GradientTape() as tape:
+            yhat = self.model([input_images, validation_images], training=True)
+            yhat = tf.cast(yhat, tf.float32)
+            loss = self.loss(tf.reshape(labels, tf.shape(yhat)), yhat)
+
+        grad = tape.gradient(loss, self.model.trainable_variables)
+        self.optimizer.apply_gradients(zip(grad, self.model.trainable_variables))
+
+        return loss, yhat
+
+    def train(self, data, epochs, checkpoint_every=10):
+        """Trains the model until the given number of epochs have finished.
+
+        Training continues from the epoch of the restored checkpoint, and a
+        checkpoint is saved every checkpoint_every epochs and after the last one.
+
+        Args:
+            data (tf.data.Dataset): Batched dataset of image pairs and labels.
+            epochs (int): Total number of epochs to train for.
+            checkpoint_every (int): Number of epochs between checkpoints.
+
+        Returns:
+            list: Loss, metric and throughput values of every epoch trained.
+        """
+
+        for epoch in range(int(self.epoch.numpy()) + 1, epochs + 1):
+            print("\n Epoch {}/{}".format(epoch, epochs))
+
+            r = Recall()
+            p = Precision()
+            losses = []
+            pairs = 0
+            start = time.perf_counter()
+
+            for input_images, validation_images, labels in data:
+                loss, yhat = self.train_step(input_images, validation_images, labels)
+                r.update_state(labels, tf.reshape(yhat, [-1]))
+                p.update_state(labels, tf.reshape(yhat, [-1]))
+                losses.append(float(loss))
+                pairs += int(tf.shape(labels)[0])
+
+            seconds = time.perf_counter() - start
+            self.epoch.assign(epoch)
+
+            result = {
+                "epoch": epoch,
+                "loss": float(np.mean(losses)) if losses else 0.0,
+                "recall": float(r.result()),
+                "precision": float(p.result()),
+                "seconds": seconds,
+                "pairs_per_second": pairs / seconds if seconds else 0.0,
+            }
+            self.history.append(result)
+            print(
+                f"loss: {result['loss']:.4f} recall: {result['recall']:.4f} "
+                f"precision: {result['precision']:.4f} "
+                f"{result['seconds']:.1f}s ({result['pairs_per_second']:.1f} pairs/s)"
+            )
+
+            if epoch % checkpoint_every == 0 or epoch == epochs:
+                self.checkpoint_manager.save()
+
+        return self.history
+
+    def evaluate(self, data, threshold=0.5):
+        """Finds the accuracy, recall and precision of the model on a dataset.
+
+        Args:
+            data (tf.data.Dataset): Batched dataset of image pairs and labels.
+            threshold (float): Score needed for a pair to count as a match.
+
+        Returns:
+            dict: Accuracy, recall and precision values.
+        """
+
+        r = Recall(thresholds=threshold)
+        p = Precision(thresholds=threshold)
+        correct = 0
+        total = 0
+
+        for input_images, validation_images, labels in data:
+            yhat = tf.reshape(
+                tf.cast(self.model([input_images, validation_images]), tf.float32),
+                [-1],
+            )
+            r.update_state(labels, yhat)
+            p.update_state(labels, yhat)
+            matches = tf.cast((yhat > threshold) == (labels > 0.5), tf.int32)
+            correct += int(tf.reduce_sum(matches))
+            total += int(tf.shape(labels)[0])
+
+        return {
+            "accuracy": correct / total if total else 0.0,
+            "recall": float(r.result()),
+            "precision": float(p.result()),
+        }
+
+    def throughput_report(self, report_path=None):
+        """Prints the epoch throughput of the training run and optionally saves it.
+
+        Args:
+            report_path (str): File path the json report is saved to, not saved if None.
+
+        Returns:
+            dict: Number of epochs, total and mean epoch time and mean pairs per second.
+        """
+
+        if len(self.history) == 0:
+            return {}
+
+        report = {
+            "epochs": len(self.history),
+            "total_seconds": sum(result["seconds"] for result in self.history),
+            "mean_epoch_seconds": float(
+                np.mean([result["seconds"] for result in self.history])
+            ),
+            "mean_pairs_per_second": float(
+                np.mean([result["pairs_per_second"] for result in self.history])
+            ),
+            "history": self.history,
+        }
+
+        print(
+            f"Trained {report['epochs']} epochs in {report['total_seconds']:.1f}s, "
+            f"{report['mean_epoch_seconds']:.1f}s per epoch, "
+            f"{report['mean_pairs_per_second']:.1f} pairs/s"
+        )
+
+        if report_path:
+            with open(report_path, "w") as report_file:
+                json.dump(report, report_file, indent=4)
+
+        return report
@@ -0,0 +1,317 @@
+import os
+import sys
+import threading
+import time
+import traceback
+
+from datetime import datetime
+
+from face_id.audit_log import audit
+from face_id.settings import load_settings
+from PyQt5.QtCore import QObject, Qt, QTimer
+
+LAG_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def handler_name(frame):
+    """Finds the slot or event handler the main thread is running.
+
+    The outermost Python frame of the main thread is the one that called
+    app.exec(), so the frame Qt called from its event loop is the next one in.
+
+    Args:
+        frame (frame): Innermost frame of the main thread.
+
+    Returns:
+        str: Qualified name of the handler, or "<qt>" if no Python code is running.
+    """
+
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+
+    if len(frames) < 2:
+        return "<qt>"
+
+    handler = frames[-2]
+    name = getattr(handler.f_code, "co_qualname", handler.f_code.co_name)
+
+    if "." not in name and "self" in handler.f_locals:
+        name = f"{type(handler.f_locals['self']).__name__}.{name}"
+
+    return name
+
+
+class EventLoopWatchdog(QObject):
+    """
+    Measures how long the Qt event loop is blocked, and by which handler.
+
+    A precise timer beats every interval on the main thread, and the lag of each beat,
+    how much later than the interval it ran, is added to a histogram. A sentinel thread
+    watches the beats, so while the main thread is blocked it can see which slot or
+    event handler is running and, once the stall passes the dump threshold, write the
+    main thread's stack to the dump file. Stalls longer than the stall threshold are
+    counted by handler and saved to the audit log.
+
+    Attributes:
+        enabled (bool): If the watchdog runs.
+        interval_ms (int): Milliseconds between beats.
+        stall_ms (float): Lag a beat needs to be counted as a stall.
+        dump_stacks_ms (float): Stall length the main thread's stack is dumped at, 0 to never dump.
+        dump_path (str): File path stacks are appended to.
+    """
+
+    def __init__(
+        self,
+        enabled=False,
+        interval_ms=10,
+        stall_ms=100,
+        dump_stacks_ms=1000,
+        dump_path="face_id/audit/stalls.log",
+    ):
+        """Initializes the watchdog.
+
+        Args:
+            enabled (bool): If the watchdog runs.
+            interval_ms (int): Milliseconds between beats.
+            stall_ms (float): Lag a beat needs to be counted as a stall.
+            dump_stacks_ms (float): Stall length the main thread's stack is dumped at, 0 to never dump.
+            dump_path (str): File path stacks are appended to.
+        """
+
+        super().__init__()
+        self.enabled = enabled
+        self.interval_ms = interval_ms
+        self.stall_ms = stall_ms
+        self.dump_stacks_ms = dump_stacks_ms
+        self.dump_path = dump_path
+
+        self._timer = None
+        self._main_thread_id = threading.main_thread().ident
+        self._last_beat = time.perf_counter()
+        self._beat_id = 0
+        self._stall = {"beat_id": None, "handler": None, "dumped": False}
+        self._running = False
+        self._lock = threading.Lock()
+        self._stats = {
+            "beats": 0,
+            "stalls": 0,
+            "dumps": 0,
+            "max_lag_ms": 0.0,
+            "histogram": [0] * (len(LAG_BUCKETS_MS) + 1),
+            "handlers": {},
+        }
+
+    @classmethod
+    def from_settings(cls):
+        """Creates a watchdog from the "watchdog" settings section.
+
+        Returns:
+            EventLoopWatchdog: Watchdog using the saved or default settings.
+        """
+
+        return cls(**load_settings("watchdog"))
+
+    def start(self):
+        """Starts the heartbeat timer and the sentinel thread if the watchdog is enabled.
+
+        Must be called from the main thread after the QApplication is created.
+        """
+
+        if not self.enabled or self._running:
+            return
+
+        self._running = True
+        self._last_beat = time.perf_counter()
+
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self.beat)
+        self._timer.start(self.interval_ms)
+
+        threading.Thread(target=self._watch, name="ui-watchdog", daemon=True).start()
+
+    def stop(self):
+        """Stops the heartbeat timer and the sentinel thread."""
+
+        if self._timer is not None:
+            self._timer.stop()
+
+        self._running = False
+
+    def beat(self):
+        """Records the lag of a beat, and the stall if it was long enough."""
+
+        now = time.perf_counter()
+
+        with self._lock:
+            lag_ms = max((now - self._last_beat) * 1000 - self.interval_ms, 0.0)
+            stall = dict(self._stall)
+            beat_id = self._beat_id
+
+            self._last_beat = now
+            self._beat_id += 1
+            self._stall = {"beat_id": None, "handler": None, "dumped": False}
+
+            self._stats["beats"] += 1
+            self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], lag_ms)
+            self._stats["histogram"][self.bucket(lag_ms)] += 1
+
+            if lag_ms < self.stall_ms:
+                return
+
+            handler = stall["handler"] if stall["beat_id"] == beat_id else None
+            handler = handler or "<unknown>"
+
+            self._stats["stalls"] += 1
+            entry = self._stats["handlers"].setdefault(
+                handler, {"stalls": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            entry["stalls"] += 1
+            entry["total_ms"] += lag_ms
+            entry["max_ms"] = max(entry["max_ms"], lag_ms)
+
+        audit("ui_stall", handler=handler, lag_ms=lag_ms, dumped=stall["dumped"])
+
+    def bucket(self, lag_ms):
+        """Finds the histogram bucket of a lag.
+
+        Args:
+            lag_ms (float): Lag of a beat in milliseconds.
+
+        Returns:
+            int: Index of the first bucket the lag is below, or of the last bucket.
+        """
+
+        for idx, bound in enumerate(LAG_BUCKETS_MS):
+            if lag_ms < bound:
+                return idx
+
+        return len(LAG_BUCKETS_MS)
+
+    def histogram(self):
+        """Returns the number of beats in each lag bucket.
+
+        Returns:
+            list: Label and count of every bucket, such as ("<5 ms", 120).
+        """
+
+        with self._lock:
+            counts = list(self._stats["histogram"])
+
+        labels = [f"<{bound} ms" for bound in LAG_BUCKETS_MS]
+        labels.append(f">={LAG_BUCKETS_MS[-1]} ms")
+        return list(zip(labels, counts))
+
+    def stats(self):
+        """Returns the number of beats, stalls and dumps, the longest lag and the stalls of each handler.
+
+        Returns:
+            dict: The watchdog's counters.
+        """
+
+        with self._lock:
+            stats = {
+                "beats": self._stats["beats"],
+                "stalls": self._stats["stalls"],
+                "dumps": self._stats["dumps"],
+                "max_lag_ms": self._stats["max_lag_ms"],
+                "handlers": {
+                    name: dict(entry) for name, entry in self._stats["handlers"].items()
+                },
+            }
+
+        stats["histogram"] = self.histogram()
+        return stats
+
+    def report(self):
+        """Prints the lag histogram and the handlers that stalled the event loop the longest."""
+
+        if not self.enabled:
+            return
+
+        stats = self.stats()
+        print(
+            f"Event loop: {stats['beats']} beats, {stats['stalls']} stalls over "
+            f"{self.stall_ms} ms, longest lag {stats['max_lag_ms']:.0f} ms"
+        )
+        print(
+            "Event loop lag: "
+            + ", ".join(f"{label}: {count}" for label, count in stats["histogram"] if count)
+        )
+
+        handlers = sorted(
+            stats["handlers"].items(), key=lambda item: item[1]["total_ms"], reverse=True
+        )
+        for name, entry in handlers[:10]:
+            print(
+                f"  {name}: {entry['stalls']} stalls, {entry['total_ms']:.0f} ms total, "
+                f"{entry['max_ms']:.0f} ms longest"
+            )
+
+    def dump_stack(self, frame, blocked_ms):
+        """Appends the main thread's stack to the dump file.
+
+        Args:
+            frame (frame): Innermost frame of the main thread.
+            blocked_ms (float): How long the event loop has been blocked.
+        """
+
+        os.makedirs(os.path.dirname(self.dump_path) or ".", exist_ok=True)
+
+        with open(self.dump_path, "a") as dump_file:
+            dump_file.write(
+                f"{datetime.now().isoformat(timespec='seconds')} event loop blocked "
+                f"for {blocked_ms:.0f} ms\n"
+            )
+            dump_file.write("".join(traceback.format_stack(frame)))
+            dump_file.write("\n")
+
+        print(f"Event loop blocked for {blocked_ms:.0f} ms, stack saved to {self.dump_path}")
+
+    def _watch(self):
+        """Watches the beats and samples the main thread while it's blocked."""
+
+        while self._running:
+            time.sleep(max(self.interval_ms, self.stall_ms / 4) / 1000)
+
+            with self._lock:
+                blocked_ms = (time.perf_counter() - self._last_beat) * 1000 - self.interval_ms
+                beat_id = self._beat_id
+                stall = dict(self._stall)
+
+            if blocked_ms < self.stall_ms:
+                continue
+
+            dump = (
+                self.dump_stacks_ms
+                and blocked_ms >= self.dump_stacks_ms
+                and not (stall["beat_id"] == beat_id and stall["dumped"])
+            )
+
+            if stall["beat_id"] == beat_id and not dump:
+                continue
+
+            frame = sys._current_frames().get(self._main_thread_id)
+
+            if frame is None:
+                continue
+
+            handler = handler_name(frame)
+
+            if dump:
+                self.dump_stack(frame, blocked_ms)
+
+            with self._lock:
+                if self._beat_id != beat_id:
+                    continue
+
+                self._stall = {
+                    "beat_id": beat_id,
+                    "handler": handler,
+                    "dumped": bool(dump) or stall["dumped"],
+                }
+
+                if dump:
+                    self._stats["dumps"] += 1
@@ -0,0 +1,139 @@
+import threading
+import time
+
+from collections import OrderedDict
+
+from face_id.settings import load_settings
+
+
+class VerificationQueue:
+    """
+    Holds every blocked app that is waiting for face verification.
+
+    Apps are queued in the order they were detected, and an app that is already waiting
+    isn't queued twice. One successful verification can approve every queued app, or only
+    the oldest one so the user approves them in turn. Apps that wait longer than the
+    timeout are removed.
+
+    Attributes:
+        timeout_seconds (float): Seconds an app can wait before its request expires, 0 to disable.
+        approve_all (bool): If one verification approves every queued app.
+    """
+
+    def __init__(self, timeout_seconds=120, approve_all=True):
+        """Initializes the verification queue.
+
+        Args:
+            timeout_seconds (float): Seconds an app can wait before its request expires.
+            approve_all (bool): If one verification approves every queued app.
+        """
+
+        self.timeout_seconds = timeout_seconds
+        self.approve_all = approve_all
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """Creates a verification queue from the "verification_queue" settings section.
+
+        Returns:
+            VerificationQueue: Queue using the saved or default settings.
+        """
+
+        return cls(**load_settings("verification_queue"))
+
+    def enqueue(self, name, path):
+        """Adds a blocked app to the queue.
+
+        Args:
+            name (str): Name of the app.
+            path (str): File path of the app.
+
+        Returns:
+            bool: True if the app was added, False if it was already waiting.
+        """
+
+        with self._lock:
+            if name in self._entries:
+                return False
+
+            self._entries[name] = {
+                "name": name,
+                "path": path,
+                "enqueued": time.monotonic(),
+            }
+            return True
+
+    def pending(self):
+        """Lists the apps waiting for verification, oldest first.
+
+        Returns:
+            list: Name, path and queue time of every waiting app.
+        """
+
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def take_verified(self):
+        """Removes the apps approved by a successful verification.
+
+        Returns:
+            list: Every queued app if approve_all is set, otherwise only the oldest one.
+        """
+
+        with self._lock:
+            if self.approve_all:
+                taken = list(self._entries.values())
+                self._entries.clear()
+
+            elif len(self._entries) > 0:
+                taken = [self._entries.popitem(last=False)[1]]
+
+            else:
+                taken = []
+
+        return taken
+
+    def expire(self):
+        """Removes the apps that have waited longer than the timeout.
+
+        Returns:
+            list: The apps that were removed.
+        """
+
+        if not self.timeout_seconds:
+            return []
+
+        now = time.monotonic()
+
+        with self._lock:
+            expired = [
+                entry for entry in self._entries.values()
+                if now - entry["enqueued"] > self.timeout_seconds
+            ]
+
+            for entry in expired:
+                del self._entries[entry["name"]]
+
+        return expired
+
+    def clear(self):
+        """Removes every app from the queue.
+
+        Returns:
+            list: The apps that were removed.
+        """
+
+        with self._lock:
+            removed = list(self._entries.values())
+            self._entries.clear()
+
+        return removed
+
+    def __len__(self):
+        """Returns the number of apps waiting for verification."""
+
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,44 @@
+import pytest
+
+from face_id import audit_log
+
+
+class FakeClock:
+    """Monotonic clock that only moves when a test advances it."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class RecordingAuditLog:
+    """Audit log that keeps records in memory instead of writing them."""
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, event_type, **fields):
+        self.records.append(dict(fields, type=event_type))
+
+
+@pytest.fixture(autouse=True)
+def audit_records(monkeypatch):
+    """Keeps audit records in memory so tests never write the audit log."""
+
+    log = RecordingAuditLog()
+    monkeypatch.setattr(audit_log, "get_audit_log", lambda: log)
+    return log.records
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces time.monotonic with a clock the test controls."""
+
+    fake_clock = FakeClock()
+    monkeypatch.setattr("time.monotonic", fake_clock)
+    return fake_clock
@@ -0,0 +1,142 @@
+import getpass
+
+from face_id.approval_cache import ApprovalCache, normalize_user
+
+
+def test_approved_app_is_a_hit(clock):
+    cache = ApprovalCache()
+    cache.approve("app.exe")
+
+    assert cache.is_approved("app.exe")
+    assert not cache.is_approved("other.exe")
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_approval_expires_after_ttl(clock, audit_records):
+    cache = ApprovalCache(ttl_seconds=60, idle_seconds=0)
+    cache.approve("app.exe")
+
+    clock.advance(59)
+    assert cache.is_approved("app.exe")
+
+    clock.advance(2)
+    assert not cache.is_approved("app.exe")
+    assert cache.stats()["expiries"] == 1
+    assert audit_records[-1]["type"] == "approval_expired"
+
+
+def test_approval_expires_when_idle(clock):
+    cache = ApprovalCache(ttl_seconds=0, idle_seconds=10)
+    cache.approve("app.exe")
+
+    for _ in range(5):
+        clock.advance(9)
+        assert cache.is_approved("app.exe")
+
+    clock.advance(11)
+    assert not cache.is_approved("app.exe")
+
+
+def test_least_recently_used_approval_is_evicted(clock):
+    cache = ApprovalCache(max_entries=2)
+    cache.approve("first.exe")
+    cache.approve("second.exe")
+    cache.is_approved("first.exe")
+    cache.approve("third.exe")
+
+    assert cache.is_approved("first.exe")
+    assert not cache.is_approved("second.exe")
+    assert cache.is_approved("third.exe")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_key_by_exe_path(clock):
+    cache = ApprovalCache(key_by="exe")
+    cache.approve("app.exe", "/opt/app/app.exe")
+
+    assert cache.is_approved("renamed.exe", "/opt/app/app.exe")
+    assert not cache.is_approved("app.exe", "/tmp/app.exe")
+
+
+def test_per_user_matches_domain_user_names(clock):
+    cache = ApprovalCache(per_user=True)
+    cache.approve("app.exe")
+
+    assert cache.is_approved("app.exe", user=f"DOMAIN\\{getpass.getuser()}")
+    assert not cache.is_approved("app.exe", user="someone-else")
+
+
+def test_normalize_user_strips_the_domain():
+    assert normalize_user("DOMAIN\\user") == "user"
+    assert normalize_user("user") == "user"
+
+
+def test_per_pid_approval_without_pid_is_taken_by_next_launch(clock):
+    cache = ApprovalCache(per_pid=True)
+    cache.approve("app.exe")
+
+    assert cache.is_approved("app.exe", pid=100)
+    assert cache.is_approved("app.exe", pid=100)
+    assert not cache.is_approved("app.exe", pid=200)
+
+
+def test_admitted_processes_outlive_their_approval(clock):
+    cache = ApprovalCache(ttl_seconds=60)
+    cache.approve("app.exe")
+    cache.admit("app.exe", None, [(100, 5.0), (101, 6.0)])
+
+    clock.advance(120)
+
+    assert not cache.is_approved("app.exe")
+    assert cache.is_admitted(100, 5.0)
+    assert not cache.is_admitted(100, 7.0)
+
+
+def test_prune_forgets_exited_processes(clock):
+    cache = ApprovalCache()
+    cache.admit("app.exe", None, [(100, 5.0), (101, 6.0)])
+    cache.prune_admitted({(101, 6.0)})
+
+    assert not cache.is_admitted(100, 5.0)
+    assert cache.is_admitted(101, 6.0)
+    assert cache.stats()["admitted"] == 1
+
+
+def test_revoke_removes_approvals_and_admissions(clock):
+    cache = ApprovalCache(per_pid=True)
+    cache.approve("app.exe", pid=100)
+    cache.approve("app.exe", pid=101)
+    cache.approve("other.exe", pid=102)
+    cache.admit("app.exe", None, [(100, 5.0)])
+
+    assert cache.revoke("app.exe") == 2
+    assert not cache.is_approved("app.exe", pid=100)
+    assert not cache.is_admitted(100, 5.0)
+    assert cache.is_approved("other.exe", pid=102)
+
+
+def test_age_shortens_an_approval(clock):
+    cache = ApprovalCache(ttl_seconds=900)
+    cache.approve("app.exe")
+
+    assert cache.age("app.exe", seconds=30) == 1
+
+    clock.advance(29)
+    assert cache.is_approved("app.exe")
+
+    clock.advance(2)
+    assert not cache.is_approved("app.exe")
+
+
+def test_purge_expired(clock):
+    cache = ApprovalCache(ttl_seconds=60, idle_seconds=0)
+    cache.approve("old.exe")
+    clock.advance(30)
+    cache.approve("new.exe")
+    clock.advance(31)
+
+    assert cache.purge_expired() == 1
+    assert cache.stats()["entries"] == 1
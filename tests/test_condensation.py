@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+
+from face_id.condensation import (
+    PrototypeStore,
+    condense,
+    kmeans,
+    kmedoids,
+    weighted_verification,
+)
+
+
+def clustered_embeddings():
+    rng = np.random.default_rng(1)
+    centers = np.array([[0.0] * 4, [10.0] * 4, [20.0] * 4], np.float32)
+    sizes = [6, 3, 1]
+    return np.concatenate(
+        [
+            center + rng.normal(0, 0.1, (size, 4)).astype(np.float32)
+            for center, size in zip(centers, sizes)
+        ]
+    )
+
+
+def test_weighted_verification_counts_the_weights_of_detections():
+    results = np.array([0.9, 0.2, 0.7])
+    weights = np.array([0.5, 0.3, 0.2])
+
+    assert np.isclose(weighted_verification(results, weights, 0.5), 0.7)
+    assert weighted_verification(np.array([]), np.array([]), 0.5) == 0.0
+    assert weighted_verification(results, np.zeros(3), 0.5) == 0.0
+
+
+def test_kmedoids_picks_gallery_embeddings_as_medoids():
+    embeddings = clustered_embeddings()
+    medoids, labels = kmedoids(embeddings, 3)
+
+    for medoid in medoids:
+        assert any(np.array_equal(medoid, embedding) for embedding in embeddings)
+
+    assert sorted(np.bincount(labels).tolist()) == [1, 3, 6]
+
+
+def test_kmedoids_is_deterministic():
+    embeddings = clustered_embeddings()
+
+    first_medoids, first_labels = kmedoids(embeddings, 3, seed=7)
+    second_medoids, second_labels = kmedoids(embeddings, 3, seed=7)
+
+    assert np.array_equal(first_medoids, second_medoids)
+    assert np.array_equal(first_labels, second_labels)
+
+
+def test_kmeans_finds_the_cluster_means():
+    embeddings = clustered_embeddings()
+    centers, labels = kmeans(embeddings, 3)
+
+    for cluster, center in enumerate(centers):
+        assert np.allclose(center, np.mean(embeddings[labels == cluster], axis=0))
+
+
+def test_condense_weights_are_the_share_of_templates():
+    embeddings = clustered_embeddings()
+    prototypes, weights = condense(embeddings, 3)
+
+    assert len(prototypes) == 3
+    assert np.isclose(np.sum(weights), 1.0)
+    assert np.allclose(np.sort(weights), [0.1, 0.3, 0.6])
+
+
+def test_condense_never_makes_more_prototypes_than_templates():
+    prototypes, weights = condense(clustered_embeddings()[:2], 10)
+
+    assert len(prototypes) <= 2
+    assert np.isclose(np.sum(weights), 1.0)
+
+
+def test_saved_prototypes_are_only_used_for_the_same_gallery_and_model(tmp_path):
+    model_path = tmp_path / "model.h5"
+    model_path.write_text("model")
+    manifest = {"version": 3, "templates": [{"file": "a.jpg"}, {"file": "b.jpg"}]}
+    store = PrototypeStore(str(tmp_path / "prototypes.npz"))
+
+    assert store.load(manifest, str(model_path)) is None
+
+    store.save(np.ones((2, 4)), np.array([0.5, 0.5]), manifest, str(model_path))
+    prototypes, weights = store.load(manifest, str(model_path))
+    assert prototypes.shape == (2, 4)
+
+    changed = {"version": 4, "templates": manifest["templates"]}
+    assert store.load(changed, str(model_path)) is None
+
+    mtime = os.path.getmtime(model_path)
+    os.utime(model_path, (mtime + 10, mtime + 10))
+    assert store.load(manifest, str(model_path)) is None
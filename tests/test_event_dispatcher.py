@@ -0,0 +1,50 @@
+from face_id.event_dispatcher import ProcessEventDispatcher
+
+
+def test_launch_burst_asks_for_verification_once(clock):
+    dispatcher = ProcessEventDispatcher(debounce_seconds=5)
+
+    assert dispatcher.submit("app.exe")
+    assert not dispatcher.submit("app.exe")
+    assert dispatcher.submit("other.exe")
+
+    stats = dispatcher.stats()
+    assert stats["requests"] == 2
+    assert stats["suppressed_events"] == 1
+    assert stats["pending"] == 2
+
+
+def test_pending_request_suppresses_detections_until_resolved(clock):
+    dispatcher = ProcessEventDispatcher(debounce_seconds=5)
+    dispatcher.submit("app.exe")
+
+    clock.advance(60)
+    assert not dispatcher.submit("app.exe")
+
+    dispatcher.resolve("app.exe")
+    assert dispatcher.submit("app.exe")
+
+
+def test_terminate_signal_is_not_repeated_within_timeout(clock):
+    dispatcher = ProcessEventDispatcher(termination_timeout_seconds=10)
+
+    assert dispatcher.should_terminate(100)
+    clock.advance(5)
+    assert not dispatcher.should_terminate(100)
+    clock.advance(6)
+    assert dispatcher.should_terminate(100)
+
+    stats = dispatcher.stats()
+    assert stats["terminations"] == 2
+    assert stats["suppressed_terminations"] == 1
+
+
+def test_prune_forgets_exited_processes(clock):
+    dispatcher = ProcessEventDispatcher(termination_timeout_seconds=10)
+    dispatcher.should_terminate(100)
+    dispatcher.should_terminate(101)
+
+    dispatcher.prune({101})
+
+    assert dispatcher.should_terminate(100)
+    assert not dispatcher.should_terminate(101)
@@ -0,0 +1,142 @@
+import os
+
+import numpy as np
+import pytest
+
+from face_id.gallery import AdaptiveGallery, GalleryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    enrolled = tmp_path / "verification_images"
+    enrolled.mkdir()
+
+    for name in ("a.jpg", "b.jpg"):
+        (enrolled / name).write_bytes(b"jpeg")
+
+    return GalleryStore(str(tmp_path), keep_versions=3)
+
+
+def add_adaptive(store, name):
+    adaptive_dir = os.path.join(store.root, "adaptive_images")
+    os.makedirs(adaptive_dir, exist_ok=True)
+
+    with open(os.path.join(adaptive_dir, name), "wb") as image_file:
+        image_file.write(b"jpeg")
+
+    file_name = os.path.join("adaptive_images", name)
+    templates = store.load()["templates"] + [store.make_template(file_name, "adaptive")]
+    return store.commit(templates, "adaptive")
+
+
+def template_files(manifest):
+    return [template["file"] for template in manifest["templates"]]
+
+
+def test_gallery_without_manifest_uses_verification_images(store):
+    manifest = store.load()
+
+    assert manifest["version"] == 0
+    assert template_files(manifest) == [
+        os.path.join("verification_images", "a.jpg"),
+        os.path.join("verification_images", "b.jpg"),
+    ]
+    assert store.versions() == []
+
+
+def test_commit_makes_a_new_active_version(store, audit_records):
+    manifest = add_adaptive(store, "one.jpg")
+
+    assert manifest["version"] == 1
+    assert store.load() == manifest
+    assert audit_records[-1]["type"] == "gallery_change"
+    assert audit_records[-1]["adaptive"] == 1
+
+
+def test_first_commit_keeps_the_original_gallery(store):
+    original = store.load()
+    add_adaptive(store, "one.jpg")
+
+    assert store.versions() == [0, 1]
+
+    restored = store.rollback()
+
+    assert restored["version"] == 2
+    assert template_files(restored) == template_files(original)
+
+
+def test_rollback_to_a_version_can_be_undone(store):
+    add_adaptive(store, "one.jpg")
+    second = add_adaptive(store, "two.jpg")
+
+    store.rollback(1)
+    assert len(store.load()["templates"]) == 3
+
+    store.rollback(second["version"])
+    assert template_files(store.load()) == template_files(second)
+
+
+def test_prune_keeps_versions_and_the_images_they_use(store):
+    add_adaptive(store, "one.jpg")
+    add_adaptive(store, "two.jpg")
+    store.commit(store.load_version(0)["templates"], "rollback")
+    add_adaptive(store, "three.jpg")
+
+    assert store.versions() == [2, 3, 4]
+
+    adaptive_dir = os.path.join(store.root, "adaptive_images")
+    assert sorted(os.listdir(adaptive_dir)) == ["one.jpg", "three.jpg", "two.jpg"]
+
+    add_adaptive(store, "four.jpg")
+
+    assert store.versions() == [3, 4, 5]
+    assert sorted(os.listdir(adaptive_dir)) == ["four.jpg", "three.jpg"]
+    assert os.path.exists(os.path.join(store.root, "verification_images", "a.jpg"))
+
+
+def test_evict_only_removes_the_most_redundant_adaptive_template(store):
+    gallery = AdaptiveGallery(
+        store,
+        {
+            "enabled": True,
+            "min_score": 0.9,
+            "min_verification": 0.9,
+            "max_templates": 3,
+            "min_interval_seconds": 0,
+            "keep_versions": 3,
+        },
+    )
+    templates = [
+        store.make_template("enrolled_1.jpg", "enrolled"),
+        store.make_template("enrolled_2.jpg", "enrolled"),
+        store.make_template("adaptive_far.jpg", "adaptive"),
+        store.make_template("adaptive_near.jpg", "adaptive"),
+    ]
+    embeddings = np.array([[0.0], [10.0], [20.0], [0.1]])
+
+    kept = gallery.evict(templates, embeddings)
+
+    assert [template["file"] for template in kept] == [
+        "enrolled_1.jpg",
+        "enrolled_2.jpg",
+        "adaptive_far.jpg",
+    ]
+
+
+def test_only_confident_verifications_are_added(store):
+    gallery = AdaptiveGallery(
+        store,
+        {
+            "enabled": True,
+            "min_score": 0.9,
+            "min_verification": 0.75,
+            "max_templates": 10,
+            "min_interval_seconds": 0,
+            "keep_versions": 3,
+        },
+    )
+
+    assert gallery.is_confident(np.array([0.95, 0.92, 0.97, 0.1]), 0.5)
+    assert not gallery.is_confident(np.array([0.95, 0.92, 0.1, 0.1]), 0.5)
+    assert not gallery.is_confident(np.array([0.6, 0.6, 0.6, 0.6]), 0.5)
+    assert not gallery.is_confident(np.array([]), 0.5)
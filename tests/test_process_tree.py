@@ -0,0 +1,71 @@
+from face_id.process_tree import ProcessTree
+
+
+def make_tree(*processes):
+    tree = ProcessTree()
+    tree.update(
+        {"pid": pid, "ppid": ppid, "create_time": create_time}
+        for pid, ppid, create_time in processes
+    )
+    return tree
+
+
+def browser_tree():
+    # 1 init
+    # └── 10 browser
+    #     ├── 11 renderer
+    #     │   └── 13 browser (protected child of a helper)
+    #     └── 12 gpu
+    return make_tree(
+        (1, 0, 1.0),
+        (10, 1, 10.0),
+        (11, 10, 11.0),
+        (12, 10, 12.0),
+        (13, 11, 13.0),
+    )
+
+
+def test_ancestors_are_listed_closest_first():
+    tree = browser_tree()
+
+    assert tree.ancestors(13) == [11, 10, 1]
+    assert tree.ancestors(1) == []
+
+
+def test_descendants_are_listed_children_first():
+    tree = browser_tree()
+
+    assert tree.descendants(10) == [11, 12, 13]
+    assert tree.descendants(12) == []
+
+
+def test_launch_root_is_the_highest_protected_ancestor():
+    tree = browser_tree()
+
+    assert tree.launch_root(13, {10, 13}) == 10
+    assert tree.launch_root(13, {13}) == 13
+    assert tree.launch_root(12, {10}) == 10
+
+
+def test_reused_parent_id_is_not_an_ancestor():
+    # Process 20 was created after its "child", so its id was reused.
+    tree = make_tree((1, 0, 1.0), (20, 1, 50.0), (21, 20, 30.0))
+
+    assert tree.ancestors(21) == []
+    assert tree.descendants(20) == []
+    assert tree.launch_root(21, {20, 21}) == 21
+
+
+def test_parent_cycle_stops():
+    tree = make_tree((30, 31, 5.0), (31, 30, 5.0))
+
+    assert tree.ancestors(30)[0] == 31
+    assert tree.descendants(30) == [31]
+
+
+def test_update_replaces_the_previous_scan():
+    tree = browser_tree()
+    tree.update([{"pid": 10, "ppid": 1, "create_time": 10.0}])
+
+    assert tree.processes == 1
+    assert tree.descendants(10) == []
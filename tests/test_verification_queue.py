@@ -0,0 +1,61 @@
+from face_id.verification_queue import VerificationQueue
+
+
+def test_app_is_only_queued_once(clock):
+    queue = VerificationQueue()
+
+    assert queue.enqueue("app.exe", "/opt/app.exe")
+    assert not queue.enqueue("app.exe", "/opt/app.exe")
+    assert len(queue) == 1
+
+
+def test_verification_approves_every_queued_app(clock):
+    queue = VerificationQueue(approve_all=True)
+    queue.enqueue("first.exe", "/opt/first.exe")
+    queue.enqueue("second.exe", "/opt/second.exe")
+
+    taken = queue.take_verified()
+
+    assert [entry["name"] for entry in taken] == ["first.exe", "second.exe"]
+    assert len(queue) == 0
+
+
+def test_verification_approves_the_oldest_app(clock):
+    queue = VerificationQueue(approve_all=False)
+    queue.enqueue("first.exe", "/opt/first.exe")
+    queue.enqueue("second.exe", "/opt/second.exe")
+
+    assert [entry["name"] for entry in queue.take_verified()] == ["first.exe"]
+    assert [entry["name"] for entry in queue.pending()] == ["second.exe"]
+    assert [entry["name"] for entry in queue.take_verified()] == ["second.exe"]
+    assert queue.take_verified() == []
+
+
+def test_requests_expire_after_timeout(clock):
+    queue = VerificationQueue(timeout_seconds=120)
+    queue.enqueue("old.exe", "/opt/old.exe")
+    clock.advance(100)
+    queue.enqueue("new.exe", "/opt/new.exe")
+    clock.advance(30)
+
+    expired = queue.expire()
+
+    assert [entry["name"] for entry in expired] == ["old.exe"]
+    assert [entry["name"] for entry in queue.pending()] == ["new.exe"]
+
+
+def test_timeout_of_zero_never_expires(clock):
+    queue = VerificationQueue(timeout_seconds=0)
+    queue.enqueue("app.exe", "/opt/app.exe")
+    clock.advance(10000)
+
+    assert queue.expire() == []
+    assert len(queue) == 1
+
+
+def test_clear_returns_the_removed_apps(clock):
+    queue = VerificationQueue()
+    queue.enqueue("app.exe", "/opt/app.exe")
+
+    assert [entry["name"] for entry in queue.clear()] == ["app.exe"]
+    assert len(queue) == 0